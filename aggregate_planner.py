@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Aggregate Pushdown Planner
+Turns "count by column" requests into batched Hasura _aggregate queries instead of pulling rows.
+"""
+
+import json
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from query_batching import QueryBatcher
+from schema_model import SchemaModel
+
+# More distinct values than this and the remainder is reported as one "other" bucket
+MAX_GROUPS = 200
+
+# Aliased _aggregate fields per document
+AGGREGATE_BATCH_SIZE = 100
+
+class EnumValue(str):
+    """A value of a GraphQL enum type; graphql_literal writes it bare instead of quoted."""
+
+def graphql_literal(value: Any) -> str:
+    """Render a Python value as a GraphQL input literal ({col: {_eq: "x"}} style)."""
+    if value is None:
+        return 'null'
+    if isinstance(value, EnumValue):
+        return str(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{key}: {graphql_literal(item)}" for key, item in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(graphql_literal(item) for item in value) + ']'
+    if isinstance(value, (int, float)):
+        return json.dumps(value)
+    return json.dumps(str(value), ensure_ascii=False)
+
+def _combine(where: Optional[Dict[str, Any]], condition: Dict[str, Any]) -> Dict[str, Any]:
+    return {'_and': [where, condition]} if where else condition
+
+class AggregatePlanner:
+    """Plans group-by statistics as Hasura aggregates.
+
+    A request is {'table', 'column', optional 'where' (dict) and 'aggregates'
+    (e.g. {'sum': ['seat_capacity']})}. Phase one finds each column's distinct
+    values with `distinct_on`; phase two sends one `<table>_aggregate(where: ...)`
+    per value plus the NULL bucket and the overall total. Both phases pack every
+    request into aliased documents, so a handful of requests cost one or two
+    round trips and return only counts.
+
+    With a schema, values of enum-typed columns are compared as enum literals
+    (`_eq: active`) rather than strings, which Hasura would reject.
+    """
+
+    def __init__(self, execute: Callable[[str, Optional[Dict]], Optional[Dict[str, Any]]],
+                 batch_size: int = AGGREGATE_BATCH_SIZE, max_groups: int = MAX_GROUPS,
+                 schema: Optional[SchemaModel] = None):
+        self.batcher = QueryBatcher(execute, batch_size=batch_size)
+        self.max_groups = max_groups
+        self.schema = schema
+
+    def is_enum(self, table: str, column: str) -> bool:
+        field = self.schema.get_field(table, column) if self.schema else None
+        return bool(field) and field['base_kind'] == 'ENUM'
+
+    def distinct_selection(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        column = request['column']
+        args = f"distinct_on: [{column}], order_by: {{{column}: asc_nulls_last}}, limit: {self.max_groups + 1}"
+        if request.get('where'):
+            args += f", where: {graphql_literal(request['where'])}"
+        return {'field': request['table'], 'args': args, 'selection': column}
+
+    @staticmethod
+    def aggregate_body(aggregates: Optional[Dict[str, List[str]]]) -> str:
+        parts = ['count']
+        for function, columns in (aggregates or {}).items():
+            parts.append(f"{function} {{ {' '.join(columns)} }}")
+        return 'aggregate {\n      ' + '\n      '.join(parts) + '\n    }'
+
+    def group_selections(self, request: Dict[str, Any], values: List[Any]) -> List[Dict[str, Any]]:
+        """One aggregate selection per value, then NULL, then the unfiltered total."""
+        table, column, where = request['table'], request['column'], request.get('where')
+        body = self.aggregate_body(request.get('aggregates'))
+        literal = EnumValue if self.is_enum(table, column) else (lambda value: value)
+        selections = []
+        buckets = [('value', value, {column: {'_eq': literal(value)}}) for value in values if value is not None]
+        buckets.append(('null', None, {column: {'_is_null': True}}))
+        for kind, value, condition in buckets:
+            selections.append({'field': f'{table}_aggregate', 'args': f"where: {graphql_literal(_combine(where, condition))}",
+                               'selection': body, 'bucket': kind, 'value': value})
+        selections.append({'field': f'{table}_aggregate',
+                           'args': f"where: {graphql_literal(where)}" if where else None,
+                           'selection': body, 'bucket': 'total', 'value': None})
+        return selections
+
+    @staticmethod
+    def _payload(result: Optional[Dict[str, Any]], field: str) -> Tuple[Any, Optional[str]]:
+        if not result:
+            return None, 'No response'
+        if 'errors' in result:
+            return None, result['errors'][0].get('message', 'Unknown error')
+        return (result.get('data') or {}).get(field), None
+
+    def run(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Group-by results in request order.
+
+        Each result is {'table', 'column', 'where', 'total', 'groups': [{'value',
+        'count', ...}], 'truncated'} or carries an 'error'.
+        """
+        results = [{'table': r['table'], 'column': r['column'], 'where': r.get('where')} for r in requests]
+
+        # Phase one: distinct values for every request, in one batch
+        values_by_request: Dict[int, List[Any]] = {}
+        for index, (selection, result) in enumerate(self.batcher.run([self.distinct_selection(r) for r in requests])):
+            rows, error = self._payload(result, selection['field'])
+            if error:
+                results[index]['error'] = error
+                continue
+            values = [row[requests[index]['column']] for row in rows or []]
+            results[index]['truncated'] = len(values) > self.max_groups
+            values_by_request[index] = values[:self.max_groups]
+
+        # Phase two: every bucket of every request, batched together
+        selections = []
+        for index, values in values_by_request.items():
+            for selection in self.group_selections(requests[index], values):
+                selection['request'] = index
+                selections.append(selection)
+
+        for index in values_by_request:
+            results[index]['groups'] = []
+        for selection, result in self.batcher.run(selections):
+            summary = results[selection['request']]
+            payload, error = self._payload(result, selection['field'])
+            if error:
+                summary['error'] = error
+                continue
+            aggregate = (payload or {}).get('aggregate') or {}
+            if selection['bucket'] == 'total':
+                summary['total'] = aggregate.get('count', 0)
+            elif aggregate.get('count'):
+                summary['groups'].append(dict(aggregate, value=selection['value']))
+
+        for index in values_by_request:
+            summary = results[index]
+            if summary.get('truncated') and 'total' in summary:
+                counted = sum(group['count'] for group in summary['groups'])
+                summary['groups'].append({'value': '__other__', 'count': summary['total'] - counted})
+        return results
+
+    def group_by(self, table: str, column: str, where: Optional[Dict[str, Any]] = None,
+                 aggregates: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+        return self.run([{'table': table, 'column': column, 'where': where, 'aggregates': aggregates}])[0]
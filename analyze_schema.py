@@ -7,31 +7,22 @@ Parses the GraphQL schema to find available queries, mutations, and subscription
 import json
 from typing import List, Dict, Any
 
+from profiling import run_main
+from schema_model import SchemaModel, SCHEMA_PATH
+
 def analyze_schema():
     """Analyze the downloaded GraphQL schema."""
     
     try:
-        with open('sample_data/schema.json', 'r') as f:
-            schema_data = json.load(f)
+        schema = SchemaModel.load(SCHEMA_PATH)
     except FileNotFoundError:
         print("❌ Schema file not found. Run explore_graphql.py first.")
         return
     
-    schema = schema_data['data']['__schema']
-    types = schema['types']
-    
     # Find query_root, mutation_root, and subscription_root types
-    query_type = None
-    mutation_type = None
-    subscription_type = None
-    
-    for type_def in types:
-        if type_def['name'] == 'query_root':
-            query_type = type_def
-        elif type_def['name'] == 'mutation_root':
-            mutation_type = type_def
-        elif type_def['name'] == 'subscription_root':
-            subscription_type = type_def
+    query_type = schema.root_type('query')
+    mutation_type = schema.root_type('mutation')
+    subscription_type = schema.root_type('subscription')
     
     print("📊 GraphQL Schema Analysis")
     print("=" * 50)
@@ -43,7 +34,7 @@ def analyze_schema():
         
         # Group fields by category
         categories = {}
-        for field in query_type['fields']:
+        for field in query_type['fields'].values():
             name = field['name']
             # Try to categorize by prefix
             if name.startswith('etl_'):
@@ -62,7 +53,7 @@ def analyze_schema():
         for category, fields in categories.items():
             print(f"\n📋 {category}:")
             for field in fields[:10]:  # Show first 10 fields per category
-                field_type = get_type_name(field['type'])
+                field_type = field['type_name']
                 print(f"  • {field['name']}: {field_type}")
             if len(fields) > 10:
                 print(f"  ... and {len(fields) - 10} more")
@@ -71,8 +62,8 @@ def analyze_schema():
     if mutation_type and mutation_type['fields']:
         print(f"\n✏️  Available Mutations ({len(mutation_type['fields'])} total):")
         print("-" * 30)
-        for field in mutation_type['fields'][:15]:  # Show first 15 mutations
-            field_type = get_type_name(field['type'])
+        for field in list(mutation_type['fields'].values())[:15]:  # Show first 15 mutations
+            field_type = field['type_name']
             print(f"  • {field['name']}: {field_type}")
         if len(mutation_type['fields']) > 15:
             print(f"  ... and {len(mutation_type['fields']) - 15} more")
@@ -81,8 +72,8 @@ def analyze_schema():
     if subscription_type and subscription_type['fields']:
         print(f"\n📡 Available Subscriptions ({len(subscription_type['fields'])} total):")
         print("-" * 30)
-        for field in subscription_type['fields'][:15]:  # Show first 15 subscriptions
-            field_type = get_type_name(field['type'])
+        for field in list(subscription_type['fields'].values())[:15]:  # Show first 15 subscriptions
+            field_type = field['type_name']
             print(f"  • {field['name']}: {field_type}")
         if len(subscription_type['fields']) > 15:
             print(f"  ... and {len(subscription_type['fields']) - 15} more")
@@ -90,15 +81,6 @@ def analyze_schema():
     # Save detailed field lists
     save_field_analysis(query_type, mutation_type, subscription_type)
 
-def get_type_name(type_def: Dict[str, Any]) -> str:
-    """Extract readable type name from GraphQL type definition."""
-    if type_def['kind'] == 'NON_NULL':
-        return get_type_name(type_def['ofType']) + '!'
-    elif type_def['kind'] == 'LIST':
-        return '[' + get_type_name(type_def['ofType']) + ']'
-    else:
-        return type_def.get('name', 'Unknown')
-
 def save_field_analysis(query_type, mutation_type, subscription_type):
     """Save detailed field analysis to JSON files."""
     
@@ -109,50 +91,50 @@ def save_field_analysis(query_type, mutation_type, subscription_type):
     }
     
     if query_type and query_type['fields']:
-        for field in query_type['fields']:
+        for field in query_type['fields'].values():
             analysis['queries'].append({
                 'name': field['name'],
                 'description': field.get('description'),
-                'type': get_type_name(field['type']),
+                'type': field['type_name'],
                 'args': [
                     {
                         'name': arg['name'],
-                        'type': get_type_name(arg['type']),
+                        'type': arg['type_name'],
                         'description': arg.get('description')
                     }
-                    for arg in field.get('args', [])
+                    for arg in field['args'].values()
                 ]
             })
     
     if mutation_type and mutation_type['fields']:
-        for field in mutation_type['fields']:
+        for field in mutation_type['fields'].values():
             analysis['mutations'].append({
                 'name': field['name'],
                 'description': field.get('description'),
-                'type': get_type_name(field['type']),
+                'type': field['type_name'],
                 'args': [
                     {
                         'name': arg['name'],
-                        'type': get_type_name(arg['type']),
+                        'type': arg['type_name'],
                         'description': arg.get('description')
                     }
-                    for arg in field.get('args', [])
+                    for arg in field['args'].values()
                 ]
             })
     
     if subscription_type and subscription_type['fields']:
-        for field in subscription_type['fields']:
+        for field in subscription_type['fields'].values():
             analysis['subscriptions'].append({
                 'name': field['name'],
                 'description': field.get('description'),
-                'type': get_type_name(field['type']),
+                'type': field['type_name'],
                 'args': [
                     {
                         'name': arg['name'],
-                        'type': get_type_name(arg['type']),
+                        'type': arg['type_name'],
                         'description': arg.get('description')
                     }
-                    for arg in field.get('args', [])
+                    for arg in field['args'].values()
                 ]
             })
     
@@ -162,4 +144,4 @@ def save_field_analysis(query_type, mutation_type, subscription_type):
     print(f"\n💾 Detailed analysis saved to: sample_data/schema_analysis.json")
 
 if __name__ == "__main__":
-    analyze_schema()
+    run_main(analyze_schema)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Async Fetch Engine
+Runs many GraphQL queries concurrently with a bounded number of in-flight requests.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
+
+from graphql_client import GraphQLClient
+
+class AsyncFetchEngine:
+    def __init__(self, client: GraphQLClient, concurrency: int = 6):
+        # The client's keep-alive pool should be at least `concurrency` connections wide
+        self.client = client
+        self.concurrency = max(1, concurrency)
+
+    async def execute_query(self, query: str, variables: Optional[Dict] = None,
+                            semaphore: Optional[asyncio.Semaphore] = None,
+                            executor: Optional[ThreadPoolExecutor] = None) -> Optional[Dict[str, Any]]:
+        """Execute a GraphQL query without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        if semaphore is None:
+            return await loop.run_in_executor(executor, self.client.execute_query, query, variables)
+        async with semaphore:
+            return await loop.run_in_executor(executor, self.client.execute_query, query, variables)
+
+    async def run(self, jobs: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """Run all jobs concurrently and return (job, result) pairs in job order.
+
+        Each job is a dict with a 'query' and optional 'variables'; any other keys
+        (name, table, kind, ...) are passed through untouched for the caller.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = await asyncio.gather(*[
+                self.execute_query(job['query'], job.get('variables'), semaphore, executor)
+                for job in jobs
+            ])
+        return list(zip(jobs, results))
+
+    def run_all(self, jobs: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """Blocking wrapper around run() for the synchronous scripts."""
+        return asyncio.run(self.run(jobs))
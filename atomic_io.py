@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Atomic File Writes
+Files are written to a temporary sibling and renamed into place, so readers never see a half-written file.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator, IO, Optional
+
+from profiling import phase
+
+@contextmanager
+def atomic_open(filepath: str, mode: str = 'w', encoding: str = 'utf-8') -> Iterator[IO]:
+    """Open `{filepath}.tmp` for writing and rename it over `filepath` on success.
+
+    The data is flushed and fsynced before the rename. If the block raises, the
+    temporary file is removed and any existing `filepath` is left untouched.
+    """
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    tmp_path = f"{filepath}.tmp"
+    f = open(tmp_path, mode, encoding=None if 'b' in mode else encoding)
+    try:
+        yield f
+        with phase('write'):
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        f.close()
+        os.remove(tmp_path)
+        raise
+    with phase('write'):
+        f.close()
+        os.replace(tmp_path, filepath)
+
+def atomic_write_json(data: Any, filepath: str, indent: Optional[int] = 2):
+    """Dump `data` as JSON to `filepath` atomically."""
+    with atomic_open(filepath) as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False, default=str)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmarks
+Runs the fetch, export and analysis code paths against a synthetic stand-in endpoint at several
+data volumes and writes the measurements to a JSON file that can be compared across commits.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Iterator
+
+from replay_server import StandInServer
+from schema_model import SchemaModel
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(REPO_DIR, "sample_data", "successful_data")
+BENCHMARK_DIR = os.path.join(REPO_DIR, "sample_data", "benchmarks")
+
+# Multiples of today's recorded volumes (1x is about 80K answers_as_rows)
+SCALES = (1, 10, 100)
+
+# Scenario -> whether it talks to the stand-in server and whether its size follows the scale
+SCENARIOS = {
+    'smart_sweep': {'server': True, 'scaled': True},
+    'hasura_sweep': {'server': True, 'scaled': True},
+    'export_answers': {'server': True, 'scaled': True},
+    'schema_load': {'server': False, 'scaled': False},
+    'analyze_schema': {'server': False, 'scaled': False},
+    'template_compile': {'server': False, 'scaled': True},
+}
+
+# Environment switches that would change what a scenario measures
+ISOLATED_ENV = ('GRAPHQL_RECORD', 'RESPONSE_CACHE', 'SAVE_GZIP', 'SAVE_FORMAT', 'PROFILE')
+
+@contextmanager
+def _quiet() -> Iterator[None]:
+    """Silence the scripts' progress output while they are being timed."""
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def run_scenario(name: str, scale: float, url: Optional[str]) -> Dict[str, Any]:
+    """Run one scenario in the current process and working directory."""
+    result: Dict[str, Any] = {'rows': None, 'parse_seconds': None}
+    started = time.perf_counter()
+
+    if name == 'smart_sweep':
+        import smart_fetch_data
+        smart_fetch_data.GRAPHQL_URL = url
+        with _quiet():
+            smart_fetch_data.main()
+
+    elif name == 'hasura_sweep':
+        import fetch_hasura_data
+        fetch_hasura_data.GRAPHQL_URL = url
+        with _quiet():
+            fetch_hasura_data.main()
+
+    elif name == 'export_answers':
+        from smart_fetch_data import SmartDataFetcher
+        with _quiet():
+            result['rows'] = SmartDataFetcher(url).export_table('answers_as_rows', folder='exports', resume=False)
+        parse_started = time.perf_counter()
+        with open(os.path.join('exports', 'answers_as_rows.ndjson'), 'rb') as f:
+            for line in f:
+                json.loads(line)
+        result['parse_seconds'] = time.perf_counter() - parse_started
+
+    elif name == 'schema_load':
+        from schema_model import SCHEMA_PATH
+        cold_started = time.perf_counter()
+        SchemaModel.load(SCHEMA_PATH, cache_dir='cache')
+        result['parse_seconds'] = time.perf_counter() - cold_started
+        warm_started = time.perf_counter()
+        SchemaModel.load(SCHEMA_PATH, cache_dir='cache')
+        result['warm_seconds'] = time.perf_counter() - warm_started
+
+    elif name == 'analyze_schema':
+        import analyze_schema
+        with _quiet():
+            analyze_schema.analyze_schema()
+
+    elif name == 'template_compile':
+        from template_index import TemplateCompiler, load_iauditor_templates
+        with open(os.path.join(SAMPLES_DIR, 'examination_templates_sample.json'), 'r', encoding='utf-8') as f:
+            samples = json.load(f)['data']['examination_templates']
+        # Distinct ids and revisions, so nothing is served from the compile cache
+        count = int(len(samples) * scale)
+        templates = []
+        for index in range(count):
+            template = dict(samples[index % len(samples)], id=index + 1)
+            template['mobile_template'] = dict(template.get('mobile_template') or {}, _rev=f"bench-{index}")
+            templates.append(template)
+        templates.extend(load_iauditor_templates(os.path.join(SAMPLES_DIR, 'iauditor_templates')))
+        compile_started = time.perf_counter()
+        TemplateCompiler().compile_many(templates)
+        result['parse_seconds'] = time.perf_counter() - compile_started
+        result['rows'] = len(templates)
+
+    else:
+        raise ValueError(f"Unknown scenario: {name}")
+
+    result['wall_seconds'] = time.perf_counter() - started
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+def _prepare_workdir(workdir: str):
+    """A scratch tree with the layout the scripts expect (sample_data/schema.json)."""
+    os.makedirs(os.path.join(workdir, 'sample_data'), exist_ok=True)
+    shutil.copy(os.path.join(SAMPLES_DIR, 'schema.json'), os.path.join(workdir, 'sample_data', 'schema.json'))
+
+def _run_child(name: str, scale: float, url: Optional[str], verbose: bool) -> Dict[str, Any]:
+    """Run a scenario in a fresh interpreter so peak RSS and module state are its own."""
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    try:
+        _prepare_workdir(workdir)
+        result_path = os.path.join(workdir, 'result.json')
+        env = {key: value for key, value in os.environ.items() if key not in ISOLATED_ENV}
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_DIR, env.get('PYTHONPATH')]))
+        command = [sys.executable, os.path.abspath(__file__), '--child', name, '--scale', str(scale),
+                   '--result-file', result_path]
+        if url:
+            command += ['--url', url]
+        completed = subprocess.run(command, cwd=workdir, env=env,
+                                   stdout=None if verbose else subprocess.DEVNULL,
+                                   stderr=None if verbose else subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{name} at {scale}x failed: {(completed.stderr or '').strip()[-500:]}")
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(scenarios: List[str], scales: List[float], latency: float = 0.0,
+              verbose: bool = False) -> Dict[str, Any]:
+    from synthetic_hasura import SyntheticHasura
+    # A scratch cache: load() evicts every other schema pickle in its cache_dir, including the real one
+    with tempfile.TemporaryDirectory(prefix="bench-schema-") as cache_dir:
+        schema = SchemaModel.load(os.path.join(SAMPLES_DIR, 'schema.json'), cache_dir=cache_dir)
+    results = []
+    for scale_index, scale in enumerate(scales):
+        print(f"\n📏 Scale {scale:g}x")
+        server = StandInServer(SyntheticHasura(schema, scale, SAMPLES_DIR), latency=latency).start()
+        try:
+            for name in scenarios:
+                spec = SCENARIOS[name]
+                if not spec['scaled'] and scale_index:
+                    continue
+                before = server.stats()
+                try:
+                    measured = _run_child(name, scale, server.url if spec['server'] else None, verbose)
+                except RuntimeError as e:
+                    print(f"❌ {name} - {e}")
+                    results.append({'scenario': name, 'scale': scale if spec['scaled'] else None, 'error': str(e)})
+                    continue
+                after = server.stats()
+                requests = after['requests'] - before['requests']
+                measured.update({
+                    'scenario': name,
+                    'scale': scale if spec['scaled'] else None,
+                    'requests': requests,
+                    'requests_per_second': round(requests / measured['wall_seconds'], 2) if requests else None,
+                    'bytes_received': after['bytes_sent'] - before['bytes_sent'],
+                    'bytes_sent': after['bytes_received'] - before['bytes_received'],
+                })
+                results.append(measured)
+                rate = f", {measured['requests_per_second']} req/s" if requests else ''
+                print(f"✅ {name} - {measured['wall_seconds']:.2f}s{rate}, peak {measured['peak_rss_mb']} MB")
+        finally:
+            server.stop()
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'latency_seconds': latency,
+        },
+        'results': results,
+    }
+
+def compare(old_path: str, new_path: str):
+    """Print the wall-time and peak-RSS change of every scenario present in both files."""
+    runs = []
+    for path in (old_path, new_path):
+        with open(path, 'r', encoding='utf-8') as f:
+            runs.append({(r['scenario'], r['scale']): r for r in json.load(f)['results'] if 'error' not in r})
+    old, new = runs
+    print(f"{'scenario':<18} {'scale':>6} {'old s':>9} {'new s':>9} {'change':>8} {'old MB':>8} {'new MB':>8}")
+    for key in sorted(set(old) & set(new), key=lambda k: (k[0], k[1] or 0)):
+        before, after = old[key], new[key]
+        change = (after['wall_seconds'] - before['wall_seconds']) / before['wall_seconds'] * 100
+        scale = f"{key[1]:g}x" if key[1] is not None else '-'
+        print(f"{key[0]:<18} {scale:>6} {before['wall_seconds']:>9.2f} {after['wall_seconds']:>9.2f} "
+              f"{change:>+7.1f}% {before['peak_rss_mb']:>8} {after['peak_rss_mb']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fetch and analysis pipeline against synthetic data.")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in SCALES),
+                        help="Comma-separated multiples of today's data volumes")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Latency the stand-in server adds per request")
+    parser.add_argument('--out', default=None, help="Results file (default: sample_data/benchmarks/<time>-<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two results files and exit")
+    parser.add_argument('--verbose', action='store_true', help="Show the scenarios' own output")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=float, default=1.0, help=argparse.SUPPRESS)
+    parser.add_argument('--url', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_scenario(args.child, args.scale, args.url)
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    scales = [float(scale) for scale in args.scales.split(',')]
+
+    print("⏱️  Benchmarking the pipeline against a synthetic stand-in endpoint...")
+    report = run_suite(scenarios, scales, args.latency_ms / 1000, args.verbose)
+
+    out = args.out or os.path.join(BENCHMARK_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['meta']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📋 Results saved to: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+GraphQL Cassettes
+Records every request/response pair a client makes to an NDJSON cassette, and looks them up again for replay.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+from response_cache import normalize_query
+
+# Set to a file path to record every request the fetch scripts make
+GRAPHQL_RECORD = os.environ.get('GRAPHQL_RECORD')
+
+def request_key(query: str, variables: Optional[Dict] = None) -> str:
+    """Match key for a request: the normalized query plus its variables."""
+    material = json.dumps({'query': normalize_query(query), 'variables': variables or {}},
+                          sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+def _open_text(filepath: str, mode: str):
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, mode + 't', encoding='utf-8')
+    return open(filepath, mode, encoding='utf-8')
+
+class CassetteRecorder:
+    """Appends one line per HTTP exchange: key, request, status, latency and response body.
+
+    Retries are recorded too, so a cassette shows what the server actually
+    did. Lines are flushed as they are written; several threads may share a
+    recorder.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        self._file = _open_text(filepath, 'a')
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['CassetteRecorder']:
+        """A recorder for GRAPHQL_RECORD, or None when recording is off."""
+        return cls(GRAPHQL_RECORD) if GRAPHQL_RECORD else None
+
+    def record(self, payload: Dict[str, Any], status: Optional[int], response: Any, latency: float):
+        entry = {
+            'key': request_key(payload.get('query', ''), payload.get('variables')),
+            'request': payload,
+            'status': status,
+            'latency': round(latency, 4),
+            'response': response,
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def load_cassettes(filepaths: List[str]) -> Dict[str, List[Tuple[int, Any]]]:
+    """Recorded (status, body) pairs per request key, in recording order.
+
+    Failed attempts (no status, or a non-200 status followed by a retry) are
+    kept; the replay server decides whether to serve them.
+    """
+    exchanges: Dict[str, List[Tuple[int, Any]]] = {}
+    for filepath in filepaths:
+        with _open_text(filepath, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry['status'] is None:
+                    continue
+                exchanges.setdefault(entry['key'], []).append((entry['status'], entry['response']))
+    return exchanges
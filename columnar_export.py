@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Columnar Export Format
+Stores a table as typed column arrays, with dictionary encoding for repeated strings,
+so analytics can load just the columns they need.
+"""
+
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple
+
+from json_writer import read_rows
+
+# v2 files store row groups and end with a footer; v1 files (one group, header first) are still read
+COLUMNAR_MAGIC = b'HCOL2\n'
+COLUMNAR_MAGIC_V1 = b'HCOL1\n'
+
+# Rows buffered and encoded together; memory use is bounded by one group, not the table
+ROW_GROUP_ROWS = 65536
+
+# Strings are dictionary-encoded when distinct values are at most this share of the non-null values
+DICTIONARY_MAX_RATIO = 0.5
+
+# Array typecodes: 64-bit ints, doubles, booleans as -1/0/1, dictionary codes (-1 = null)
+INT_CODE, FLOAT_CODE, BOOL_CODE, DICT_CODE = 'q', 'd', 'b', 'i'
+
+def _column_type(values: List[Any]) -> str:
+    """Narrowest column type that holds every non-null value."""
+    kinds = {type(value) for value in values if value is not None}
+    if not kinds:
+        return 'json'
+    if kinds == {bool}:
+        return 'bool'
+    if kinds == {int} and all(-(1 << 63) <= value < (1 << 63) for value in values if value is not None):
+        return 'int'
+    if kinds == {float}:
+        return 'float'
+    if kinds == {str}:
+        return 'string'
+    return 'json'
+
+def _encode_column(name: str, values: List[Any]) -> Tuple[Dict[str, Any], List[bytes]]:
+    """Column header entry plus the blobs to store for it (data first, then dictionary or nulls)."""
+    column_type = _column_type(values)
+    has_nulls = any(value is None for value in values)
+    entry: Dict[str, Any] = {'name': name, 'type': column_type, 'encoding': 'plain'}
+
+    if column_type == 'bool':
+        return entry, [array(BOOL_CODE, (-1 if value is None else int(value) for value in values)).tobytes()]
+
+    if column_type in ('int', 'float'):
+        code = INT_CODE if column_type == 'int' else FLOAT_CODE
+        blobs = [array(code, (0 if value is None else value for value in values)).tobytes()]
+        if has_nulls:
+            entry['nullable'] = True
+            blobs.append(bytes(value is None for value in values))
+        return entry, blobs
+
+    if column_type == 'string':
+        distinct: Dict[str, int] = {}
+        non_null = 0
+        for value in values:
+            if value is not None:
+                non_null += 1
+                distinct.setdefault(value, len(distinct))
+        if len(distinct) <= max(1, non_null * DICTIONARY_MAX_RATIO):
+            entry['encoding'] = 'dictionary'
+            codes = array(DICT_CODE, (-1 if value is None else distinct[value] for value in values))
+            return entry, [codes.tobytes(), json.dumps(list(distinct), ensure_ascii=False).encode('utf-8')]
+
+    # Unique strings, nested objects and mixed columns (ints with floats too) stay as a JSON list
+    return entry, [json.dumps(values, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')]
+
+def _encode_group(columns: Dict[str, List[Any]], f, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Write one row group's column blobs at `offset`; returns its column entries and the new offset."""
+    entries = []
+    for name, values in columns.items():
+        entry, column_blobs = _encode_column(name, values)
+        entry['blobs'] = []
+        for blob in column_blobs:
+            f.write(blob)
+            entry['blobs'].append([offset, len(blob)])
+            offset += len(blob)
+        entries.append(entry)
+    return entries, offset
+
+def write_columnar(rows: Iterable[Dict[str, Any]], filepath: str,
+                   row_group_rows: int = ROW_GROUP_ROWS) -> Dict[str, Any]:
+    """Write rows as a columnar file and return its footer.
+
+    Layout: magic, then the column blobs of each row group of up to
+    `row_group_rows` rows, then a JSON footer, its 8-byte length and the magic
+    again. Each group is encoded on its own (types and dictionaries are per
+    group) and written before the next is read. The footer records every
+    blob's offset and length, so a reader can seek straight to the columns it
+    wants.
+    """
+    names: Dict[str, None] = {}
+    groups = []
+    row_count = 0
+    offset = 0
+
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(COLUMNAR_MAGIC)
+        columns: Dict[str, List[Any]] = {}
+        group_rows = 0
+        for row in rows:
+            for name in row:
+                if name not in columns:
+                    columns[name] = [None] * group_rows
+                    names.setdefault(name)
+            for name, values in columns.items():
+                values.append(row.get(name))
+            group_rows += 1
+            if group_rows >= row_group_rows:
+                entries, offset = _encode_group(columns, f, offset)
+                groups.append({'rows': group_rows, 'columns': entries})
+                row_count += group_rows
+                columns = {name: [] for name in columns}
+                group_rows = 0
+        if group_rows:
+            entries, offset = _encode_group(columns, f, offset)
+            groups.append({'rows': group_rows, 'columns': entries})
+            row_count += group_rows
+
+        footer = {'rows': row_count, 'byteorder': sys.byteorder, 'columns': list(names), 'row_groups': groups}
+        footer_bytes = json.dumps(footer, ensure_ascii=False).encode('utf-8')
+        f.write(footer_bytes)
+        f.write(struct.pack('<Q', len(footer_bytes)))
+        f.write(COLUMNAR_MAGIC)
+    os.replace(tmp_path, filepath)
+    return footer
+
+def convert_export(source_path: str, filepath: Optional[str] = None) -> str:
+    """Convert an NDJSON or JSON export (see json_writer.read_rows) to the columnar format."""
+    if filepath is None:
+        base = source_path[:-len('.gz')] if source_path.endswith('.gz') else source_path
+        filepath = os.path.splitext(base)[0] + '.cols'
+    footer = write_columnar(read_rows(source_path), filepath)
+    print(f"Converted {footer['rows']} rows ({len(footer['columns'])} columns) to: {filepath}")
+    return filepath
+
+class ColumnarReader:
+    """Reads selected columns from a file written by write_columnar."""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        with open(filepath, 'rb') as f:
+            magic = f.read(len(COLUMNAR_MAGIC))
+            if magic == COLUMNAR_MAGIC:
+                self.data_start = f.tell()
+                f.seek(-(8 + len(COLUMNAR_MAGIC)), os.SEEK_END)
+                (footer_length,) = struct.unpack('<Q', f.read(8))
+                if f.read() != COLUMNAR_MAGIC:
+                    raise ValueError(f"{filepath} is truncated")
+                f.seek(-(footer_length + 8 + len(COLUMNAR_MAGIC)), os.SEEK_END)
+                self.header = json.loads(f.read(footer_length))
+            elif magic == COLUMNAR_MAGIC_V1:
+                (header_length,) = struct.unpack('<Q', f.read(8))
+                header = json.loads(f.read(header_length))
+                self.data_start = f.tell()
+                self.header = {'rows': header['rows'], 'byteorder': header['byteorder'],
+                               'columns': [entry['name'] for entry in header['columns']],
+                               'row_groups': [{'rows': header['rows'], 'columns': header['columns']}]}
+            else:
+                raise ValueError(f"{filepath} is not a columnar export")
+        self.rows = self.header['rows']
+        self.columns = list(self.header['columns'])
+
+    def _blob(self, f, offset_length: List[int]) -> bytes:
+        offset, length = offset_length
+        f.seek(self.data_start + offset)
+        return f.read(length)
+
+    def _array(self, code: str, data: bytes) -> array:
+        values = array(code)
+        values.frombytes(data)
+        if self.header['byteorder'] != sys.byteorder:
+            values.byteswap()
+        return values
+
+    def read_raw(self, name: str) -> List[Dict[str, Any]]:
+        """Undecoded column, one chunk per row group: typed array of values or codes, plus the
+        dictionary or null mask. A group without the column gets {'type': None, 'rows': n}.
+
+        This is the fast path for analytics: counting or grouping on a
+        dictionary-encoded column can work on the integer codes directly.
+        """
+        chunks = []
+        with open(self.filepath, 'rb') as f:
+            for group in self.header['row_groups']:
+                entry = next((entry for entry in group['columns'] if entry['name'] == name), None)
+                if entry is None:
+                    chunks.append({'type': None, 'encoding': None, 'rows': group['rows']})
+                    continue
+                blobs = [self._blob(f, blob) for blob in entry['blobs']]
+                raw: Dict[str, Any] = {'type': entry['type'], 'encoding': entry['encoding'], 'rows': group['rows']}
+                if entry['encoding'] == 'dictionary':
+                    raw['codes'] = self._array(DICT_CODE, blobs[0])
+                    raw['dictionary'] = json.loads(blobs[1])
+                elif entry['type'] == 'bool':
+                    raw['values'] = self._array(BOOL_CODE, blobs[0])
+                elif entry['type'] in ('int', 'float'):
+                    raw['values'] = self._array(INT_CODE if entry['type'] == 'int' else FLOAT_CODE, blobs[0])
+                    raw['nulls'] = blobs[1] if entry.get('nullable') else None
+                else:
+                    raw['values'] = json.loads(blobs[0])
+                chunks.append(raw)
+        return chunks
+
+    @staticmethod
+    def _decode(raw: Dict[str, Any]) -> List[Any]:
+        if raw['type'] is None:
+            return [None] * raw['rows']
+        if raw['encoding'] == 'dictionary':
+            dictionary = raw['dictionary']
+            return [None if code < 0 else dictionary[code] for code in raw['codes']]
+        if raw['type'] == 'bool':
+            return [None if value < 0 else bool(value) for value in raw['values']]
+        if raw['type'] in ('int', 'float'):
+            values = raw['values'].tolist()
+            if raw['nulls']:
+                return [None if is_null else value for value, is_null in zip(values, raw['nulls'])]
+            return values
+        return raw['values']
+
+    def read_column(self, name: str) -> List[Any]:
+        """One column decoded back to plain Python values."""
+        values: List[Any] = []
+        for raw in self.read_raw(name):
+            values.extend(self._decode(raw))
+        return values
+
+    def read(self, columns: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """Selected columns (all by default) as name -> list of values."""
+        names = columns or self.columns
+        missing = [name for name in names if name not in self.columns]
+        if missing:
+            raise KeyError(f"Unknown columns in {self.filepath}: {', '.join(missing)}")
+        return {name: self.read_column(name) for name in names}
+
+    def iter_rows(self, columns: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        data = self.read(columns)
+        names = list(data)
+        for values in zip(*data.values()):
+            yield dict(zip(names, values))
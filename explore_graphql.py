@@ -4,24 +4,30 @@ GraphQL API Explorer for Smart Inspector App
 This script connects to the GraphQL API, downloads the schema, and fetches sample data.
 """
 
-import requests
-import json
 import os
 from typing import Dict, Any, Optional
-import time
 
-# GraphQL endpoint from the documentation
-GRAPHQL_URL = "https://inspector-gql.tatweertransit.com/v1/graphql"
+from cassette import CassetteRecorder
+from graphql_client import GraphQLClient, GraphQLClientError
+from json_writer import write_json
+from profiling import run_main
+from query_metrics import export_metrics
+from query_validator import QueryValidator
+from rate_limiter import AdaptiveRateLimiter
+from response_cache import ResponseCache
+from schema_diff import refresh_schema
+
+# GraphQL endpoint from the documentation; GRAPHQL_URL points the script elsewhere (e.g. at replay_server.py)
+GRAPHQL_URL = os.environ.get('GRAPHQL_URL', "https://inspector-gql.tatweertransit.com/v1/graphql")
 
 class GraphQLExplorer:
     def __init__(self, url: str):
         self.url = url
-        self.session = requests.Session()
-        # Set up headers - might need authentication later
-        self.session.headers.update({
-            'Content-Type': 'application/json',
+        self.client = GraphQLClient(url, headers={
             'User-Agent': 'GraphQL-Explorer/1.0'
-        })
+        }, rate_limiter=AdaptiveRateLimiter(), validator=QueryValidator.from_schema_file(),
+            cache=ResponseCache.from_env(), recorder=CassetteRecorder.from_env())
+        self.session = self.client.session
     
     def introspect_schema(self) -> Optional[Dict[str, Any]]:
         """Download the full GraphQL schema using introspection."""
@@ -120,43 +126,23 @@ class GraphQLExplorer:
         """
         
         try:
-            response = self.session.post(
-                self.url,
-                json={'query': introspection_query},
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
+            return self.client.execute(introspection_query)
+        except GraphQLClientError as e:
             print(f"Error during schema introspection: {e}")
             return None
     
     def execute_query(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
         """Execute a GraphQL query with optional variables."""
-        payload = {'query': query}
-        if variables:
-            payload['variables'] = variables
-            
-        try:
-            response = self.session.post(
-                self.url,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"Error executing query: {e}")
-            return None
+        return self.client.execute_query(query, variables)
     
-    def save_json(self, data: Any, filename: str, folder: str = "sample_data"):
-        """Save data as JSON file in specified folder."""
+    def save_json(self, data: Any, filename: str, folder: str = "sample_data") -> str:
+        """Save data in specified folder, in the SAVE_FORMAT / SAVE_GZIP output format; returns the path written."""
         os.makedirs(folder, exist_ok=True)
         filepath = os.path.join(folder, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        filepath = write_json(data, filepath)
         print(f"Saved data to: {filepath}")
+        return filepath
 
 def main():
     explorer = GraphQLExplorer(GRAPHQL_URL)
@@ -183,8 +169,9 @@ def main():
     print("\n📊 Downloading GraphQL schema...")
     schema = explorer.introspect_schema()
     if schema:
-        explorer.save_json(schema, "schema.json")
         print("✅ Schema downloaded successfully")
+        # Only rewrites schema.json (and dependent caches) if the fingerprint changed
+        refresh_schema(schema)
     else:
         print("❌ Failed to download schema")
     
@@ -287,9 +274,6 @@ def main():
             print(f"✅ {query_info['name']} - Success")
         else:
             print(f"❌ {query_info['name']} - Failed")
-        
-        # Small delay between requests to be respectful
-        time.sleep(0.5)
     
     # Try to get some sample data from common tables
     print("\n📊 Exploring available data...")
@@ -362,11 +346,13 @@ def main():
             print(f"✅ {query_info['name']} - Data retrieved")
         else:
             print(f"❌ {query_info['name']} - No data or access denied")
-        
-        time.sleep(0.5)
+    
+    limiter = explorer.client.rate_limiter.snapshot()
+    print(f"\n⏱️  Request rate settled at {limiter['current_rate']} req/s ({len(limiter['decisions'])} adjustments)")
+    explorer.save_json(export_metrics(explorer.client.metrics), "query_metrics.json")
     
     print("\n🎉 GraphQL exploration completed!")
     print("📁 All data saved in the 'sample_data' folder")
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Export Checkpoints
+Page-level checkpoints and a manifest for long table exports, so an interrupted export resumes where it stopped.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Any, Optional, List, Callable
+
+from atomic_io import atomic_write_json
+
+MANIFEST_SUFFIX = ".manifest.json"
+PARTIAL_SUFFIX = ".partial"
+
+# Completed exports older than this many seconds are exported again instead of reused (0 keeps them)
+EXPORT_MAX_AGE = float(os.environ.get('EXPORT_MAX_AGE_HOURS', '24')) * 3600
+
+def count_lines(filepath: str) -> int:
+    """Count newline-terminated rows in a file without decoding it."""
+    lines = 0
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            lines += chunk.count(b'\n')
+    return lines
+
+class ExportCheckpoint:
+    """Tracks one table export in `{file}.manifest.json`.
+
+    Rows are appended to `{file}.partial`. After each page the data is fsynced
+    and the manifest (rows, byte offset, last key) is committed with an atomic
+    rename, so the manifest never claims more than is safely on disk. On a rerun
+    the partial file is cut back to the last committed offset, its row count is
+    verified against the manifest and the export continues after the last key.
+    The partial file is renamed to the final name once the table is exhausted.
+    """
+
+    def __init__(self, filepath: str, table_name: str, key: str, fields: List[str], page_size: int):
+        self.filepath = filepath
+        self.partial_path = filepath + PARTIAL_SUFFIX
+        self.manifest_path = filepath + MANIFEST_SUFFIX
+        self.table_name = table_name
+        self.key = key
+        self.fields = list(fields)
+        self.page_size = page_size
+        self.manifest: Dict[str, Any] = {}
+
+    def _fresh_manifest(self) -> Dict[str, Any]:
+        return {
+            'table': self.table_name,
+            'file': os.path.basename(self.filepath),
+            'key': self.key,
+            'fields': self.fields,
+            'page_size': self.page_size,
+            'status': 'in_progress',
+            'pages': 0,
+            'rows': 0,
+            'bytes': 0,
+            'last_key': None,
+            'started_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _commit(self):
+        self.manifest['updated_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        atomic_write_json(self.manifest, self.manifest_path)
+
+    def verify_complete(self) -> bool:
+        """True if a finished export on disk matches its manifest's size and row count."""
+        manifest = self._read_manifest()
+        if not manifest or manifest.get('status') != 'complete' or not os.path.exists(self.filepath):
+            return False
+        if (manifest['key'], manifest['fields']) != (self.key, self.fields):
+            return False
+        if os.path.getsize(self.filepath) != manifest['bytes'] or count_lines(self.filepath) != manifest['rows']:
+            print(f"⚠️  {self.filepath} does not match its manifest; exporting again")
+            return False
+        self.manifest = manifest
+        return True
+
+    def reusable(self, max_age: Optional[float] = EXPORT_MAX_AGE,
+                 live_count: Optional[Callable[[], int]] = None) -> bool:
+        """True if the finished export verifies, is younger than `max_age` seconds and,
+        when `live_count` is given, still has as many rows as the table."""
+        if not self.verify_complete():
+            return False
+        rows = self.manifest['rows']
+        age = time.time() - os.path.getmtime(self.filepath)
+        if max_age and age > max_age:
+            print(f"♻️  {self.filepath} is {age / 3600:.1f}h old (max {max_age / 3600:g}h); exporting again")
+            return False
+        checked = ''
+        if live_count is not None:
+            try:
+                live = live_count()
+            except RuntimeError as e:
+                live = None
+                checked = ', live count unavailable'
+                print(f"⚠️  Could not count {self.table_name} ({e}); reusing the export unchecked")
+            if live is not None and live != rows:
+                print(f"♻️  {self.filepath} has {rows} rows but {self.table_name} now has {live}; exporting again")
+                return False
+            if live is not None:
+                checked = ', count unchanged'
+        print(f"✅ {self.filepath} reused ({rows} rows, {age / 3600:.1f}h old{checked})")
+        return True
+
+    def begin(self, resume: bool = True) -> Any:
+        """Prepare the partial file for appending; returns the key to continue after (None to start over)."""
+        manifest = self._read_manifest() if resume else None
+        usable = (
+            manifest is not None
+            and manifest.get('status') == 'in_progress'
+            and (manifest['key'], manifest['fields']) == (self.key, self.fields)
+            and os.path.exists(self.partial_path)
+            and os.path.getsize(self.partial_path) >= manifest['bytes']
+        )
+        if usable:
+            # Drop whatever was written after the last committed page
+            with open(self.partial_path, 'r+b') as f:
+                f.truncate(manifest['bytes'])
+            if count_lines(self.partial_path) == manifest['rows']:
+                self.manifest = manifest
+                if manifest['rows']:
+                    print(f"⏩ Resuming {self.table_name} after {self.key}={manifest['last_key']!r} "
+                          f"({manifest['rows']} rows, {manifest['pages']} pages already on disk)")
+                return manifest['last_key']
+            print(f"⚠️  {self.partial_path} row count does not match its manifest; starting over")
+
+        self.manifest = self._fresh_manifest()
+        with open(self.partial_path, 'wb'):
+            pass
+        self._commit()
+        return None
+
+    def commit_page(self, f, rows: List[Dict[str, Any]]):
+        """Make a page durable, then record it in the manifest."""
+        self.commit_rows(f, len(rows), rows[-1][self.key])
+
+    def commit_rows(self, f, count: int, last_key: Any):
+        """Like commit_page, for writers that copy rows without decoding them."""
+        f.flush()
+        os.fsync(f.fileno())
+        self.manifest['pages'] += 1
+        self.manifest['rows'] += count
+        self.manifest['bytes'] = f.tell()
+        self.manifest['last_key'] = last_key
+        self._commit()
+
+    def finish(self):
+        """Publish the completed export under its final name."""
+        os.replace(self.partial_path, self.filepath)
+        self.manifest['status'] = 'complete'
+        self.manifest['completed_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        self._commit()
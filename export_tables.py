@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Full-Table Exporter
+Streams complete Hasura tables to NDJSON files using keyset pagination.
+"""
+
+import argparse
+import os
+
+from columnar_export import convert_export
+from export_checkpoint import EXPORT_MAX_AGE
+from fetch_scheduler import FetchScheduler, SHARD_ROWS, format_bytes
+from incremental_sync import SyncState, sync_table
+from profiling import run_main
+from sharded_export import ShardedExport
+from smart_fetch_data import SmartDataFetcher, GRAPHQL_URL, MAX_CONCURRENCY
+
+def main():
+    parser = argparse.ArgumentParser(description="Export whole Hasura tables to NDJSON.")
+    parser.add_argument('tables', nargs='+', help="Table names to export (e.g. answers_as_rows bus)")
+    parser.add_argument('--page-size', type=int, default=1000, help="Rows requested per page")
+    parser.add_argument('--key', default='id', help="Unique, orderable column used as the pagination key")
+    parser.add_argument('--out', default='sample_data/exports', help="Output folder for the NDJSON files")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fetch rows changed since the last run and merge them into the export")
+    parser.add_argument('--column', default=None,
+                        help="Watermark column for --incremental (default: updated_at, then created_at)")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore export checkpoints and start every table from the beginning")
+    parser.add_argument('--max-age-hours', type=float, default=EXPORT_MAX_AGE / 3600,
+                        help="Export completed tables again once they are older than this (0: reuse them "
+                             "while the row count matches)")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Also write a column-oriented .cols file next to each NDJSON export")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Split each table into this many key ranges and export them in parallel "
+                             f"(default: one shard per {SHARD_ROWS:,} rows)")
+    parser.add_argument('--partition', default=None,
+                        help="Shard by the distinct values of this column instead (e.g. contractor_id)")
+    parser.add_argument('--budget-seconds', type=float, default=None,
+                        help="Skip the remaining tables once they would not finish within this many seconds")
+    parser.add_argument('--budget-mb', type=float, default=None,
+                        help="Skip tables once the estimated download would exceed this many megabytes")
+    args = parser.parse_args()
+
+    fetcher = SmartDataFetcher(GRAPHQL_URL)
+
+    print("📦 Exporting full tables from Hasura...")
+    print(f"📡 API: {GRAPHQL_URL}")
+
+    # Estimate every table's size, then run them smallest first within the budget
+    scheduler = FetchScheduler(fetcher, budget_seconds=args.budget_seconds,
+                               budget_bytes=int(args.budget_mb * 1024 * 1024) if args.budget_mb else None)
+    tasks = scheduler.plan(args.tables)
+    for task in tasks:
+        size = f"{task['rows']} rows, ~{format_bytes(task['bytes'])}" if task['bytes'] is not None else "size unknown"
+        print(f"   {task['table']}: {size}" + (f", {task['shards']} shards" if task['shards'] > 1 else ''))
+
+    state = SyncState(args.out) if args.incremental else None
+    max_age = args.max_age_hours * 3600
+
+    def export(task):
+        table_name = task['table']
+        print(f"\n🔄 {'Syncing' if args.incremental else 'Exporting'}: {table_name}")
+        if args.incremental:
+            stats = sync_table(fetcher, table_name, folder=args.out, column=args.column,
+                               key=args.key, page_size=args.page_size, state=state)
+            print(f"   {stats['changed']} changed: {stats['updated']} updated, {stats['inserted']} new")
+            return stats['total']
+        shards = args.shards if args.shards > 1 else task['shards']
+        if shards > 1 or args.partition:
+            try:
+                return ShardedExport(fetcher, table_name, folder=args.out, key=args.key,
+                                     page_size=args.page_size, workers=MAX_CONCURRENCY, max_age=max_age).run(
+                    shards=shards, partition=args.partition, resume=not args.restart)
+            except ValueError as e:
+                if args.shards > 1 or args.partition:
+                    raise RuntimeError(str(e))
+                # Automatic sharding needs a numeric key with min/max; fall back to one cursor
+                print(f"   {e}; exporting with a single cursor")
+        return fetcher.export_table(table_name, folder=args.out, page_size=args.page_size,
+                                    key=args.key, resume=not args.restart, max_age=max_age)
+
+    def work(task):
+        rows = export(task)
+        if args.columnar:
+            convert_export(os.path.join(args.out, f"{task['table']}.ndjson"))
+        return rows
+
+    exported = {}
+    for table_name, outcome in scheduler.run(tasks, work).items():
+        if outcome['status'] == 'done':
+            exported[table_name] = outcome['result']
+            print(f"✅ {table_name} - {outcome['result']} rows in {outcome['seconds']:.1f}s")
+        elif outcome['status'] == 'failed':
+            print(f"❌ {table_name} - {outcome['error']}")
+
+    print(f"\n🎉 Export completed!")
+    print(f"✅ Tables exported: {len(exported)}/{len(args.tables)}")
+    print(f"📁 Files written to '{args.out}'")
+
+if __name__ == "__main__":
+    run_main(main)
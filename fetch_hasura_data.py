@@ -4,51 +4,47 @@ Hasura Data Fetcher
 Fetches sample data from all available tables and views in the Hasura GraphQL API.
 """
 
-import requests
-import json
 import os
 import time
 from typing import Dict, Any, Optional
 
-# GraphQL endpoint
-GRAPHQL_URL = "https://inspector-gql.tatweertransit.com/v1/graphql"
+from async_fetch import AsyncFetchEngine
+from cassette import CassetteRecorder
+from graphql_client import GraphQLClient
+from json_writer import write_json
+from profiling import run_main
+from query_metrics import export_metrics
+from rate_limiter import AdaptiveRateLimiter
+from response_cache import ResponseCache
+
+# GraphQL endpoint; GRAPHQL_URL points the script elsewhere (e.g. at replay_server.py)
+GRAPHQL_URL = os.environ.get('GRAPHQL_URL', "https://inspector-gql.tatweertransit.com/v1/graphql")
+
+# Maximum number of queries in flight at once during a sweep
+MAX_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', '6'))
 
 class HasuraDataFetcher:
     def __init__(self, url: str):
         self.url = url
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
+        self.client = GraphQLClient(url, headers={
             'User-Agent': 'Hasura-DataFetcher/1.0',
             'x-hasura-admin-secret': 'uWkEPKJUF9hqC6Bj'
-        })
+        }, pool_size=MAX_CONCURRENCY, rate_limiter=AdaptiveRateLimiter(),
+            cache=ResponseCache.from_env(), recorder=CassetteRecorder.from_env())
+        self.session = self.client.session
     
     def execute_query(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
         """Execute a GraphQL query with optional variables."""
-        payload = {'query': query}
-        if variables:
-            payload['variables'] = variables
-            
-        try:
-            response = self.session.post(
-                self.url,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"Error executing query: {e}")
-            return None
-    
-    def save_json(self, data: Any, filename: str, folder: str = "sample_data"):
-        """Save data as JSON file in specified folder."""
+        return self.client.execute_query(query, variables)
+    
+    def save_json(self, data: Any, filename: str, folder: str = "sample_data") -> str:
+        """Save data in specified folder, in the SAVE_FORMAT / SAVE_GZIP output format; returns the path written."""
         os.makedirs(folder, exist_ok=True)
         filepath = os.path.join(folder, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        filepath = write_json(data, filepath)
         print(f"Saved: {filepath}")
+        return filepath
 
 def main():
     fetcher = HasuraDataFetcher(GRAPHQL_URL)
@@ -90,11 +86,10 @@ def main():
     successful_queries = 0
     failed_queries = 0
     
-    print(f"\n📥 Fetching data from {len(tables_and_views)} tables/views...")
+    print(f"\n📥 Fetching data from {len(tables_and_views)} tables/views (concurrency {MAX_CONCURRENCY})...")
     
+    jobs = []
     for table_name in tables_and_views:
-        print(f"\n🔄 Fetching: {table_name}")
-        
         # Create a simple query to fetch first 10 records
         query = f"""
         query get{table_name.replace('_', '').title()} {{
@@ -103,42 +98,46 @@ def main():
           }}
         }}
         """
-        
-        result = fetcher.execute_query(query)
+        jobs.append({'kind': 'probe', 'table': table_name, 'query': query})
+    
+    # Try to get some aggregate counts
+    aggregate_tables = [
+        "bus", "drivers", "workorders", "api_mobile_inspections", 
+        "api_mobile_workorders", "notifications"
+    ]
+    
+    for table_name in aggregate_tables:
+        count_query = f"""
+        query get{table_name.replace('_', '').title()}Count {{
+          {table_name}_aggregate {{
+            aggregate {{
+              count
+            }}
+          }}
+        }}
+        """
+        jobs.append({'kind': 'count', 'table': table_name, 'query': count_query})
+    
+    engine = AsyncFetchEngine(fetcher.client, concurrency=MAX_CONCURRENCY)
+    # Probes and counts go out together; detail queries follow for non-empty tables
+    results = engine.run_all(jobs)
+    
+    detail_jobs = []
+    for job, result in results:
+        if job['kind'] != 'probe':
+            continue
+        table_name = job['table']
         
         if result and 'errors' not in result:
             # If successful, get the actual data with all fields
             if result.get('data', {}).get(table_name):
-                # Now fetch with introspection to get all fields
-                detailed_query = f"""
-                query get{table_name.replace('_', '').title()}Detailed {{
-                  {table_name}(limit: 10) {{
-                    ... on {table_name} {{
-                      __typename
-                    }}
-                  }}
-                }}
-                """
-                
                 # For now, let's just use a generic approach
                 simple_query = f"""
                 query get{table_name.replace('_', '').title()}Simple {{
                   {table_name}(limit: 10)
                 }}
                 """
-                
-                detailed_result = fetcher.execute_query(simple_query)
-                if detailed_result and 'errors' not in detailed_result:
-                    filename = f"{table_name}_sample.json"
-                    fetcher.save_json(detailed_result, filename)
-                    print(f"✅ {table_name} - Success ({len(detailed_result.get('data', {}).get(table_name, []))} records)")
-                    successful_queries += 1
-                else:
-                    print(f"❌ {table_name} - Failed to get detailed data")
-                    if detailed_result and 'errors' in detailed_result:
-                        error_msg = detailed_result['errors'][0].get('message', 'Unknown error')
-                        print(f"   Error: {error_msg}")
-                    failed_queries += 1
+                detail_jobs.append({'kind': 'detail', 'table': table_name, 'query': simple_query})
             else:
                 print(f"✅ {table_name} - Empty table")
                 filename = f"{table_name}_empty.json"
@@ -153,32 +152,29 @@ def main():
                 filename = f"{table_name}_error.json"
                 fetcher.save_json(result, filename)
             failed_queries += 1
-        
-        # Small delay to be respectful to the API
-        time.sleep(0.2)
     
-    # Try to get some aggregate counts
-    print(f"\n📊 Fetching aggregate data...")
+    detail_results = engine.run_all(detail_jobs)
     
-    aggregate_tables = [
-        "bus", "drivers", "workorders", "api_mobile_inspections", 
-        "api_mobile_workorders", "notifications"
-    ]
+    for job, detailed_result in detail_results:
+        table_name = job['table']
+        if detailed_result and 'errors' not in detailed_result:
+            filename = f"{table_name}_sample.json"
+            fetcher.save_json(detailed_result, filename)
+            print(f"✅ {table_name} - Success ({len(detailed_result.get('data', {}).get(table_name, []))} records)")
+            successful_queries += 1
+        else:
+            print(f"❌ {table_name} - Failed to get detailed data")
+            if detailed_result and 'errors' in detailed_result:
+                error_msg = detailed_result['errors'][0].get('message', 'Unknown error')
+                print(f"   Error: {error_msg}")
+            failed_queries += 1
     
-    for table_name in aggregate_tables:
-        print(f"\n🔄 Getting count for: {table_name}")
-        
-        count_query = f"""
-        query get{table_name.replace('_', '').title()}Count {{
-          {table_name}_aggregate {{
-            aggregate {{
-              count
-            }}
-          }}
-        }}
-        """
-        
-        result = fetcher.execute_query(count_query)
+    print(f"\n📊 Aggregate data...")
+    
+    for job, result in results:
+        if job['kind'] != 'count':
+            continue
+        table_name = job['table']
         
         if result and 'errors' not in result:
             filename = f"{table_name}_count.json"
@@ -189,12 +185,17 @@ def main():
         else:
             print(f"❌ {table_name} - Count failed")
             failed_queries += 1
-        
-        time.sleep(0.2)
     
     print(f"\n🎉 Data fetching completed!")
     print(f"✅ Successful queries: {successful_queries}")
     print(f"❌ Failed queries: {failed_queries}")
+    print(f"⏱️  Request rate settled at {fetcher.client.rate_limiter.rate:.2f} req/s")
+    if fetcher.client.cache:
+        cache = fetcher.client.cache.snapshot()
+        print(f"💾 Response cache: {cache['hits']} hits, {cache['misses']} misses")
+    latency = fetcher.client.metrics.report()['total']['latency']
+    if latency['p95'] is not None:
+        print(f"📈 Request latency p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, p99 {latency['p99']:.2f}s")
     print(f"📁 All data saved in the 'sample_data' folder")
     
     # Create a summary file
@@ -204,11 +205,14 @@ def main():
         "successful_queries": successful_queries,
         "failed_queries": failed_queries,
         "tables_and_views": tables_and_views,
-        "fetch_timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        "fetch_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "rate_limiter": fetcher.client.rate_limiter.snapshot(),
+        "response_cache": fetcher.client.cache.snapshot() if fetcher.client.cache else None,
+        "query_metrics": export_metrics(fetcher.client.metrics)
     }
     
-    fetcher.save_json(summary, "fetch_summary.json")
-    print(f"📋 Summary saved to: sample_data/fetch_summary.json")
+    summary_path = fetcher.save_json(summary, "fetch_summary.json")
+    print(f"📋 Summary saved to: {summary_path}")
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
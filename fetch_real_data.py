@@ -4,49 +4,43 @@ Fetch Real Data Script
 Uses the actual schema to fetch sample data from the GraphQL API.
 """
 
-import requests
-import json
 import os
 from typing import Dict, Any, Optional
 
-# GraphQL endpoint
-GRAPHQL_URL = "https://inspector-gql.tatweertransit.com/v1/graphql"
+from aggregate_planner import AggregatePlanner
+from cassette import CassetteRecorder
+from graphql_client import GraphQLClient
+from json_writer import write_json
+from profiling import run_main
+from query_metrics import export_metrics
+from query_validator import QueryValidator
+from rate_limiter import AdaptiveRateLimiter
+from response_cache import ResponseCache
+
+# GraphQL endpoint; GRAPHQL_URL points the script elsewhere (e.g. at replay_server.py)
+GRAPHQL_URL = os.environ.get('GRAPHQL_URL', "https://inspector-gql.tatweertransit.com/v1/graphql")
 
 class RealDataFetcher:
     def __init__(self, url: str):
         self.url = url
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
+        self.client = GraphQLClient(url, headers={
             'User-Agent': 'GraphQL-DataFetcher/1.0'
-        })
+        }, rate_limiter=AdaptiveRateLimiter(), validator=QueryValidator.from_schema_file(),
+            cache=ResponseCache.from_env(), recorder=CassetteRecorder.from_env())
+        self.session = self.client.session
     
     def execute_query(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
         """Execute a GraphQL query with optional variables."""
-        payload = {'query': query}
-        if variables:
-            payload['variables'] = variables
-            
-        try:
-            response = self.session.post(
-                self.url,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"Error executing query: {e}")
-            return None
+        return self.client.execute_query(query, variables)
     
-    def save_json(self, data: Any, filename: str, folder: str = "sample_data"):
-        """Save data as JSON file in specified folder."""
+    def save_json(self, data: Any, filename: str, folder: str = "sample_data") -> str:
+        """Save data in specified folder, in the SAVE_FORMAT / SAVE_GZIP output format; returns the path written."""
         os.makedirs(folder, exist_ok=True)
         filepath = os.path.join(folder, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        filepath = write_json(data, filepath)
         print(f"Saved data to: {filepath}")
+        return filepath
 
 def main():
     fetcher = RealDataFetcher(GRAPHQL_URL)
@@ -253,56 +247,31 @@ def main():
     # Try to get some aggregate data
     print(f"\n📊 Fetching aggregate data...")
     
-    aggregate_queries = [
-        {
-            "name": "buses_aggregate",
-            "query": """
-            query getBusesAggregate {
-              bus_aggregate {
-                aggregate {
-                  count
-                }
-                nodes {
-                  status
-                }
-              }
-            }
-            """
-        },
-        {
-            "name": "inspections_aggregate",
-            "query": """
-            query getInspectionsAggregate {
-              api_mobile_inspections_aggregate {
-                aggregate {
-                  count
-                }
-                nodes {
-                  status
-                }
-              }
-            }
-            """
-        }
+    # Group-by counts are pushed down to Hasura as _aggregate queries, one per distinct value
+    aggregate_requests = [
+        {"name": "buses_aggregate", "table": "bus", "column": "current_contractor_id"},
+        {"name": "inspections_aggregate", "table": "api_mobile_inspections", "column": "status"},
     ]
     
-    for query_info in aggregate_queries:
-        print(f"\n🔄 Fetching: {query_info['name']}")
-        result = fetcher.execute_query(query_info['query'])
-        
-        if result and 'errors' not in result:
-            filename = f"{query_info['name']}.json"
-            fetcher.save_json(result, filename)
-            print(f"✅ {query_info['name']} - Success")
+    validator = fetcher.client.validator
+    planner = AggregatePlanner(fetcher.execute_query, schema=validator.schema if validator else None)
+    for request, summary in zip(aggregate_requests, planner.run(aggregate_requests)):
+        print(f"\n🔄 Fetching: {request['name']} (count by {request['column']})")
+        if 'error' not in summary:
+            filename = f"{request['name']}.json"
+            fetcher.save_json(summary, filename)
+            print(f"✅ {request['name']} - Success ({len(summary['groups'])} groups, total {summary.get('total', 0)})")
             successful_queries += 1
         else:
-            print(f"❌ {query_info['name']} - Failed")
+            print(f"❌ {request['name']} - Failed")
+            print(f"   Error: {summary['error']}")
             failed_queries += 1
     
     print(f"\n🎉 Data fetching completed!")
     print(f"✅ Successful queries: {successful_queries}")
     print(f"❌ Failed queries: {failed_queries}")
+    fetcher.save_json(export_metrics(fetcher.client.metrics), "query_metrics.json")
     print(f"📁 All data saved in the 'sample_data' folder")
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Cost-Based Fetch Scheduler
+Estimates each table's size up front, then fetches small tables first, shards big ones and stops at a budget.
+"""
+
+import json
+import math
+import threading
+import time
+from typing import Dict, Any, Optional, List, Callable
+
+from query_batching import QueryBatcher
+from template_sync import TEMPLATE_TABLES
+
+# Rows read per table to estimate the average row size
+PROBE_ROWS = 3
+
+# Tables not probed: a few rows of their jsonb template bodies weigh megabytes
+UNPROBED_TABLES = set(TEMPLATE_TABLES)
+
+# Size charged against the budget for a table whose size could not be estimated
+UNKNOWN_TABLE_BYTES = 100 * 1024 * 1024
+
+# Seconds between progress lines while a table is running
+PROGRESS_INTERVAL = 30.0
+
+# Tables with more rows than this are split into shards of about this size
+SHARD_ROWS = 200_000
+
+# Never split a table into more shards than this
+MAX_SHARDS = 8
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{int(size)} B"
+        size /= 1024
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+def estimate_costs(fetcher, tables: List[str], probe_rows: int = PROBE_ROWS,
+                   batch_size: int = 10) -> Dict[str, Dict[str, Any]]:
+    """Row count, average row size and estimated bytes per table.
+
+    Counts come from `<table>_aggregate`, row sizes from a `limit: probe_rows`
+    read of every column; both go out as batched aliased queries. Tables in
+    UNPROBED_TABLES are only counted. A table whose count or row size is
+    unknown gets `bytes: None` and sorts last.
+    """
+    selections = []
+    for table_name in tables:
+        selections.append({'kind': 'count', 'table': table_name, 'field': f'{table_name}_aggregate',
+                           'args': None, 'selection': 'aggregate {\n      count\n    }'})
+        fields = fetcher.get_type_fields(table_name, max_fields=None) if table_name not in UNPROBED_TABLES else []
+        if fields:
+            selections.append({'kind': 'probe', 'table': table_name, 'field': table_name,
+                               'args': f'limit: {probe_rows}', 'selection': '\n    '.join(fields)})
+
+    costs = {table_name: {'table': table_name, 'rows': None, 'row_bytes': None, 'bytes': None}
+             for table_name in tables}
+    for selection, result in QueryBatcher(fetcher.execute_query, batch_size=batch_size).run(selections):
+        cost = costs[selection['table']]
+        if not result or 'errors' in result:
+            cost['error'] = result['errors'][0].get('message', 'Unknown error') if result else 'No response'
+            continue
+        payload = result.get('data', {}).get(selection['field'])
+        if selection['kind'] == 'count':
+            cost['rows'] = ((payload or {}).get('aggregate') or {}).get('count')
+        elif payload:
+            sample = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            cost['row_bytes'] = len(sample) / len(payload)
+        else:
+            cost['row_bytes'] = 0.0
+
+    for cost in costs.values():
+        if cost['rows'] is not None and cost['row_bytes'] is not None:
+            cost['bytes'] = int(cost['rows'] * cost['row_bytes'])
+    return costs
+
+def charged_bytes(task: Dict[str, Any]) -> int:
+    """Bytes a task counts for in budgets and ETAs; unknown sizes are charged UNKNOWN_TABLE_BYTES."""
+    return UNKNOWN_TABLE_BYTES if task['bytes'] is None else task['bytes']
+
+class FetchScheduler:
+    """Orders per-table work by estimated cost and enforces a time or byte budget.
+
+    Tables run smallest first, so a budget cuts off the largest tables rather
+    than whichever happened to be listed last. Tables over `shard_rows` rows
+    get a shard count for the work function to use. Before and after every
+    table, and every `progress_interval` seconds while one runs, the scheduler
+    prints progress and an ETA based on the bytes per second seen so far; a
+    table is skipped when it no longer fits the remaining budget. Tables of
+    unknown size are charged UNKNOWN_TABLE_BYTES, so a budget still applies.
+    """
+
+    def __init__(self, fetcher, budget_seconds: Optional[float] = None, budget_bytes: Optional[int] = None,
+                 shard_rows: int = SHARD_ROWS, max_shards: int = MAX_SHARDS,
+                 progress_interval: float = PROGRESS_INTERVAL):
+        self.fetcher = fetcher
+        self.progress_interval = progress_interval
+        self.budget_seconds = budget_seconds
+        self.budget_bytes = budget_bytes
+        self.shard_rows = shard_rows
+        self.max_shards = max_shards
+
+    def plan(self, tables: List[str], costs: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Tasks in execution order: known sizes ascending, then unknown sizes in the given order."""
+        if costs is None:
+            costs = estimate_costs(self.fetcher, tables)
+        tasks = []
+        for position, table_name in enumerate(tables):
+            cost = dict(costs[table_name])
+            rows = cost['rows'] or 0
+            cost['shards'] = min(self.max_shards, max(1, math.ceil(rows / self.shard_rows)))
+            cost['position'] = position
+            tasks.append(cost)
+        tasks.sort(key=lambda task: (task['bytes'] is None, task['bytes'] or 0, task['position']))
+        return tasks
+
+    def _over_budget(self, task: Dict[str, Any], elapsed: float, spent_bytes: int, rate: Optional[float]) -> Optional[str]:
+        size = charged_bytes(task)
+        if self.budget_bytes is not None and spent_bytes + size > self.budget_bytes:
+            return f"byte budget ({format_bytes(spent_bytes)} of {format_bytes(self.budget_bytes)} used)"
+        if self.budget_seconds is not None:
+            predicted = size / rate if rate else 0.0
+            if elapsed + predicted > self.budget_seconds:
+                return f"time budget ({format_duration(elapsed)} of {format_duration(self.budget_seconds)} used)"
+        return None
+
+    def _progress(self, done: int, total: int, done_bytes: float, total_bytes: int, elapsed: float,
+                  running: str = '') -> str:
+        remaining = total_bytes - done_bytes
+        if remaining <= 0:
+            eta = '0s'
+        else:
+            eta = format_duration(remaining * elapsed / done_bytes) if done_bytes else 'unknown'
+        return (f"⏳ {done}/{total} tables{running}, "
+                f"{format_bytes(done_bytes)} of ~{format_bytes(total_bytes)} "
+                f"in {format_duration(elapsed)}, ETA {eta}")
+
+    def run(self, tasks: List[Dict[str, Any]], work: Callable[[Dict[str, Any]], Any]) -> Dict[str, Dict[str, Any]]:
+        """Call `work(task)` for each task in order; returns a per-table outcome.
+
+        Each outcome is {'status': 'done' | 'failed' | 'skipped', 'result' or
+        'error', 'seconds'}. An exception from `work` fails only that table.
+        """
+        started = time.time()
+        total_bytes = sum(charged_bytes(task) for task in tasks)
+        done_bytes = 0
+        outcomes = {}
+        for index, task in enumerate(tasks, 1):
+            table_name = task['table']
+            elapsed = time.time() - started
+            rate = done_bytes / elapsed if done_bytes and elapsed > 0 else None
+            reason = self._over_budget(task, elapsed, done_bytes, rate)
+            if reason:
+                size = f"~{format_bytes(task['bytes'])}" if task['bytes'] is not None else "unknown size"
+                print(f"⏭️  {table_name} - skipped, {size} would exceed the {reason}")
+                outcomes[table_name] = {'status': 'skipped', 'error': reason, 'seconds': 0.0}
+                total_bytes -= charged_bytes(task)
+                continue
+
+            # Live ETA while the table runs, crediting it at the throughput seen so far
+            task_started = time.time()
+            stop = threading.Event()
+
+            def report_progress():
+                while not stop.wait(self.progress_interval):
+                    now = time.time()
+                    credit = min(charged_bytes(task), rate * (now - task_started)) if rate else 0
+                    print(self._progress(index - 1, len(tasks), done_bytes + credit, total_bytes, now - started,
+                                         f", {table_name} running {format_duration(now - task_started)}"))
+
+            ticker = threading.Thread(target=report_progress, name='scheduler-progress', daemon=True)
+            ticker.start()
+            try:
+                outcomes[table_name] = {'status': 'done', 'result': work(task)}
+            except Exception as e:
+                # One table's failure, whatever it is, must not end the whole run
+                error = str(e) if isinstance(e, RuntimeError) else f"{type(e).__name__}: {e}"
+                outcomes[table_name] = {'status': 'failed', 'error': error}
+            finally:
+                stop.set()
+                ticker.join()
+            outcomes[table_name]['seconds'] = time.time() - task_started
+            done_bytes += charged_bytes(task)
+            print(self._progress(index, len(tasks), done_bytes, total_bytes, time.time() - started))
+        return outcomes
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Shared GraphQL Client
+Pooled, compressed, retrying HTTP client used by every fetch script.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cassette import CassetteRecorder
+from profiling import phase
+from query_metrics import QueryMetrics
+from query_validator import QueryValidator
+from rate_limiter import AdaptiveRateLimiter
+from response_cache import ResponseCache, hasura_role
+
+# HTTP statuses worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Transport errors worth retrying; any other requests exception fails the call at once
+RETRYABLE_ERRORS = (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ContentDecodingError)
+
+# Longest Retry-After (seconds) honoured; a server asking for more gets retried after this
+RETRY_AFTER_MAX = 60.0
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """The response's Retry-After header in seconds (delta-seconds or HTTP-date), or None."""
+    value = (response.headers.get('Retry-After') or '').strip()
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError):
+            return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+class GraphQLClientError(Exception):
+    """Raised when a request fails for good (after retries, or on a non-retryable error)."""
+
+    def __init__(self, message: str, status: Optional[int] = None, attempts: int = 0):
+        super().__init__(message)
+        self.status = status
+        self.attempts = attempts
+
+class CircuitOpenError(GraphQLClientError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """Stops hammering an endpoint that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and every call
+    fails fast. Once `reset_timeout` seconds have passed a single trial call is let
+    through (half-open); success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            # Half-open: this caller makes the trial call, everyone else keeps failing fast
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+class GraphQLClient:
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None,
+                 pool_size: int = 10, timeout: float = 30, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 breaker: Optional[CircuitBreaker] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 validator: Optional[QueryValidator] = None,
+                 cache: Optional[ResponseCache] = None,
+                 recorder: Optional[CassetteRecorder] = None,
+                 metrics: Optional[QueryMetrics] = None):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.rate_limiter = rate_limiter
+        self.validator = validator
+        self.cache = cache
+        self.recorder = recorder
+        self.metrics = metrics or QueryMetrics()
+
+        self.session = requests.Session()
+        # One keep-alive pool sized for the number of concurrent callers
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        self.session.headers.update(headers or {})
+        self.role = hasura_role(self.session.headers)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, payload: Dict[str, Any], stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """POST a GraphQL payload, retrying timeouts, connection errors, 429 and 5xx.
+        
+        A Retry-After header on a retryable response is the least the next
+        attempt waits, and holds back the shared rate limiter for as long.
+        
+        `stats`, if given, is filled with the attempts made, the last HTTP
+        status and the request/response bytes of the last attempt.
+        """
+        stats = stats if stats is not None else {}
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {self.url}; not sending request")
+
+        last_error = None
+        last_status = None
+        attempts = 0
+        retry_after = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                if not self.breaker.allow():
+                    break
+                time.sleep(max(self.backoff_delay(attempt - 1), retry_after or 0.0))
+                retry_after = None
+            attempts += 1
+            stats['attempts'] = attempts
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            started = time.monotonic()
+            try:
+                with phase('network'):
+                    response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                last_error, last_status = e, None
+                stats['status'] = None
+                if self.recorder:
+                    self.recorder.record(payload, None, str(e), time.monotonic() - started)
+                self.breaker.record_failure()
+                if self.rate_limiter:
+                    self.rate_limiter.record(None)
+                if not isinstance(e, RETRYABLE_ERRORS):
+                    # Redirect loops, invalid URLs and the like will not get better by retrying
+                    raise GraphQLClientError(str(e), None, attempts) from e
+                continue
+            if self.rate_limiter:
+                self.rate_limiter.record(time.monotonic() - started, response.status_code)
+            stats['status'] = response.status_code
+            stats['request_bytes'] = len(response.request.body or b'')
+            # On the wire, i.e. compressed when the server gzipped it
+            stats['response_bytes'] = int(response.headers.get('Content-Length') or len(response.content))
+
+            if self.recorder:
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = response.text
+                self.recorder.record(payload, response.status_code, body, time.monotonic() - started)
+
+            if response.status_code in RETRYABLE_STATUSES:
+                last_error, last_status = f"HTTP {response.status_code}", response.status_code
+                self.breaker.record_failure()
+                retry_after = retry_after_seconds(response)
+                if retry_after and self.rate_limiter:
+                    self.rate_limiter.hold(retry_after)
+                continue
+
+            try:
+                response.raise_for_status()
+                with phase('parse'):
+                    result = response.json()
+            except (requests.HTTPError, ValueError) as e:
+                # 4xx and unparseable bodies will not get better by retrying
+                self.breaker.record_success()
+                raise GraphQLClientError(str(e), response.status_code, attempts) from e
+
+            self.breaker.record_success()
+            return result
+
+        raise GraphQLClientError(f"Giving up after {attempts} attempts: {last_error}",
+                                 last_status, attempts)
+
+    def preflight(self, query: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Validate a query locally; returns (query to send, None) or (None, error response)."""
+        report = self.validator.validate(query)
+        for change in report['repairs']:
+            print(f"   🔧 Repaired query: {change}")
+        if report['errors'] and self.validator.mode == 'check':
+            for error in report['errors']:
+                print(f"   ⚠️  {error['message']}")
+        if not report['valid'] and self.validator.mode != 'check':
+            # Same shape as a Hasura validation error, but it never left the machine
+            return None, QueryValidator.error_response(report['errors'])
+        return report['query'], None
+
+    def execute(self, query: str, variables: Optional[Dict] = None) -> Dict[str, Any]:
+        """Execute a GraphQL query; raises GraphQLClientError on failure.
+        
+        With a response cache, a fresh cached response is returned without
+        validating or sending the query. Every call is recorded in `metrics`.
+        """
+        stats: Dict[str, Any] = {}
+        started = time.monotonic()
+        try:
+            result = self._execute(query, variables, stats)
+        except GraphQLClientError as e:
+            self.metrics.record(query, None, time.monotonic() - started, stats, error=e)
+            raise
+        self.metrics.record(query, result, time.monotonic() - started, stats)
+        return result
+
+    def _execute(self, query: str, variables: Optional[Dict], stats: Dict[str, Any]) -> Dict[str, Any]:
+        if self.cache:
+            cached = self.cache.get(query, variables, self.role, self.url)
+            if cached is not None:
+                stats['cached'] = True
+                return cached
+        original_query = query
+        if self.validator:
+            query, rejection = self.preflight(query)
+            if rejection:
+                stats['rejected'] = True
+                return rejection
+        payload = {'query': query}
+        if variables:
+            payload['variables'] = variables
+        result = self.post(payload, stats)
+        if self.cache:
+            self.cache.put(original_query, variables, result, self.role, self.url)
+        return result
+
+    def execute_query(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """Execute a GraphQL query, returning None (and logging why) on failure."""
+        try:
+            return self.execute(query, variables)
+        except GraphQLClientError as e:
+            print(f"Error executing query: {e}")
+            return None
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Incremental Table Sync
+Keeps per-table high-water marks and merges only changed rows into existing NDJSON exports.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Any, Optional, List, Iterator
+
+SYNC_STATE_FILE = "sync_state.json"
+
+# Preferred watermark columns, in order; the first one the table has is used
+WATERMARK_COLUMNS = ['updated_at', 'created_at']
+
+class SyncState:
+    """Per-table watermarks stored as one small JSON file next to the exports."""
+
+    def __init__(self, folder: str = "sample_data/exports"):
+        self.path = os.path.join(folder, SYNC_STATE_FILE)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.tables: Dict[str, Dict[str, Any]] = json.load(f)
+        except FileNotFoundError:
+            self.tables = {}
+
+    def get(self, table_name: str) -> Optional[Dict[str, Any]]:
+        return self.tables.get(table_name)
+
+    def update(self, table_name: str, entry: Dict[str, Any]):
+        """Record a table's new watermark and persist the state atomically."""
+        self.tables[table_name] = entry
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.tables, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.path)
+
+def iter_changed_pages(fetcher, table_name: str, column: str, since: Any = None, since_key: Any = None,
+                       fields: Optional[List[str]] = None, page_size: int = 1000,
+                       key: str = 'id', null_key: Any = None) -> Iterator[List[Dict[str, Any]]]:
+    """Keyset-paginate rows ordered by (column, key), starting after the (since, since_key) mark.
+
+    Without a mark the whole table is walked: rows with a watermark first, then
+    the rows whose watermark column is NULL (Postgres sorts those last), by key.
+    With one, rows changed after it are returned, followed by the NULL-watermark
+    rows with a key above `null_key` (all of them when it is None): those are
+    new rows that never got a watermark. A NULL row whose key is not new is not
+    seen again; only a full resync picks up rows whose watermark was cleared.
+    A key-only mark (no watermark, as left by a table whose column is all NULL)
+    returns the rows with a larger key.
+    """
+    if fields is None:
+        fields = fetcher.get_type_fields(table_name, max_fields=None)
+    fields = [name for name in (key, column) if name not in fields] + list(fields)
+
+    column_type = fetcher.get_field_type(table_name, column) or 'timestamptz'
+    key_type = fetcher.get_field_type(table_name, key) or 'bigint'
+    fields_str = '\n    '.join(fields)
+    operation = f"sync{table_name.replace('_', '').title()}"
+
+    changed_query = f"""
+    query {operation}($since: {column_type}!, $last: {key_type}!, $limit: Int!) {{
+      {table_name}(limit: $limit, order_by: [{{{column}: asc}}, {{{key}: asc}}],
+                   where: {{_or: [{{{column}: {{_gt: $since}}}},
+                                  {{{column}: {{_eq: $since}}, {key}: {{_gt: $last}}}}]}}) {{
+        {fields_str}
+      }}
+    }}
+    """
+    first_query = f"""
+    query {operation}First($limit: Int!) {{
+      {table_name}(limit: $limit, order_by: [{{{column}: asc}}, {{{key}: asc}}]) {{
+        {fields_str}
+      }}
+    }}
+    """
+    null_tail_query = f"""
+    query {operation}Nulls($last: {key_type}!, $limit: Int!) {{
+      {table_name}(limit: $limit, order_by: {{{key}: asc}},
+                   where: {{{column}: {{_is_null: true}}, {key}: {{_gt: $last}}}}) {{
+        {fields_str}
+      }}
+    }}
+    """
+    null_first_query = f"""
+    query {operation}NullsFirst($limit: Int!) {{
+      {table_name}(limit: $limit, order_by: {{{key}: asc}}, where: {{{column}: {{_is_null: true}}}}) {{
+        {fields_str}
+      }}
+    }}
+    """
+    key_query = f"""
+    query {operation}Keys($last: {key_type}!, $limit: Int!) {{
+      {table_name}(limit: $limit, order_by: {{{key}: asc}}, where: {{{key}: {{_gt: $last}}}}) {{
+        {fields_str}
+      }}
+    }}
+    """
+
+    full_pull = since is None and since_key is None
+    if full_pull:
+        mode = 'first'
+    else:
+        mode = 'changed' if since is not None else 'keys'
+    while True:
+        if mode == 'nulls':
+            if since_key is None:
+                query, variables = null_first_query, {'limit': page_size}
+            else:
+                query, variables = null_tail_query, {'last': since_key, 'limit': page_size}
+        elif mode == 'keys':
+            query, variables = key_query, {'last': since_key, 'limit': page_size}
+        elif mode == 'first':
+            query, variables = first_query, {'limit': page_size}
+        else:
+            query, variables = changed_query, {'since': since, 'last': since_key, 'limit': page_size}
+
+        result = fetcher.execute_query(query, variables)
+        if not result or 'errors' in result:
+            error_msg = result['errors'][0].get('message', 'Unknown error') if result else 'No response'
+            raise RuntimeError(f"Sync of {table_name} failed after ({since!r}, {since_key!r}): {error_msg}")
+
+        rows = result.get('data', {}).get(table_name) or []
+        if rows:
+            yield rows
+        last_row = rows[-1] if rows else None
+
+        if mode in ('nulls', 'keys'):
+            if len(rows) < page_size:
+                return
+            since_key = last_row[key]
+            continue
+        if last_row is not None and last_row[column] is None:
+            # The unfiltered first page ran into the NULL tail; finish it by key alone
+            if len(rows) < page_size:
+                return
+            mode, since_key = 'nulls', last_row[key]
+            continue
+        if len(rows) < page_size:
+            if mode == 'changed':
+                # The watermark filter never matches NULL; those rows still have to be pulled
+                mode, since_key = 'nulls', None if full_pull else null_key
+                continue
+            return
+        mode = 'changed'
+        since, since_key = last_row[column], last_row[key]
+
+def merge_ndjson(filepath: str, changed_rows: Dict[Any, Dict[str, Any]], key: str = 'id') -> Dict[str, int]:
+    """Merge changed rows (keyed by `key`) into an NDJSON file without loading the file.
+
+    Existing rows are streamed through and replaced in place when they changed; rows
+    not seen in the file are appended. The result replaces the file atomically.
+    """
+    pending = dict(changed_rows)
+    updated = 0
+    kept = 0
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        if os.path.exists(filepath):
+            with open(filepath, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    replacement = pending.pop(row.get(key), None)
+                    if replacement is not None:
+                        row = replacement
+                        updated += 1
+                    else:
+                        kept += 1
+                    out.write(json.dumps(row, ensure_ascii=False, default=str))
+                    out.write('\n')
+        for row in pending.values():
+            out.write(json.dumps(row, ensure_ascii=False, default=str))
+            out.write('\n')
+    os.replace(tmp_path, filepath)
+    return {'updated': updated, 'inserted': len(pending), 'total': kept + updated + len(pending)}
+
+def pick_watermark_column(fetcher, table_name: str) -> Optional[str]:
+    for column in WATERMARK_COLUMNS:
+        if fetcher.get_field_type(table_name, column):
+            return column
+    return None
+
+def sync_table(fetcher, table_name: str, folder: str = "sample_data/exports", column: Optional[str] = None,
+               key: str = 'id', page_size: int = 1000, state: Optional[SyncState] = None) -> Dict[str, Any]:
+    """Bring `{folder}/{table}.ndjson` up to date, fetching only rows past the stored watermark."""
+    state = state or SyncState(folder)
+    entry = state.get(table_name) or {}
+    column = column or entry.get('column') or pick_watermark_column(fetcher, table_name)
+    if not column:
+        raise RuntimeError(f"{table_name} has no watermark column (tried {', '.join(WATERMARK_COLUMNS)})")
+    if entry and (entry.get('column'), entry.get('key')) != (column, key):
+        # A different ordering makes the old watermark meaningless
+        entry = {}
+
+    since, since_key = entry.get('watermark'), entry.get('last_key')
+    # Largest key seen with a NULL watermark; new NULL rows are pulled after it
+    null_key = entry.get('null_key')
+    os.makedirs(folder, exist_ok=True)
+    filepath = os.path.join(folder, f"{table_name}.ndjson")
+    pages = iter_changed_pages(fetcher, table_name, column, since, since_key, page_size=page_size, key=key,
+                               null_key=null_key)
+
+    if not entry:
+        # First sync: stream the full table straight to disk, tracking the watermark as we go
+        total = 0
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for rows in pages:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str))
+                    f.write('\n')
+                    if row[column] is not None:
+                        since, since_key = row[column], row[key]
+                    else:
+                        null_key = row[key]
+                total += len(rows)
+                print(f"   ↳ {table_name}: {total} rows")
+        os.replace(tmp_path, filepath)
+        if since is None:
+            # The column is NULL throughout: keep a key-only mark so later runs fetch just the new rows
+            since_key = null_key
+        stats = {'updated': 0, 'inserted': total, 'total': total, 'changed': total}
+    else:
+        # Deltas are small, so they are collected and merged into the existing export
+        changed: Dict[Any, Dict[str, Any]] = {}
+        for rows in pages:
+            for row in rows:
+                changed[row[key]] = row
+                if since is None:
+                    since_key = row[key]
+                elif row[column] is not None:
+                    since, since_key = row[column], row[key]
+                elif null_key is None or row[key] > null_key:
+                    null_key = row[key]
+            print(f"   ↳ {table_name}: {len(changed)} changed rows")
+        stats = merge_ndjson(filepath, changed, key)
+        stats['changed'] = len(changed)
+
+    state.update(table_name, {
+        'column': column,
+        'key': key,
+        'watermark': since,
+        'last_key': since_key,
+        'null_key': null_key,
+        'rows': stats['total'],
+        'synced_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    return stats
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON Writer
+Serializes query results row by row as compact JSON, pretty JSON or NDJSON, optionally gzipped.
+"""
+
+import gzip
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from profiling import phase
+
+# Output format used by save_json: 'compact', 'pretty' (indent=2) or 'ndjson'
+SAVE_FORMAT = os.environ.get('SAVE_FORMAT', 'compact')
+
+# Gzip everything save_json writes (adds a .gz suffix)
+SAVE_GZIP = os.environ.get('SAVE_GZIP', '0') == '1'
+
+# Encoded output is buffered up to this many characters between writes
+WRITE_BUFFER_CHARS = 64 * 1024
+
+FORMATS = ('compact', 'pretty', 'ndjson')
+
+def output_path(filepath: str, fmt: str = SAVE_FORMAT, compress: bool = SAVE_GZIP) -> str:
+    """File name a format actually writes to, e.g. bus_sample.json -> bus_sample.ndjson.gz."""
+    if fmt == 'ndjson' and filepath.endswith('.json'):
+        filepath = filepath[:-len('.json')] + '.ndjson'
+    if compress and not filepath.endswith('.gz'):
+        filepath += '.gz'
+    return filepath
+
+def _encoder(fmt: str) -> json.JSONEncoder:
+    if fmt == 'pretty':
+        return json.JSONEncoder(indent=2, ensure_ascii=False, default=str)
+    return json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=str)
+
+class JSONWriter:
+    """Incremental writer for a list of rows, optionally nested under a path of keys.
+
+    With `wrap=['data', 'bus']` the output is `{"data": {"bus": [row, ...]}}` in
+    the JSON formats and one row per line in NDJSON. Rows are encoded and written
+    as they are passed in, so memory is bounded by the page being written.
+
+    The file is written to `{path}.tmp` and renamed into place by `close()`.
+    """
+
+    def __init__(self, filepath: str, fmt: str = SAVE_FORMAT, compress: bool = SAVE_GZIP,
+                 wrap: Optional[List[str]] = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format {fmt!r} (expected one of {', '.join(FORMATS)})")
+        self.fmt = fmt
+        self.compress = compress
+        self.path = output_path(filepath, fmt, compress)
+        self.encoder = _encoder(fmt)
+        self.rows_written = 0
+
+        wrap = wrap or []
+        if fmt == 'pretty':
+            self.prefix = ''.join('{\n' + '  ' * (depth + 1) + json.dumps(key, ensure_ascii=False) + ': '
+                                  for depth, key in enumerate(wrap)) + '['
+            self.indent = '\n' + '  ' * (len(wrap) + 1)
+            closers = ''.join('\n' + '  ' * depth + '}' for depth in reversed(range(len(wrap))))
+            self.suffix = '\n' + '  ' * len(wrap) + ']' + closers
+            # json.dump(indent=2) writes an empty list as []
+            self.empty_suffix = ']' + closers
+        else:
+            self.prefix = ''.join('{' + json.dumps(key, ensure_ascii=False) + ':' for key in wrap) + '['
+            self.indent = ''
+            self.suffix = self.empty_suffix = ']' + '}' * len(wrap)
+
+        self.tmp_path = f"{self.path}.tmp"
+        self.file = gzip.open(self.tmp_path, 'wb') if compress else open(self.tmp_path, 'wb')
+        if fmt != 'ndjson':
+            self.file.write(self.prefix.encode('utf-8'))
+
+    def write_rows(self, rows: Iterable[Any]):
+        """Encode and write rows, flushing the encoded text every WRITE_BUFFER_CHARS."""
+        buffer = []
+        size = 0
+        with phase('serialize'):
+            for row in rows:
+                if self.fmt == 'ndjson':
+                    chunk = self.encoder.encode(row) + '\n'
+                else:
+                    chunk = (',' if self.rows_written else '') + self.indent + \
+                        self.encoder.encode(row).replace('\n', self.indent)
+                buffer.append(chunk)
+                size += len(chunk)
+                self.rows_written += 1
+                if size >= WRITE_BUFFER_CHARS:
+                    self._write(buffer)
+                    buffer, size = [], 0
+            self._write(buffer)
+
+    def _write(self, chunks: List[str]):
+        if chunks:
+            data = ''.join(chunks).encode('utf-8')
+            with phase('write'):
+                self.file.write(data)
+
+    def close(self):
+        with phase('write'):
+            if self.fmt != 'ndjson':
+                self.file.write((self.suffix if self.rows_written else self.empty_suffix).encode('utf-8'))
+            self.file.flush()
+            self.file.close()
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Drop the unfinished file."""
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self) -> 'JSONWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def row_list_path(data: Any) -> Optional[List[str]]:
+    """Key path of the row list in a single-field GraphQL result like {"data": {"bus": [...]}}."""
+    if isinstance(data, dict) and list(data) == ['data'] and isinstance(data['data'], dict):
+        fields = list(data['data'])
+        if len(fields) == 1 and isinstance(data['data'][fields[0]], list):
+            return ['data', fields[0]]
+    return None
+
+def write_json(data: Any, filepath: str, fmt: str = SAVE_FORMAT, compress: bool = SAVE_GZIP) -> str:
+    """Write `data` in the chosen format and return the path written.
+
+    Single-table query results are streamed row by row (one line per row in
+    NDJSON); anything else is encoded incrementally as one document, which in
+    NDJSON is a single line.
+    """
+    path = row_list_path(data)
+    if path:
+        with JSONWriter(filepath, fmt, compress, wrap=path) as writer:
+            writer.write_rows(data['data'][path[1]])
+        return writer.path
+
+    final_path = output_path(filepath, fmt, compress)
+    tmp_path = f"{final_path}.tmp"
+    encoder = _encoder(fmt)
+    try:
+        with (gzip.open(tmp_path, 'wb') if compress else open(tmp_path, 'wb')) as f, phase('serialize'):
+            buffer = []
+            size = 0
+            for chunk in encoder.iterencode(data):
+                buffer.append(chunk)
+                size += len(chunk)
+                if size >= WRITE_BUFFER_CHARS:
+                    with phase('write'):
+                        f.write(''.join(buffer).encode('utf-8'))
+                    buffer, size = [], 0
+            if fmt == 'ndjson':
+                buffer.append('\n')
+            with phase('write'):
+                f.write(''.join(buffer).encode('utf-8'))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    with phase('write'):
+        os.replace(tmp_path, final_path)
+    return final_path
+
+def read_rows(filepath: str) -> Iterable[Dict[str, Any]]:
+    """Yield rows back from any file written by JSONWriter or write_json."""
+    opener = gzip.open if filepath.endswith('.gz') else open
+    with opener(filepath, 'rt', encoding='utf-8') as f:
+        if '.ndjson' in filepath:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        with phase('parse'):
+            data = json.load(f)
+    path = row_list_path(data)
+    yield from (data['data'][path[1]] if path else [data])
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Profiling Hooks
+Opt-in CPU and memory profiling for any script's main(), plus phase labels (network, parse,
+serialize, write) that attribute wall time to what the code was doing.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from typing import Dict, Any, Optional, List, Callable
+
+# Profilers to run: '1'/'all' for every one, or a comma-separated subset of PROFILERS; --profile does the same
+PROFILE = os.environ.get('PROFILE', '')
+
+# Where each profiled run gets its own folder
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join("sample_data", "profiles"))
+
+PROFILERS = ('cpu', 'memory')
+
+# Seconds between stack samples for the collapsed-stack (flame graph) file
+SAMPLE_INTERVAL = 0.005
+
+# Allocation sites listed in the memory report
+TOP_ALLOCATORS = 25
+
+# Seconds between checks of traced memory; a snapshot is taken when it has grown by PEAK_GROWTH
+MEMORY_CHECK_INTERVAL = 0.25
+PEAK_GROWTH = 1.2
+
+# The profilers' own threads, left out of the sampled stacks
+HELPER_THREADS = ('stack-sampler', 'memory-snapshotter')
+
+_NO_PHASE = nullcontext()
+
+class PhaseTimer:
+    """Wall time per phase label, exclusive of nested phases.
+
+    Phases nest per thread: time spent in `write` inside `serialize` counts
+    only towards `write`. Totals from worker threads are added together, so
+    with several threads they can exceed the run's wall time.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __call__(self, name: str) -> '_Phase':
+        return _Phase(self, name)
+
+    def _stack(self) -> List[List[Any]]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def report(self, wall_seconds: float) -> Dict[str, Any]:
+        with self._lock:
+            phases = {name: {'seconds': round(seconds, 4), 'calls': self.calls[name]}
+                      for name, seconds in sorted(self.seconds.items(), key=lambda item: -item[1])}
+            labelled = sum(self.seconds.values())
+        return {'wall_seconds': round(wall_seconds, 4), 'phases': phases,
+                'unlabelled_seconds': round(max(0.0, wall_seconds - labelled), 4)}
+
+class _Phase:
+    def __init__(self, timer: PhaseTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        # [name, started, seconds spent in nested phases]
+        self.timer._stack().append([self.name, time.perf_counter(), 0.0])
+
+    def __exit__(self, exc_type, exc, tb):
+        stack = self.timer._stack()
+        name, started, nested = stack.pop()
+        elapsed = time.perf_counter() - started
+        if stack:
+            stack[-1][2] += elapsed
+        with self.timer._lock:
+            self.timer.seconds[name] = self.timer.seconds.get(name, 0.0) + elapsed - nested
+            self.timer.calls[name] = self.timer.calls.get(name, 0) + 1
+
+_timer: Optional[PhaseTimer] = None
+
+def phase(name: str):
+    """Label a block as one phase of the run; does nothing unless profiling is on."""
+    if _timer is None:
+        return _NO_PHASE
+    return _timer(name)
+
+class StackSampler:
+    """Samples every thread's Python stack on a timer and counts identical stacks.
+
+    cProfile only sees the thread it was enabled in; sampling also covers the
+    worker threads of sharded exports and the async fetchers.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if names.get(thread_id) in HELPER_THREADS:
+                    continue
+                frames = []
+                # Stop at the profiling wrapper, so the main thread's stacks start at main()
+                while frame is not None and frame.f_code.co_filename != __file__:
+                    code = frame.f_code
+                    frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if not frames:
+                    continue
+                frames.append(names.get(thread_id, 'thread'))
+                stack = ';'.join(reversed(frames))
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, filepath: str):
+        """One `frame;frame;frame count` line per stack, the input format of flamegraph.pl and speedscope."""
+        with open(filepath, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+class PeakSnapshotter:
+    """Takes a tracemalloc snapshot whenever traced memory reaches a new high.
+
+    Snapshots are only retaken after PEAK_GROWTH-fold growth, so the cost stays
+    bounded; the one kept shows which allocation sites were holding memory
+    close to the peak, which the snapshot at exit usually does not.
+    """
+
+    def __init__(self, interval: float = MEMORY_CHECK_INTERVAL):
+        self.interval = interval
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-snapshotter', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = tracemalloc.get_traced_memory()[0]
+            if current > max(self.snapshot_bytes * PEAK_GROWTH, 1024 * 1024):
+                self.snapshot = tracemalloc.take_snapshot()
+                self.snapshot_bytes = current
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+def requested_profilers(argv: List[str], setting: str = PROFILE) -> List[str]:
+    """Profilers asked for by --profile[=cpu,memory] in argv or the PROFILE setting; removes the flag from argv."""
+    for index, arg in enumerate(argv):
+        if arg == '--profile' or arg.startswith('--profile='):
+            del argv[index]
+            setting = arg.partition('=')[2] or 'all'
+            break
+    setting = setting.strip().lower()
+    if setting in ('', '0', 'false', 'no'):
+        return []
+    if setting in ('1', 'true', 'yes', 'all'):
+        return list(PROFILERS)
+    chosen = [name.strip() for name in setting.split(',') if name.strip()]
+    unknown = [name for name in chosen if name not in PROFILERS]
+    if unknown:
+        raise ValueError(f"Unknown profilers {', '.join(unknown)} (expected {', '.join(PROFILERS)})")
+    return chosen
+
+def _top_allocators(snapshot: tracemalloc.Snapshot, title: str) -> List[str]:
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ])
+    statistics = snapshot.statistics('lineno')
+    lines = ['', f"{title}: {sum(stat.size for stat in statistics) / 1024 / 1024:.1f} MB, top {TOP_ALLOCATORS} sites"]
+    for stat in statistics[:TOP_ALLOCATORS]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8} blocks  {frame.filename}:{frame.lineno}")
+    return lines
+
+def _memory_report(peak: int, near_peak: Optional[tracemalloc.Snapshot], at_exit: tracemalloc.Snapshot) -> str:
+    lines = [f"Peak traced memory: {peak / 1024 / 1024:.1f} MB"]
+    if near_peak is not None:
+        lines += _top_allocators(near_peak, "Allocated near the peak")
+    lines += _top_allocators(at_exit, "Still allocated at exit")
+    return '\n'.join(lines) + '\n'
+
+def profile_call(func: Callable[[], Any], profilers: List[str], name: str,
+                 folder: str = PROFILE_DIR) -> Any:
+    """Run func() under the chosen profilers and write the results to `{folder}/{name}-{time}/`.
+
+    Writes phases.json always; cpu.prof (pstats), cpu.txt (top functions by
+    cumulative time) and stacks.collapsed for 'cpu'; memory.txt (peak and the
+    top allocation sites near the peak and at exit) for 'memory'. Results are written even if func raises.
+    """
+    global _timer
+    out_dir = os.path.join(folder, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    _timer = PhaseTimer()
+    profiler = cProfile.Profile() if 'cpu' in profilers else None
+    sampler = StackSampler() if 'cpu' in profilers else None
+    snapshotter = PeakSnapshotter() if 'memory' in profilers else None
+    if snapshotter:
+        tracemalloc.start()
+        snapshotter.start()
+
+    started = time.perf_counter()
+    if sampler:
+        sampler.start()
+    if profiler:
+        profiler.enable()
+    try:
+        return func()
+    finally:
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        wall_seconds = time.perf_counter() - started
+        timer, _timer = _timer, None
+        if snapshotter:
+            snapshotter.stop()
+            at_exit = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        os.makedirs(out_dir, exist_ok=True)
+        phases = timer.report(wall_seconds)
+        with open(os.path.join(out_dir, 'phases.json'), 'w', encoding='utf-8') as f:
+            json.dump(phases, f, indent=2)
+        if profiler:
+            profiler.dump_stats(os.path.join(out_dir, 'cpu.prof'))
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(40)
+            with open(os.path.join(out_dir, 'cpu.txt'), 'w', encoding='utf-8') as f:
+                f.write(text.getvalue())
+            sampler.write_collapsed(os.path.join(out_dir, 'stacks.collapsed'))
+        if snapshotter:
+            with open(os.path.join(out_dir, 'memory.txt'), 'w', encoding='utf-8') as f:
+                f.write(_memory_report(peak, snapshotter.snapshot, at_exit))
+
+        print(f"\n🔬 Profile ({', '.join(profilers)}) saved to: {out_dir}")
+        for label, entry in phases['phases'].items():
+            print(f"   {label:<10} {entry['seconds']:8.2f}s  ({entry['calls']} calls)")
+        print(f"   {'other':<10} {phases['unlabelled_seconds']:8.2f}s  of {wall_seconds:.2f}s wall")
+
+def run_main(main: Callable[[], Any]) -> Any:
+    """Entry point wrapper: runs main() under the profilers picked by PROFILE or --profile, else plainly."""
+    profilers = requested_profilers(sys.argv)
+    if not profilers:
+        return main()
+    name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'main'
+    return profile_call(main, profilers, name)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+GraphQL Query Batching
+Packs many root-field selections into one aliased document and splits the response back apart.
+"""
+
+import re
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+# Hasura reports validation errors with a JSON path such as "$.selectionSet.t3.selectionSet.model"
+ALIAS_PATH_RE = re.compile(r'^\$\.selectionSet\.([A-Za-z_][A-Za-z0-9_]*)')
+
+class QueryBatcher:
+    def __init__(self, execute: Callable[[str, Optional[Dict]], Optional[Dict[str, Any]]],
+                 batch_size: int = 10):
+        self.execute = execute
+        self.batch_size = max(1, batch_size)
+
+    @staticmethod
+    def render_field(selection: Dict[str, Any], alias: Optional[str] = None) -> str:
+        """Render one root field, optionally under an alias."""
+        args = selection.get('args')
+        head = f"{alias}: {selection['field']}" if alias else selection['field']
+        if args:
+            head += f"({args})"
+        return f"{head} {{\n    {selection['selection']}\n  }}"
+
+    def build_document(self, selections: List[Dict[str, Any]], name: str = 'batch') -> Tuple[str, Dict[str, int]]:
+        """Build one aliased document; returns the document and an alias -> index map."""
+        aliases = {}
+        parts = []
+        for index, selection in enumerate(selections):
+            alias = f"t{index}"
+            aliases[alias] = index
+            parts.append(self.render_field(selection, alias))
+        body = '\n  '.join(parts)
+        return f"query {name} {{\n  {body}\n}}", aliases
+
+    def build_single(self, selection: Dict[str, Any]) -> str:
+        """Build an un-aliased document for one selection, exactly as it would be sent on its own."""
+        field = selection['field']
+        return f"query get{field.replace('_', '').title()} {{\n  {self.render_field(selection)}\n}}"
+
+    def plan(self, selections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Split selections into batch jobs that can be sent as-is (or through AsyncFetchEngine)."""
+        jobs = []
+        for start in range(0, len(selections), self.batch_size):
+            chunk = selections[start:start + self.batch_size]
+            jobs.append(self.make_job(chunk, f"batch{start // self.batch_size}"))
+        return jobs
+
+    @staticmethod
+    def failing_aliases(result: Dict[str, Any], aliases: Dict[str, int]) -> List[str]:
+        """Find which aliases the errors in a response point at."""
+        failing = []
+        for error in result.get('errors', []):
+            path = (error.get('extensions') or {}).get('path', '')
+            match = ALIAS_PATH_RE.match(path)
+            if match and match.group(1) in aliases and match.group(1) not in failing:
+                failing.append(match.group(1))
+        return failing
+
+    def make_job(self, selections: List[Dict[str, Any]], name: str = 'batch') -> Dict[str, Any]:
+        """One job for a group of selections: un-aliased when there is only one."""
+        if len(selections) == 1:
+            return {'query': self.build_single(selections[0]), 'selections': selections, 'aliases': None}
+        query, aliases = self.build_document(selections, name)
+        return {'query': query, 'selections': selections, 'aliases': aliases}
+
+    def split(self, job: Dict[str, Any], result: Optional[Dict[str, Any]]) -> Tuple[Dict[int, Optional[Dict[str, Any]]], List[Tuple[List[int], Dict[str, Any]]]]:
+        """Split one batch response without sending anything.
+
+        Returns the per-selection responses that are final (by index into the
+        job's selections) and follow-up jobs, each with the indexes it covers.
+        Each response has the shape the un-batched query would return
+        ({'data': {field: ...}} or {'errors': [...]}), so callers can keep
+        passing it straight to save_json. When the transport failed (no
+        result) every selection fails with it. Aliases named by error paths
+        are retried on their own and the rest is re-sent without them; errors
+        without a usable path bisect the batch.
+        """
+        selections = job['selections']
+        aliases = job['aliases']
+
+        if aliases is None:
+            return {0: result}, []
+        if result is None:
+            # Re-sending pieces to an endpoint that is already failing only makes it worse
+            return {index: None for index in range(len(selections))}, []
+        if 'errors' not in result:
+            data = result.get('data') or {}
+            return {index: {'data': {selections[index]['field']: data.get(alias)}}
+                    for alias, index in aliases.items()}, []
+
+        failing = self.failing_aliases(result, aliases)
+        if failing:
+            isolated = [aliases[alias] for alias in failing]
+            print(f"   ↳ Isolating {len(isolated)} failing selection(s) from batch of {len(selections)}")
+            remaining = [i for i in range(len(selections)) if i not in isolated]
+            groups = [[index] for index in isolated] + ([remaining] if remaining else [])
+        else:
+            middle = len(selections) // 2
+            groups = [list(range(middle)), list(range(middle, len(selections)))]
+        return {}, [(group, self.make_job([selections[i] for i in group])) for group in groups]
+
+    def resolve_all(self, pairs: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]],
+                    run_jobs: Optional[Callable[[List[Dict[str, Any]]], List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]]] = None) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """Resolve (job, result) pairs into (selection, result) pairs in selection order.
+
+        Follow-up jobs are collected per round and sent together through
+        `run_jobs` (e.g. AsyncFetchEngine.run_all); by default they run serially.
+        """
+        run_jobs = run_jobs or self._run_serially
+        resolved: Dict[int, Tuple[Dict[str, Any], Optional[Dict[str, Any]]]] = {}
+        pending = []
+        offset = 0
+        for job, result in pairs:
+            positions = list(range(offset, offset + len(job['selections'])))
+            pending.append((positions, job, result))
+            offset += len(positions)
+
+        while pending:
+            follow_ups = []
+            for positions, job, result in pending:
+                done, jobs = self.split(job, result)
+                for index, response in done.items():
+                    resolved[positions[index]] = (job['selections'][index], response)
+                follow_ups.extend(([positions[i] for i in group], sub_job) for group, sub_job in jobs)
+            if not follow_ups:
+                break
+            results = run_jobs([sub_job for _, sub_job in follow_ups])
+            pending = [(positions, sub_job, result)
+                       for (positions, _), (sub_job, result) in zip(follow_ups, results)]
+
+        return [resolved[position] for position in range(offset)]
+
+    def resolve(self, job: Dict[str, Any], result: Optional[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """Split one batch response into per-selection responses, sending follow-ups serially."""
+        return self.resolve_all([(job, result)])
+
+    def _run_serially(self, jobs: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        return [(job, self.execute(job['query'], None)) for job in jobs]
+
+    def run(self, selections: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """Plan, execute and resolve all selections serially; results are in input order."""
+        return self.resolve_all(self._run_serially(self.plan(selections)))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Query Metrics
+Per-request measurements from GraphQLClient, aggregated into per-table and per-operation latency
+percentiles and exported as JSON reports or a Prometheus text file.
+"""
+
+import math
+import os
+import re
+import threading
+from typing import Dict, Any, Optional, List
+
+from atomic_io import atomic_open
+from response_cache import root_selections
+
+# Set to a file path to also write the metrics in Prometheus text format (textfile collector)
+METRICS_PROM_FILE = os.environ.get('METRICS_PROM_FILE')
+
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+OPERATION_RE = re.compile(r'^\s*(?:query|mutation|subscription)\s+([A-Za-z_][A-Za-z0-9_]*)')
+
+def operation_name(query: str) -> str:
+    """The operation's name with trailing digits dropped, so batch0, batch1... share one label."""
+    match = OPERATION_RE.match(query)
+    return re.sub(r'\d+$', '', match.group(1)) if match else 'anonymous'
+
+def percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+def error_code(result: Optional[Dict[str, Any]], error: Optional[Exception] = None) -> Optional[str]:
+    """A short code for what went wrong: the GraphQL error code, http_<status>, transport or circuit_open."""
+    if error is not None:
+        if type(error).__name__ == 'CircuitOpenError':
+            return 'circuit_open'
+        status = getattr(error, 'status', None)
+        return f"http_{status}" if status else 'transport'
+    if result and result.get('errors'):
+        return (result['errors'][0].get('extensions') or {}).get('code') or 'graphql_error'
+    return None
+
+class _Series:
+    """Counters and raw latencies for one table or operation."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.cached = 0
+        self.retries = 0
+        self.rows = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latencies: List[float] = []
+
+    def add(self, latency: float, rows: int, sample: Dict[str, Any]):
+        self.requests += 1
+        self.rows += rows
+        self.retries += sample['retries']
+        self.request_bytes += sample['request_bytes']
+        self.response_bytes += sample['response_bytes']
+        if sample['error_code']:
+            self.errors += 1
+        if sample['cached']:
+            # Cache hits say nothing about the server; keep them out of the latency figures
+            self.cached += 1
+        else:
+            self.latencies.append(latency)
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'cached': self.cached,
+            'retries': self.retries,
+            'rows': self.rows,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'latency': {
+                'p50': percentile(ordered, 0.50),
+                'p95': percentile(ordered, 0.95),
+                'p99': percentile(ordered, 0.99),
+                'max': ordered[-1] if ordered else None,
+                'mean': sum(ordered) / len(ordered) if ordered else None,
+            },
+        }
+
+class QueryMetrics:
+    """Collects one sample per GraphQLClient.execute call.
+
+    A sample has the operation, the root fields it selected, latency
+    (including retries and backoff), request/response bytes, rows returned per
+    root field, retries and an error code. A batched request counts once for
+    each table it touched, with the whole request's latency.
+    """
+
+    def __init__(self):
+        self.by_table: Dict[str, _Series] = {}
+        self.by_operation: Dict[str, _Series] = {}
+        self.error_codes: Dict[str, int] = {}
+        self.total = _Series()
+        self._lock = threading.Lock()
+
+    def record(self, query: str, result: Optional[Dict[str, Any]], latency: float, stats: Dict[str, Any],
+               error: Optional[Exception] = None):
+        code = 'rejected' if stats.get('rejected') else error_code(result, error)
+        sample = {
+            'retries': max(0, stats.get('attempts', 0) - 1),
+            'request_bytes': stats.get('request_bytes', 0),
+            'response_bytes': stats.get('response_bytes', 0),
+            'error_code': code,
+            'cached': bool(stats.get('cached')),
+        }
+        data = (result or {}).get('data') or {}
+        rows_by_table = {}
+        for key, field in root_selections(query):
+            value = data.get(key)
+            rows = len(value) if isinstance(value, list) else int(value is not None)
+            rows_by_table[field] = rows_by_table.get(field, 0) + rows
+
+        operation = operation_name(query)
+        with self._lock:
+            self.total.add(latency, sum(rows_by_table.values()), sample)
+            self.by_operation.setdefault(operation, _Series()).add(latency, sum(rows_by_table.values()), sample)
+            for table, rows in rows_by_table.items():
+                # Bytes belong to the request as a whole; only count them on the totals
+                self.by_table.setdefault(table, _Series()).add(
+                    latency, rows, dict(sample, request_bytes=0, response_bytes=0))
+            if code:
+                self.error_codes[code] = self.error_codes.get(code, 0) + 1
+
+    def report(self) -> Dict[str, Any]:
+        """Totals, error codes and per-table / per-operation summaries with p50/p95/p99 latency."""
+        with self._lock:
+            return {
+                'total': self.total.summary(),
+                'error_codes': dict(self.error_codes),
+                'by_table': {name: series.summary() for name, series in sorted(self.by_table.items())},
+                'by_operation': {name: series.summary() for name, series in sorted(self.by_operation.items())},
+            }
+
+    def prometheus_text(self, prefix: str = 'graphql') -> str:
+        """Prometheus exposition format: a latency histogram and counters, labelled by table."""
+        def label(value: str) -> str:
+            return value.replace('\\', '\\\\').replace('"', '\\"')
+
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds Latency of requests that selected the table (cache hits excluded).",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            series = sorted(self.by_table.items())
+            for table, stats in series:
+                for bound in LATENCY_BUCKETS:
+                    count = sum(1 for latency in stats.latencies if latency <= bound)
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{table="{label(table)}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{table="{label(table)}",le="+Inf"}} {len(stats.latencies)}')
+                lines.append(f'{prefix}_request_duration_seconds_sum{{table="{label(table)}"}} {sum(stats.latencies):.6f}')
+                lines.append(f'{prefix}_request_duration_seconds_count{{table="{label(table)}"}} {len(stats.latencies)}')
+
+            counters = [
+                ('requests_total', 'Requests that selected the table.', 'requests'),
+                ('errors_total', 'Requests that selected the table and failed.', 'errors'),
+                ('cache_hits_total', 'Requests answered from the response cache.', 'cached'),
+                ('retries_total', 'Retried attempts.', 'retries'),
+                ('rows_total', 'Rows returned.', 'rows'),
+            ]
+            for name, help_text, attribute in counters:
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for table, stats in series:
+                    lines.append(f'{prefix}_{name}{{table="{label(table)}"}} {getattr(stats, attribute)}')
+
+            for name, attribute in (('request_bytes_total', 'request_bytes'), ('response_bytes_total', 'response_bytes')):
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                lines.append(f"{prefix}_{name} {getattr(self.total, attribute)}")
+
+            lines.append(f"# TYPE {prefix}_error_codes_total counter")
+            for code, count in sorted(self.error_codes.items()):
+                lines.append(f'{prefix}_error_codes_total{{code="{label(code)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, filepath: str):
+        """Write the text format atomically, as the node_exporter textfile collector requires."""
+        with atomic_open(filepath) as f:
+            f.write(self.prometheus_text())
+
+def export_metrics(metrics: Optional['QueryMetrics'], prom_file: Optional[str] = METRICS_PROM_FILE) -> Optional[Dict[str, Any]]:
+    """The metrics report for a summary file; also writes METRICS_PROM_FILE when it is set."""
+    if metrics is None:
+        return None
+    if prom_file:
+        metrics.write_prometheus(prom_file)
+        print(f"📈 Prometheus metrics written to: {prom_file}")
+    return metrics.report()
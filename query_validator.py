@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Pre-flight Query Validator
+Checks GraphQL documents against the cached schema before they are sent, and can repair them.
+"""
+
+import difflib
+import re
+from typing import Dict, Any, Optional, List, Tuple
+
+from schema_model import SchemaModel, SCHEMA_PATH
+
+# Hasura's error code for documents that do not match the schema
+VALIDATION_CODE = 'validation-failed'
+
+# Minimum difflib similarity for a repair; lower values start renaming onto unrelated columns
+REPAIR_CUTOFF = 0.9
+
+# Key columns are never a repair target unless the name asked for was one too (status is not status_id)
+KEY_SUFFIXES = ('_id', '_uuid', '_ids')
+
+TOKEN_RE = re.compile(r'''
+    (?P<skip>[\s,\ufeff]+|\#[^\n]*)
+  | (?P<spread>\.\.\.)
+  | (?P<block>"""(?:\\"""|[^"]|"(?!""))*""")
+  | (?P<string>"(?:\\.|[^"\\\n])*")
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+  | (?P<punct>[!$&()\[\]{}:=@|])
+''', re.VERBOSE)
+
+class QuerySyntaxError(ValueError):
+    """Raised when a document cannot be tokenized or parsed."""
+
+def tokenize(source: str) -> List[Tuple[str, str, int]]:
+    """Split a document into (kind, text, offset) tokens, dropping whitespace, commas and comments."""
+    tokens = []
+    position = 0
+    while position < len(source):
+        match = TOKEN_RE.match(source, position)
+        if not match:
+            raise QuerySyntaxError(f"Unexpected character {source[position]!r} at offset {position}")
+        kind = match.lastgroup
+        if kind != 'skip':
+            tokens.append((kind, match.group(), position))
+        position = match.end()
+    return tokens
+
+class _Parser:
+    """Small recursive-descent parser for executable GraphQL documents.
+
+    Argument values, variable definitions and directives are kept as raw source
+    text; only the selection structure is parsed, since that is what we validate.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens = tokenize(source)
+        self.index = 0
+
+    def peek(self, offset: int = 0) -> Tuple[str, str, int]:
+        if self.index + offset < len(self.tokens):
+            return self.tokens[self.index + offset]
+        return ('eof', '', len(self.source))
+
+    def take(self, text: Optional[str] = None) -> Tuple[str, str, int]:
+        token = self.peek()
+        if token[0] == 'eof' or (text is not None and token[1] != text):
+            raise QuerySyntaxError(f"Expected {text or 'token'!r} at offset {token[2]}, found {token[1]!r}")
+        self.index += 1
+        return token
+
+    def take_name(self) -> str:
+        token = self.peek()
+        if token[0] != 'name':
+            raise QuerySyntaxError(f"Expected a name at offset {token[2]}, found {token[1]!r}")
+        self.index += 1
+        return token[1]
+
+    def raw_group(self) -> str:
+        """Consume a balanced (...), [...] or {...} group and return its source text."""
+        pairs = {'(': ')', '[': ']', '{': '}'}
+        start = self.peek()[2]
+        stack = [pairs[self.take()[1]]]
+        while stack:
+            kind, text, _ = self.take()
+            if text in pairs and kind == 'punct':
+                stack.append(pairs[text])
+            elif kind == 'punct' and text == stack[-1]:
+                stack.pop()
+        end_token = self.tokens[self.index - 1]
+        return self.source[start:end_token[2] + 1]
+
+    def raw_value(self) -> str:
+        token = self.peek()
+        if token[1] in ('[', '{') and token[0] == 'punct':
+            return self.raw_group()
+        if token[1] == '$':
+            self.take('$')
+            return '$' + self.take_name()
+        return self.take()[1]
+
+    def parse_document(self) -> Dict[str, Any]:
+        operations, fragments = [], {}
+        while self.peek()[0] != 'eof':
+            token = self.peek()
+            if token[1] == '{':
+                operations.append({'type': 'query', 'name': None, 'variables': '', 'directives': '',
+                                   'selections': self.parse_selection_set()})
+            elif token[1] == 'fragment':
+                self.take()
+                name = self.take_name()
+                self.take('on')
+                type_condition = self.take_name()
+                directives = self.parse_directives()
+                fragments[name] = {'name': name, 'type_condition': type_condition,
+                                   'directives': directives, 'selections': self.parse_selection_set()}
+            elif token[1] in ('query', 'mutation', 'subscription'):
+                self.take()
+                name = self.take_name() if self.peek()[0] == 'name' else None
+                variables = self.raw_group() if self.peek()[1] == '(' else ''
+                directives = self.parse_directives()
+                operations.append({'type': token[1], 'name': name, 'variables': variables,
+                                   'directives': directives, 'selections': self.parse_selection_set()})
+            else:
+                raise QuerySyntaxError(f"Unexpected {token[1]!r} at offset {token[2]}")
+        return {'operations': operations, 'fragments': fragments}
+
+    def parse_directives(self) -> str:
+        parts = []
+        while self.peek()[1] == '@':
+            self.take('@')
+            directive = '@' + self.take_name()
+            if self.peek()[1] == '(':
+                directive += self.raw_group()
+            parts.append(directive)
+        return ' '.join(parts)
+
+    def parse_arguments(self) -> List[Tuple[str, str]]:
+        args = []
+        self.take('(')
+        while self.peek()[1] != ')':
+            name = self.take_name()
+            self.take(':')
+            args.append((name, self.raw_value()))
+        self.take(')')
+        return args
+
+    def parse_selection_set(self) -> List[Dict[str, Any]]:
+        selections = []
+        self.take('{')
+        while self.peek()[1] != '}':
+            if self.peek()[0] == 'spread':
+                self.take()
+                if self.peek()[1] == 'on':
+                    self.take()
+                    type_condition = self.take_name()
+                    directives = self.parse_directives()
+                    selections.append({'kind': 'inline', 'type_condition': type_condition,
+                                       'directives': directives, 'selections': self.parse_selection_set()})
+                elif self.peek()[1] in ('{', '@'):
+                    directives = self.parse_directives()
+                    selections.append({'kind': 'inline', 'type_condition': None,
+                                       'directives': directives, 'selections': self.parse_selection_set()})
+                else:
+                    name = self.take_name()
+                    selections.append({'kind': 'spread', 'name': name, 'directives': self.parse_directives()})
+                continue
+
+            name = self.take_name()
+            alias = None
+            if self.peek()[1] == ':':
+                self.take(':')
+                alias, name = name, self.take_name()
+            args = self.parse_arguments() if self.peek()[1] == '(' else []
+            directives = self.parse_directives()
+            children = self.parse_selection_set() if self.peek()[1] == '{' else None
+            selections.append({'kind': 'field', 'alias': alias, 'name': name, 'args': args,
+                               'directives': directives, 'selections': children})
+        self.take('}')
+        return selections
+
+def parse_document(source: str) -> Dict[str, Any]:
+    return _Parser(source).parse_document()
+
+def print_document(document: Dict[str, Any]) -> str:
+    """Render a parsed document back to GraphQL source."""
+    def selection_set(selections: List[Dict[str, Any]], indent: str) -> str:
+        lines = []
+        inner = indent + '  '
+        for selection in selections:
+            directives = f" {selection['directives']}" if selection.get('directives') else ''
+            if selection['kind'] == 'spread':
+                lines.append(f"{inner}...{selection['name']}{directives}")
+            elif selection['kind'] == 'inline':
+                condition = f" on {selection['type_condition']}" if selection['type_condition'] else ''
+                lines.append(f"{inner}...{condition}{directives} {selection_set(selection['selections'], inner)}")
+            else:
+                text = f"{selection['alias']}: {selection['name']}" if selection['alias'] else selection['name']
+                if selection['args']:
+                    text += '(' + ', '.join(f"{name}: {value}" for name, value in selection['args']) + ')'
+                text += directives
+                if selection['selections'] is not None:
+                    text += ' ' + selection_set(selection['selections'], inner)
+                lines.append(inner + text)
+        return '{\n' + '\n'.join(lines) + '\n' + indent + '}'
+
+    parts = []
+    for operation in document['operations']:
+        head = operation['type']
+        if operation['name']:
+            head += f" {operation['name']}"
+        head += operation['variables']
+        if operation['directives']:
+            head += f" {operation['directives']}"
+        parts.append(f"{head} {selection_set(operation['selections'], '')}")
+    for fragment in document['fragments'].values():
+        directives = f" {fragment['directives']}" if fragment['directives'] else ''
+        parts.append(f"fragment {fragment['name']} on {fragment['type_condition']}{directives} "
+                     f"{selection_set(fragment['selections'], '')}")
+    return '\n\n'.join(parts)
+
+class QueryValidator:
+    """Validates documents against a SchemaModel.
+
+    Modes:
+      'check'  - report problems but send the document unchanged
+      'reject' - never send an invalid document
+      'repair' - rewrite unknown fields/arguments to their closest match, or drop
+                 them, then send what is left (reject if nothing valid remains)
+    """
+
+    def __init__(self, schema: SchemaModel, mode: str = 'repair', cutoff: float = REPAIR_CUTOFF):
+        if mode not in ('check', 'reject', 'repair'):
+            raise ValueError(f"Unknown validation mode: {mode}")
+        self.schema = schema
+        self.mode = mode
+        self.cutoff = cutoff
+
+    @classmethod
+    def from_schema_file(cls, path: str = SCHEMA_PATH, mode: str = 'repair') -> Optional['QueryValidator']:
+        """Build a validator from the cached schema, or None if no schema has been downloaded yet."""
+        try:
+            return cls(SchemaModel.load(path), mode)
+        except FileNotFoundError:
+            return None
+
+    def _closest(self, name: str, candidates: List[str]) -> Optional[str]:
+        if not name.endswith(KEY_SUFFIXES) and name != 'id':
+            candidates = [candidate for candidate in candidates
+                          if candidate != 'id' and not candidate.endswith(KEY_SUFFIXES)]
+        matches = difflib.get_close_matches(name, candidates, n=1, cutoff=self.cutoff)
+        return matches[0] if matches else None
+
+    def _walk(self, selections: List[Dict[str, Any]], type_name: str, path: str,
+              fragments: Dict[str, Any], errors: List[Dict[str, Any]], repairs: List[str],
+              repair: bool) -> List[Dict[str, Any]]:
+        """Validate one selection set; returns the (possibly repaired) selections."""
+        type_info = self.schema.get_type(type_name)
+        kept = []
+        for selection in selections:
+            if selection['kind'] == 'spread':
+                if selection['name'] not in fragments:
+                    errors.append({'message': f"fragment '{selection['name']}' is not defined", 'path': path})
+                    if repair:
+                        repairs.append(f"dropped spread ...{selection['name']} from {type_name}")
+                        continue
+                kept.append(selection)
+                continue
+
+            if selection['kind'] == 'inline':
+                inner_type = selection['type_condition'] or type_name
+                if selection['type_condition'] and not self.schema.get_type(inner_type):
+                    errors.append({'message': f"type '{inner_type}' not found", 'path': path})
+                    if repair:
+                        repairs.append(f"dropped fragment on unknown type {inner_type}")
+                    else:
+                        kept.append(selection)
+                    continue
+                selection['selections'] = self._walk(selection['selections'], inner_type, path,
+                                                     fragments, errors, repairs, repair)
+                if selection['selections'] or not repair:
+                    kept.append(selection)
+                continue
+
+            name = selection['name']
+            key = selection['alias'] or name
+            field_path = f"{path}.selectionSet.{key}"
+
+            # Meta fields are always allowed and their subtrees are not schema types we index
+            if name.startswith('__') or type_info is None:
+                kept.append(selection)
+                continue
+
+            field = type_info['fields'].get(name)
+            if field is None:
+                errors.append({'message': f"field '{name}' not found in type: '{type_name}'", 'path': field_path})
+                if not repair:
+                    kept.append(selection)
+                    continue
+                # Only leaf fields are renamed; a near-miss object field is usually a different table
+                replacement = self._closest(name, [candidate for candidate, info in type_info['fields'].items()
+                                                   if info['base_kind'] in ('SCALAR', 'ENUM')])
+                if replacement and selection['selections'] is None:
+                    repairs.append(f"{type_name}.{name} -> {type_name}.{replacement}")
+                    selection['name'] = name = replacement
+                    field = type_info['fields'][replacement]
+                else:
+                    repairs.append(f"dropped {type_name}.{name}")
+                    continue
+
+            for arg_name, value in list(selection['args']):
+                if arg_name in field['args']:
+                    continue
+                errors.append({'message': f"'{name}' has no argument named '{arg_name}'", 'path': field_path})
+                if repair:
+                    replacement = self._closest(arg_name, list(field['args']))
+                    index = selection['args'].index((arg_name, value))
+                    if replacement:
+                        selection['args'][index] = (replacement, value)
+                        repairs.append(f"{type_name}.{name}({arg_name}:) -> ({replacement}:)")
+                    else:
+                        del selection['args'][index]
+                        repairs.append(f"dropped argument {arg_name} from {type_name}.{name}")
+
+            is_composite = field['base_kind'] in ('OBJECT', 'INTERFACE', 'UNION')
+            if is_composite and selection['selections'] is None:
+                errors.append({'message': f"missing selection set for '{name}'", 'path': field_path})
+                if repair:
+                    repairs.append(f"dropped {type_name}.{name} (no selection set)")
+                    continue
+            elif not is_composite and selection['selections'] is not None:
+                errors.append({'message': f"unexpected subselection set for non-object field '{name}'",
+                               'path': field_path})
+                if repair:
+                    selection['selections'] = None
+                    repairs.append(f"removed subselection of scalar {type_name}.{name}")
+
+            if is_composite and selection['selections'] is not None:
+                selection['selections'] = self._walk(selection['selections'], field['base_type'], field_path,
+                                                     fragments, errors, repairs, repair)
+                if repair and not selection['selections']:
+                    repairs.append(f"dropped {type_name}.{name} (nothing valid left to select)")
+                    continue
+            kept.append(selection)
+        return kept
+
+    @staticmethod
+    def _prune(selections: List[Dict[str, Any]], emptied: set, repairs: List[str]) -> List[Dict[str, Any]]:
+        """Remove spreads of emptied fragments, and any selection set that is left empty by it."""
+        kept = []
+        for selection in selections:
+            if selection['kind'] == 'spread':
+                if selection['name'] in emptied:
+                    repairs.append(f"dropped spread ...{selection['name']} (fragment left empty)")
+                    continue
+            elif selection['selections'] is not None:
+                had_selections = bool(selection['selections'])
+                selection['selections'] = QueryValidator._prune(selection['selections'], emptied, repairs)
+                if had_selections and not selection['selections']:
+                    continue
+            kept.append(selection)
+        return kept
+
+    @staticmethod
+    def _spreads(selections: List[Dict[str, Any]]) -> List[str]:
+        names = []
+        for selection in selections:
+            if selection['kind'] == 'spread':
+                names.append(selection['name'])
+            elif selection['selections']:
+                names.extend(QueryValidator._spreads(selection['selections']))
+        return names
+
+    def _drop_empty_fragments(self, document: Dict[str, Any], repairs: List[str]):
+        """Drop fragments repair emptied, their spreads and the fragments no operation uses any more.
+
+        An empty selection set is a syntax error on the server, so emptiness is
+        propagated until nothing changes: a fragment whose only content was a
+        spread of an emptied fragment is emptied too.
+        """
+        fragments = document['fragments']
+        emptied = set()
+        while True:
+            newly = {name for name, fragment in fragments.items() if not fragment['selections']} - emptied
+            if not newly:
+                break
+            for name in sorted(newly):
+                repairs.append(f"dropped fragment {name} (nothing valid left to select)")
+            emptied |= newly
+            for name, fragment in fragments.items():
+                if name not in emptied:
+                    fragment['selections'] = self._prune(fragment['selections'], emptied, repairs)
+        for operation in document['operations']:
+            operation['selections'] = self._prune(operation['selections'], emptied, repairs)
+
+        used = set()
+        pending = [name for operation in document['operations'] for name in self._spreads(operation['selections'])]
+        while pending:
+            name = pending.pop()
+            if name in used or name not in fragments:
+                continue
+            used.add(name)
+            pending.extend(self._spreads(fragments[name]['selections']))
+        for name in list(fragments):
+            if name not in used:
+                if name not in emptied:
+                    repairs.append(f"dropped unused fragment {name}")
+                del fragments[name]
+
+    def validate(self, query: str) -> Dict[str, Any]:
+        """Validate (and in repair mode, fix) a document.
+
+        Returns {'valid', 'errors', 'repairs', 'query'}; 'query' is the document to
+        send, which is the original text unless something was repaired.
+        """
+        try:
+            document = parse_document(query)
+        except QuerySyntaxError as e:
+            return {'valid': False, 'errors': [{'message': str(e), 'path': '$'}], 'repairs': [], 'query': query}
+
+        repair = self.mode == 'repair'
+        errors: List[Dict[str, Any]] = []
+        repairs: List[str] = []
+        for fragment in document['fragments'].values():
+            fragment['selections'] = self._walk(fragment['selections'], fragment['type_condition'], '$',
+                                                document['fragments'], errors, repairs, repair)
+        for operation in document['operations']:
+            root = self.schema.root_names.get(operation['type']) or ''
+            operation['selections'] = self._walk(operation['selections'], root, '$',
+                                                 document['fragments'], errors, repairs, repair)
+
+        if not repair:
+            return {'valid': not errors, 'errors': errors, 'repairs': [], 'query': query}
+
+        if repairs:
+            self._drop_empty_fragments(document, repairs)
+        empty = any(not operation['selections'] for operation in document['operations'])
+        return {
+            'valid': not empty,
+            'errors': errors,
+            'repairs': repairs,
+            'query': print_document(document) if repairs else query,
+        }
+
+    @staticmethod
+    def error_response(errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Shape local validation errors like a Hasura error response."""
+        return {'errors': [
+            {'message': error['message'], 'extensions': {'path': error['path'], 'code': VALIDATION_CODE}}
+            for error in errors
+        ]}
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Adaptive Rate Limiter
+Token bucket whose refill rate is tuned AIMD-style from observed latency and errors.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+# Responses that mean "slow down" regardless of latency
+BACKOFF_STATUSES = {429, 500, 502, 503, 504}
+
+class AdaptiveRateLimiter:
+    """Limits requests per second and adapts the limit to how the server is coping.
+
+    Every `adjust_every` completed requests the p95 latency of the recent window is
+    compared with `target_p95`: below target the rate grows by `increase_step`
+    (additive increase), above target it is multiplied by `decrease_factor`
+    (multiplicative decrease). A 429/5xx or transport error backs off immediately.
+    After any decrease the rate is held for `cooldown` seconds, so a burst of
+    failures or a window still full of slow samples only counts once.
+    A server's Retry-After is passed to `hold`, which stops handing out tokens
+    until it has passed.
+    """
+
+    def __init__(self, initial_rate: float = 10.0, min_rate: float = 0.5, max_rate: float = 100.0,
+                 target_p95: float = 1.0, increase_step: float = 2.0, decrease_factor: float = 0.5,
+                 window: int = 50, adjust_every: int = 5, cooldown: float = 2.0, burst: float = 2.0):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_p95 = target_p95
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.adjust_every = adjust_every
+        self.cooldown = cooldown
+        self.burst = burst
+
+        self.latencies = deque(maxlen=window)
+        self.decisions: deque = deque(maxlen=200)
+        self.requests = 0
+        self.errors = 0
+        self._since_adjust = 0
+        self._last_backoff = 0.0
+        self._held_until = 0.0
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._held_until:
+                    # Tokens only start refilling once the hold is over
+                    self._tokens = 0.0
+                    self._last_refill = self._held_until
+                    wait = self._held_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                    self._last_refill = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def hold(self, seconds: float):
+        """Hand out no tokens for `seconds`, e.g. for a server's Retry-After."""
+        with self._lock:
+            self._held_until = max(self._held_until, time.monotonic() + seconds)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of the latencies in the current window."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def _decide(self, action: str, new_rate: float, reason: str):
+        new_rate = max(self.min_rate, min(self.max_rate, new_rate))
+        if new_rate != self.rate:
+            self.decisions.append({
+                'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'action': action,
+                'from_rate': round(self.rate, 3),
+                'to_rate': round(new_rate, 3),
+                'p95': self.p95(),
+                'reason': reason,
+            })
+            self.rate = new_rate
+
+    def record(self, latency: Optional[float], status: Optional[int] = None):
+        """Feed back one finished request; `latency` is None for transport errors."""
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+
+            if latency is None or status in BACKOFF_STATUSES:
+                self.errors += 1
+                if now - self._last_backoff >= self.cooldown:
+                    self._last_backoff = now
+                    self._since_adjust = 0
+                    reason = f"HTTP {status}" if status else "transport error"
+                    self._decide('decrease', self.rate * self.decrease_factor, reason)
+                return
+
+            self.latencies.append(latency)
+            self._since_adjust += 1
+            if self._since_adjust < self.adjust_every:
+                return
+            self._since_adjust = 0
+
+            p95 = self.p95()
+            if now - self._last_backoff < self.cooldown:
+                return
+            if p95 > self.target_p95:
+                self._last_backoff = now
+                self._decide('decrease', self.rate * self.decrease_factor,
+                             f"p95 {p95:.3f}s above target {self.target_p95:.3f}s")
+            else:
+                self._decide('increase', self.rate + self.increase_step,
+                             f"p95 {p95:.3f}s within target {self.target_p95:.3f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current rate, latency and recent decisions, for logs and summary files."""
+        with self._lock:
+            decisions: List[Dict[str, Any]] = list(self.decisions)
+            return {
+                'current_rate': round(self.rate, 3),
+                'target_p95': self.target_p95,
+                'observed_p95': self.p95(),
+                'requests': self.requests,
+                'errors': self.errors,
+                'decisions': decisions,
+            }
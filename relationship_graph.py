@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Relationship Graph
+Maps object and array relationships between tables from the schema, generates nested queries
+that fetch related rows in one round trip and flattens the responses back into per-table rows.
+"""
+
+from typing import Dict, Any, Optional, List, Tuple
+
+from schema_model import SchemaModel
+
+# Key used to link a nested row to its parent row when flattening
+LINK_KEY = 'id'
+
+class RelationshipGraph:
+    """Edges between table types: every field whose base type is another table.
+
+    Introspection types, mutation responses and `_aggregate` wrappers are left
+    out, so the graph only contains relationships that return table rows.
+    """
+
+    def __init__(self, schema: SchemaModel):
+        self.schema = schema
+        self.edges: Dict[str, List[Dict[str, Any]]] = {}
+        for type_name in schema.object_types():
+            if not self._is_table(type_name):
+                continue
+            for field in schema.types[type_name]['fields'].values():
+                if field['base_kind'] == 'OBJECT' and self._is_table(field['base_type']):
+                    self.edges.setdefault(type_name, []).append({
+                        'field': field['name'],
+                        'target': field['base_type'],
+                        'is_list': field['is_list'],
+                        'args': sorted(field['args']),
+                    })
+
+    def _is_table(self, type_name: str) -> bool:
+        return not (type_name.startswith('__') or type_name.endswith(('_mutation_response', '_aggregate'))
+                    or type_name in self.schema.root_names.values())
+
+    def relationships(self, type_name: str) -> List[Dict[str, Any]]:
+        return self.edges.get(type_name, [])
+
+    def scalar_fields(self, type_name: str) -> List[str]:
+        fields = (self.schema.get_type(type_name) or {}).get('fields', {})
+        return [name for name, field in fields.items() if field['base_kind'] in ('SCALAR', 'ENUM')]
+
+    def root_type(self, root_field: str) -> Optional[str]:
+        field = self.schema.get_root_field(root_field)
+        return field['base_type'] if field else None
+
+class NestedQueryBuilder:
+    """Builds one nested selection set per root table.
+
+    `projection` maps a dotted path ('workorders', 'workorders.inspections') to
+    the columns to select at that level; unlisted levels get every scalar.
+    Relationships are followed up to `depth` levels, never revisiting a type
+    already on the current path. Array relationships can be capped with
+    `child_limit`.
+    """
+
+    def __init__(self, graph: RelationshipGraph):
+        self.graph = graph
+
+    def _columns(self, type_name: str, path: str, projection: Dict[str, List[str]]) -> List[str]:
+        available = self.graph.scalar_fields(type_name)
+        columns = [c for c in projection[path] if c in available] if path in projection else available
+        # Keep the link key so flattened children can point back at their parent
+        if LINK_KEY in available and LINK_KEY not in columns:
+            columns = [LINK_KEY] + columns
+        return columns
+
+    def _selection(self, type_name: str, path: str, depth: int, projection: Dict[str, List[str]],
+                   child_limit: Optional[int], seen: List[str], indent: str, paths: List[str]) -> List[str]:
+        lines = [indent + column for column in self._columns(type_name, path, projection)]
+        if depth <= 0:
+            return lines
+        for edge in self.graph.relationships(type_name):
+            child_path = f"{path}.{edge['field']}"
+            if edge['target'] in seen:
+                continue
+            # With an explicit projection only the listed relationships are followed
+            if projection and child_path not in projection:
+                continue
+            args = f"(limit: {child_limit})" if edge['is_list'] and child_limit and 'limit' in edge['args'] else ''
+            paths.append(child_path)
+            lines.append(f"{indent}{edge['field']}{args} {{")
+            lines.extend(self._selection(edge['target'], child_path, depth - 1, projection, child_limit,
+                                         seen + [edge['target']], indent + '  ', paths))
+            lines.append(indent + '}')
+        return lines
+
+    def build(self, root_field: str, depth: int = 1, projection: Optional[Dict[str, List[str]]] = None,
+              args: Optional[str] = None, child_limit: Optional[int] = None) -> Tuple[str, List[str]]:
+        """Build the nested query; returns the document and the relationship paths it selects."""
+        type_name = self.graph.root_type(root_field)
+        if type_name is None:
+            raise ValueError(f"Unknown root field: {root_field}")
+        paths: List[str] = []
+        body = self._selection(type_name, root_field, depth, projection or {}, child_limit,
+                               [type_name], '        ', paths)
+        head = f"{root_field}({args})" if args else root_field
+        body_str = '\n'.join(body)
+        query = f"""
+    query nested{root_field.replace('_', '').title()} {{
+      {head} {{
+{body_str}
+      }}
+    }}
+    """
+        return query, paths
+
+def flatten(rows: List[Dict[str, Any]], root_field: str, paths: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Split a nested response into rows per path.
+
+    `paths` are the relationship paths returned by NestedQueryBuilder.build;
+    other nested values (jsonb columns) stay in their row. Each nested row gets
+    `_parent_id` (the parent's id) so the levels can be joined again, e.g.
+    {'workorders': [...], 'workorders.inspections': [...]}. Related rows reached
+    from several parents appear once per parent.
+    """
+    relations = set(paths)
+    tables: Dict[str, List[Dict[str, Any]]] = {root_field: []}
+    tables.update((path, []) for path in paths)
+    stack = [(root_field, row, None) for row in reversed(rows or [])]
+    while stack:
+        path, row, parent_id = stack.pop()
+        flat = {}
+        for key, value in row.items():
+            child_path = f"{path}.{key}"
+            if child_path not in relations:
+                flat[key] = value
+            elif isinstance(value, list):
+                stack.extend((child_path, item, row.get(LINK_KEY)) for item in reversed(value))
+            elif value is not None:
+                stack.append((child_path, value, row.get(LINK_KEY)))
+        if path != root_field:
+            flat['_parent_id'] = parent_id
+        tables[path].append(flat)
+    return tables
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+GraphQL Stand-In Server
+A local HTTP endpoint that answers GraphQL POSTs from recorded cassettes (or any responder),
+with configurable latency, jitter and error injection.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from cassette import load_cassettes, request_key
+
+# Responses at least this large are gzipped when the client accepts it, like Hasura behind a proxy
+GZIP_MIN_BYTES = 1024
+
+Responder = Callable[[Dict[str, Any]], Tuple[int, Any]]
+
+class CassetteResponder:
+    """Answers each request with what the real endpoint returned when it was recorded.
+
+    If a request was recorded several times, the last successful response
+    wins; unknown requests get a GraphQL error rather than a guess.
+    """
+
+    def __init__(self, filepaths: List[str]):
+        self.responses: Dict[str, Tuple[int, Any]] = {}
+        for key, exchanges in load_cassettes(filepaths).items():
+            successes = [exchange for exchange in exchanges if exchange[0] == 200]
+            self.responses[key] = (successes or exchanges)[-1]
+        self.unmatched = 0
+
+    def __call__(self, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        response = self.responses.get(request_key(payload.get('query', ''), payload.get('variables')))
+        if response is None:
+            self.unmatched += 1
+            return 200, {'errors': [{'message': 'No recorded response for this query',
+                                     'extensions': {'code': 'not-recorded', 'path': '$'}}]}
+        return response
+
+class StandInServer:
+    """Threaded HTTP server in front of a responder.
+
+    Every response is delayed by `latency` ± `jitter` seconds. A fraction
+    `error_rate` of requests fails with `error_status` (503 by default) before
+    the responder is asked. `seed` makes the jitter and the injected errors
+    repeatable.
+    """
+
+    def __init__(self, responder: Responder, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: Optional[int] = None):
+        self.responder = responder
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.injected_errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/graphql"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, response = server.handle(body)
+                data = json.dumps(response, ensure_ascii=False, default=str).encode('utf-8')
+                compress = len(data) >= GZIP_MIN_BYTES and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+                if compress:
+                    data = gzip.compress(data, compresslevel=5)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if compress:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                with server._lock:
+                    server.bytes_sent += len(data)
+
+        return Handler
+
+    def handle(self, body: bytes) -> Tuple[int, Any]:
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(body)
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return self.error_status, {'error': 'injected failure'}
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, {'errors': [{'message': 'Request body is not JSON'}]}
+        return self.responder(payload)
+
+    def start(self) -> 'StandInServer':
+        """Serve from a background thread (for tests and benchmarks)."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'requests': self.requests, 'injected_errors': self.injected_errors,
+                    'bytes_sent': self.bytes_sent, 'bytes_received': self.bytes_received}
+
+    def __enter__(self) -> 'StandInServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded GraphQL cassettes from a local stand-in endpoint.")
+    parser.add_argument('cassettes', nargs='+', help="Cassette files written with GRAPHQL_RECORD")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Added delay per response")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Random +/- variation of the delay")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for repeatable jitter and failures")
+    args = parser.parse_args()
+
+    responder = CassetteResponder(args.cassettes)
+    server = StandInServer(responder, args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000,
+                           args.error_rate, args.error_status, args.seed)
+    print(f"🎞️  Replaying {len(responder.responses)} recorded queries on {server.url}")
+    print(f"   Point the fetch scripts at it with GRAPHQL_URL={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        stats = server.stats()
+        print(f"\n📊 {stats['requests']} requests, {stats['injected_errors']} injected errors, "
+              f"{responder.unmatched} unmatched")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Response Cache
+Disk-backed cache of GraphQL responses with per-table TTLs and a size-bounded LRU.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+
+from atomic_io import atomic_open
+from schema_model import SCHEMA_CACHE_DIR
+
+RESPONSE_CACHE_DIR = os.path.join(SCHEMA_CACHE_DIR, "responses")
+
+# Opt-in, so exports and incremental syncs always see live data unless asked otherwise
+RESPONSE_CACHE = os.environ.get('RESPONSE_CACHE', '0') == '1'
+
+# Seconds a response stays fresh when none of its tables has its own TTL
+DEFAULT_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', '3600'))
+
+# Upper bound on the cache directory; least recently used entries go first
+MAX_CACHE_BYTES = int(float(os.environ.get('RESPONSE_CACHE_MAX_MB', '256')) * 1024 * 1024)
+
+# Per-root-field TTLs: introspection and lookup tables change rarely, inspection data often.
+# RESPONSE_CACHE_TTLS="answers_as_rows=60,bus=86400" overrides or extends these.
+TABLE_TTLS = {
+    '__schema': 86400,
+    '__type': 86400,
+    'answers_as_rows': 300,
+    'api_mobile_inspections': 300,
+    'api_mobile_workorders': 300,
+    'workorders': 300,
+    'workorder_details': 300,
+    'notifications': 120,
+    'notifications_center': 120,
+    'employee_push': 120,
+}
+for _entry in filter(None, os.environ.get('RESPONSE_CACHE_TTLS', '').split(',')):
+    _table, _, _ttl = _entry.partition('=')
+    TABLE_TTLS[_table.strip()] = float(_ttl)
+
+# Strings, names/numbers/variables and single punctuation characters; comments are dropped
+TOKEN_RE = re.compile(r'"(?:\\.|[^"\\])*"|#[^\n]*|[$A-Za-z0-9_.\-]+|[^\s]')
+
+def normalize_query(query: str) -> str:
+    """Canonical spacing, so reformatted copies of a query share a cache entry."""
+    return ' '.join(token for token in TOKEN_RE.findall(query) if not token.startswith('#'))
+
+def root_selections(query: str) -> List[Tuple[str, str]]:
+    """(response key, field name) for each top-level field of the first operation."""
+    tokens = normalize_query(query).split(' ')
+    selections = []
+    depth = 0
+    parens = 0
+    for index, token in enumerate(tokens):
+        if token == '(':
+            parens += 1
+        elif token == ')':
+            parens -= 1
+        elif parens:
+            pass
+        elif token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                break
+        elif depth == 1 and token != ':' and re.match(r'[A-Za-z_]', token):
+            # `alias: field` - the alias is the response key
+            if index + 1 < len(tokens) and tokens[index + 1] == ':':
+                continue
+            if index >= 2 and tokens[index - 1] == ':':
+                selections.append((tokens[index - 2], token))
+            else:
+                selections.append((token, token))
+    return selections
+
+def root_fields(query: str) -> List[str]:
+    """Field names (not aliases) selected at the top level of the first operation."""
+    return [field for _, field in root_selections(query)]
+
+def hasura_role(headers) -> str:
+    """The role Hasura will evaluate a request as, given its headers."""
+    headers = {name.lower(): value for name, value in headers.items()}
+    if 'x-hasura-role' in headers:
+        return headers['x-hasura-role']
+    return 'admin' if 'x-hasura-admin-secret' in headers else 'anonymous'
+
+class ResponseCache:
+    """Successful query responses stored as `<dir>/<key[:2]>/<key>.json`.
+
+    The key hashes the normalized query, its variables, the Hasura role the
+    request ran as (see hasura_role) and the endpoint URL, so responses from a
+    replay or synthetic stand-in are never served as live data. An entry expires after the smallest
+    TTL of the root fields it selected. Total size is kept under `max_bytes` by evicting the least recently used
+    entries; last use is the file's mtime, so the order survives restarts.
+    Mutations and responses with errors are never stored.
+    """
+
+    def __init__(self, cache_dir: str = RESPONSE_CACHE_DIR, default_ttl: float = DEFAULT_TTL,
+                 max_bytes: int = MAX_CACHE_BYTES, table_ttls: Optional[Dict[str, float]] = None):
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.table_ttls = TABLE_TTLS if table_ttls is None else table_ttls
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._scan()
+
+    @classmethod
+    def from_env(cls) -> Optional['ResponseCache']:
+        """The cache configured by RESPONSE_CACHE*, or None when caching is off."""
+        return cls() if RESPONSE_CACHE else None
+
+    def _scan(self):
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.json'):
+                        stat = entry.stat()
+                        found.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def key(self, query: str, variables: Optional[Dict] = None, role: str = 'anonymous', endpoint: str = '') -> str:
+        material = json.dumps({'query': normalize_query(query), 'variables': variables or {}, 'role': role,
+                               'endpoint': endpoint}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def ttl_for(self, query: str) -> float:
+        # `bus_aggregate` and `bus_by_pk` follow the TTL of `bus`
+        tables = [re.sub(r'_(aggregate|by_pk)$', '', field) for field in root_fields(query)]
+        ttls = [self.table_ttls[table] for table in tables if table in self.table_ttls]
+        return min(ttls) if ttls else self.default_ttl
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, query: str, variables: Optional[Dict] = None, role: str = 'anonymous',
+            endpoint: str = '') -> Optional[Dict[str, Any]]:
+        key = self.key(query, variables, role, endpoint)
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if time.time() - entry['stored_at'] > entry['ttl']:
+                self.expired += 1
+                self.misses += 1
+                self._forget(key)
+                return None
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry['response']
+
+    def put(self, query: str, variables: Optional[Dict], response: Dict[str, Any], role: str = 'anonymous',
+            endpoint: str = ''):
+        if 'errors' in response or normalize_query(query).startswith('mutation'):
+            return
+        key = self.key(query, variables, role, endpoint)
+        entry = {'stored_at': time.time(), 'ttl': self.ttl_for(query), 'response': response}
+        body = json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+        if len(body) > self.max_bytes:
+            return
+        with atomic_open(self._path(key), 'wb') as f:
+            f.write(body)
+
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(body)
+            self._bytes += len(body)
+            self.stores += 1
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._forget(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._forget(key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size, for logs and summary files."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
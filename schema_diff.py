@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Schema Diff
+Compares two introspection results and refreshes only what a schema change affects.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Any, Optional, List
+
+from analyze_schema import analyze_schema
+from schema_model import SchemaModel, SCHEMA_PATH
+
+SCHEMA_DIFF_PATH = "sample_data/schema_diff.json"
+SCHEMA_ANALYSIS_PATH = "sample_data/schema_analysis.json"
+
+def _diff_values(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Added, removed and retyped entries between two name -> value-info maps."""
+    return {
+        'added': sorted(set(new) - set(old)),
+        'removed': sorted(set(old) - set(new)),
+        'changed': {
+            name: {'from': old[name]['type_name'], 'to': new[name]['type_name']}
+            for name in sorted(set(old) & set(new))
+            if old[name]['type_name'] != new[name]['type_name']
+        },
+    }
+
+def _is_empty(diff: Dict[str, Any]) -> bool:
+    return not (diff['added'] or diff['removed'] or diff['changed'])
+
+def diff_models(old: SchemaModel, new: SchemaModel) -> Dict[str, Any]:
+    """Structured diff of two schemas: types, fields, arguments, input fields and enum values."""
+    changed_types = {}
+    for name in sorted(set(old.types) & set(new.types)):
+        if old.type_fingerprints[name] == new.type_fingerprints[name]:
+            continue
+        old_type, new_type = old.types[name], new.types[name]
+
+        type_diff: Dict[str, Any] = {}
+        if old_type['kind'] != new_type['kind']:
+            type_diff['kind'] = {'from': old_type['kind'], 'to': new_type['kind']}
+
+        fields = _diff_values(old_type['fields'], new_type['fields'])
+        if not _is_empty(fields):
+            type_diff['fields'] = fields
+
+        args = {}
+        for field_name in sorted(set(old_type['fields']) & set(new_type['fields'])):
+            field_args = _diff_values(old_type['fields'][field_name]['args'],
+                                      new_type['fields'][field_name]['args'])
+            if not _is_empty(field_args):
+                args[field_name] = field_args
+        if args:
+            type_diff['args'] = args
+
+        input_fields = _diff_values(old_type['input_fields'], new_type['input_fields'])
+        if not _is_empty(input_fields):
+            type_diff['input_fields'] = input_fields
+
+        added_values = sorted(set(new_type['enum_values']) - set(old_type['enum_values']))
+        removed_values = sorted(set(old_type['enum_values']) - set(new_type['enum_values']))
+        if added_values or removed_values:
+            type_diff['enum_values'] = {'added': added_values, 'removed': removed_values}
+
+        # Default values only show up in the fingerprint, not in the structural diff above
+        changed_types[name] = type_diff or {'defaults': 'changed'}
+
+    return {
+        'old_fingerprint': old.fingerprint,
+        'new_fingerprint': new.fingerprint,
+        'added_types': sorted(set(new.types) - set(old.types)),
+        'removed_types': sorted(set(old.types) - set(new.types)),
+        'changed_types': changed_types,
+    }
+
+def affected_types(diff: Dict[str, Any]) -> List[str]:
+    """Every type whose derived artifacts need regenerating."""
+    return sorted(set(diff['added_types']) | set(diff['removed_types']) | set(diff['changed_types']))
+
+def refresh_schema(schema_data: Dict[str, Any], path: str = SCHEMA_PATH,
+                   diff_path: str = SCHEMA_DIFF_PATH) -> Optional[Dict[str, Any]]:
+    """Store a fresh introspection result only if the schema actually changed.
+
+    Returns None when the fingerprint matches the schema already on disk (the file is
+    left untouched). Otherwise writes the new schema, writes a structured diff next
+    to it and regenerates the schema analysis if a root type changed. The diff is
+    returned. Selection sets need no invalidation: SmartDataFetcher derives them
+    from the loaded model, whose cache is keyed by the schema file's hash.
+    """
+    new_model = SchemaModel(schema_data)
+    try:
+        old_model = SchemaModel.load(path)
+    except (FileNotFoundError, ValueError, KeyError):
+        old_model = None
+
+    if old_model and old_model.fingerprint == new_model.fingerprint:
+        print(f"✅ Schema unchanged (fingerprint {new_model.fingerprint[:12]}); keeping {path}")
+        return None
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(schema_data, f, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+    print(f"Saved data to: {path}")
+
+    if old_model is None:
+        print(f"🆕 Schema stored for the first time (fingerprint {new_model.fingerprint[:12]})")
+        return {'old_fingerprint': None, 'new_fingerprint': new_model.fingerprint,
+                'added_types': sorted(new_model.types), 'removed_types': [], 'changed_types': {}}
+
+    diff = diff_models(old_model, new_model)
+    diff['generated_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(diff_path, 'w', encoding='utf-8') as f:
+        json.dump(diff, f, indent=2, ensure_ascii=False)
+
+    print(f"🔀 Schema changed: +{len(diff['added_types'])} / -{len(diff['removed_types'])} types, "
+          f"{len(diff['changed_types'])} changed (diff saved to {diff_path})")
+
+    # Regenerate only what depends on the affected types
+    root_names = {name for name in new_model.root_names.values() if name}
+    if root_names & set(affected_types(diff)) and os.path.exists(SCHEMA_ANALYSIS_PATH):
+        print("   ↳ Root types changed; regenerating schema analysis")
+        analyze_schema()
+
+    return diff
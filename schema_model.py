@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Schema Model
+Indexed view of the GraphQL introspection schema, cached on disk as a compact pickle.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, Any, Optional, List
+
+from profiling import phase
+
+# Where explore_graphql.py saves the introspection result
+SCHEMA_PATH = "sample_data/schema.json"
+SCHEMA_CACHE_DIR = "sample_data/.cache"
+
+# Bump when the cached structure changes so old caches are ignored
+MODEL_VERSION = 2
+
+def type_ref_name(type_def: Dict[str, Any]) -> str:
+    """Readable type name of a TypeRef, e.g. '[bus_select_column!]'."""
+    if type_def['kind'] == 'NON_NULL':
+        return type_ref_name(type_def['ofType']) + '!'
+    elif type_def['kind'] == 'LIST':
+        return '[' + type_ref_name(type_def['ofType']) + ']'
+    else:
+        return type_def.get('name', 'Unknown')
+
+def is_list_type(type_def: Dict[str, Any]) -> bool:
+    """True if a TypeRef has a LIST wrapper anywhere around its base type."""
+    while type_def.get('kind') in ('NON_NULL', 'LIST'):
+        if type_def['kind'] == 'LIST':
+            return True
+        type_def = type_def['ofType']
+    return False
+
+def base_type_ref(type_def: Dict[str, Any]) -> Dict[str, Any]:
+    """Innermost named TypeRef, with NON_NULL and LIST wrappers removed."""
+    while type_def.get('kind') in ('NON_NULL', 'LIST'):
+        type_def = type_def['ofType']
+    return type_def
+
+def type_fingerprint(type_info: Dict[str, Any]) -> str:
+    """Stable hash of an indexed type's shape; descriptions and ordering are ignored."""
+    shape = {
+        'kind': type_info['kind'],
+        'fields': {
+            name: {
+                'type': field['type_name'],
+                'args': {arg: [info['type_name'], info['default']] for arg, info in field['args'].items()},
+            }
+            for name, field in type_info['fields'].items()
+        },
+        'input_fields': {name: [info['type_name'], info['default']]
+                         for name, info in type_info['input_fields'].items()},
+        'enum_values': sorted(type_info['enum_values']),
+    }
+    return hashlib.sha256(json.dumps(shape, sort_keys=True).encode()).hexdigest()
+
+class SchemaModel:
+    def __init__(self, schema_data: Dict[str, Any]):
+        schema = schema_data['data']['__schema']
+        self.schema_hash: Optional[str] = None
+
+        self.root_names = {
+            'query': (schema.get('queryType') or {}).get('name'),
+            'mutation': (schema.get('mutationType') or {}).get('name'),
+            'subscription': (schema.get('subscriptionType') or {}).get('name'),
+        }
+        self.types: Dict[str, Dict[str, Any]] = {}
+        for type_def in schema['types']:
+            self.types[type_def['name']] = self._index_type(type_def)
+
+        # Structural fingerprints: unchanged across re-introspections of the same schema
+        self.type_fingerprints = {name: type_fingerprint(info) for name, info in self.types.items()}
+        self.fingerprint = hashlib.sha256(json.dumps(
+            [self.root_names, sorted(self.type_fingerprints.items())], sort_keys=True
+        ).encode()).hexdigest()
+
+    @staticmethod
+    def _index_value(value: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten a field or input value, precomputing its readable and base types."""
+        base = base_type_ref(value['type'])
+        return {
+            'name': value['name'],
+            'description': value.get('description'),
+            'type_name': type_ref_name(value['type']),
+            'base_type': base.get('name', 'Unknown'),
+            'base_kind': base.get('kind'),
+            'is_list': is_list_type(value['type']),
+            'default': value.get('defaultValue'),
+        }
+
+    def _index_type(self, type_def: Dict[str, Any]) -> Dict[str, Any]:
+        fields = {}
+        for field in type_def.get('fields') or []:
+            info = self._index_value(field)
+            info['args'] = {arg['name']: self._index_value(arg) for arg in field.get('args') or []}
+            fields[field['name']] = info
+        return {
+            'name': type_def['name'],
+            'kind': type_def['kind'],
+            'description': type_def.get('description'),
+            'fields': fields,
+            'input_fields': {value['name']: self._index_value(value)
+                             for value in type_def.get('inputFields') or []},
+            'enum_values': [value['name'] for value in type_def.get('enumValues') or []],
+        }
+
+    @classmethod
+    def load(cls, path: str = SCHEMA_PATH, cache_dir: str = SCHEMA_CACHE_DIR) -> 'SchemaModel':
+        """Load the schema, reusing the binary cache when the schema file is unchanged."""
+        with open(path, 'rb') as f:
+            raw = f.read()
+        schema_hash = hashlib.sha256(raw).hexdigest()
+        cache_path = os.path.join(cache_dir, f"schema_v{MODEL_VERSION}_{schema_hash[:16]}.pickle")
+
+        try:
+            with open(cache_path, 'rb') as f:
+                model = pickle.load(f)
+            if model.schema_hash == schema_hash:
+                return model
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError):
+            pass
+
+        with phase('parse'):
+            model = cls(json.loads(raw))
+        model.schema_hash = schema_hash
+        model.save(cache_path)
+
+        # Drop caches of older schema versions
+        for name in os.listdir(cache_dir):
+            if name.startswith('schema_v') and name.endswith('.pickle') and name != os.path.basename(cache_path):
+                os.remove(os.path.join(cache_dir, name))
+        return model
+
+    def save(self, cache_path: str):
+        """Write the model to its cache file atomically."""
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    def get_type(self, type_name: str) -> Optional[Dict[str, Any]]:
+        return self.types.get(type_name)
+
+    def root_type(self, root: str = 'query') -> Optional[Dict[str, Any]]:
+        """The query_root / mutation_root / subscription_root type."""
+        name = self.root_names.get(root)
+        return self.types.get(name) if name else None
+
+    def get_field(self, type_name: str, field_name: str) -> Optional[Dict[str, Any]]:
+        return self.types.get(type_name, {}).get('fields', {}).get(field_name)
+
+    def get_root_field(self, field_name: str, root: str = 'query') -> Optional[Dict[str, Any]]:
+        return self.get_field(self.root_names.get(root) or '', field_name)
+
+    def get_arg(self, type_name: str, field_name: str, arg_name: str) -> Optional[Dict[str, Any]]:
+        field = self.get_field(type_name, field_name)
+        return field['args'].get(arg_name) if field else None
+
+    def object_types(self) -> List[str]:
+        """Names of OBJECT types that have fields."""
+        return [name for name, info in self.types.items() if info['kind'] == 'OBJECT' and info['fields']]
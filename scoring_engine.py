@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Inspection Scoring Engine
+Compiles examination templates into weight and failure arrays and scores answers in batches with NumPy.
+"""
+
+import argparse
+import time
+from typing import Dict, Any, Optional, List, Iterable, Sequence, Tuple
+
+import numpy as np
+
+from columnar_export import ColumnarReader
+from json_writer import read_rows, write_json
+from profiling import run_main
+
+TEMPLATES_PATH = "sample_data/successful_data/examination_templates_sample.json"
+ANSWERS_PATH = "sample_data/exports/answers_as_rows.ndjson"
+
+# Answer columns the engine reads; the row grouping inspections is workorder_details_id
+ANSWER_COLUMNS = ['examination_template_id', 'workorder_details_id', 'question_id', 'answer_id',
+                  'bus_id', 'contractor_id']
+
+def failed_response_ids(value: Any) -> Optional[set]:
+    """Response ids that fail a question, from its `failed_responses` option.
+
+    A list or string names response ids. An int (2 in every sampled template)
+    has no confirmed meaning, so it gives None: no failure mask.
+    """
+    if value is None or value == '' or isinstance(value, bool):
+        return set()
+    if isinstance(value, (int, float)):
+        return None
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return {str(v) for v in values}
+
+def _score(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+class CompiledTemplate:
+    """Dense scoring tables for one template revision.
+
+    Questions are rows and response ids are columns: `scores[q, r]` is the
+    weighted score of answering question q with response r, `failed[q, r]`
+    whether that response fails the question. Question and response ids are
+    kept sorted so answers can be mapped onto the tables with searchsorted.
+    """
+
+    def __init__(self, template: Dict[str, Any]):
+        mobile = template.get('mobile_template') or {}
+        self.template_id = template['id']
+        self.rev = mobile.get('_rev')
+        response_sets = (mobile.get('template_data') or {}).get('response_sets') or {}
+
+        questions = [item for item in mobile.get('items') or [] if item.get('type') == 'question']
+        # Answers carry integer question ids, so a non-numeric item id can never be matched
+        self.skipped_items = [item.get('item_id') for item in questions if not str(item.get('item_id')).isdigit()]
+        questions = [item for item in questions if str(item.get('item_id')).isdigit()]
+        # Questions whose failed_responses is a count rather than response ids
+        self.unmasked_questions = 0
+        question_ids = sorted({int(item['item_id']) for item in questions})
+        response_ids = sorted({int(response['id']) for response_set in response_sets.values()
+                               for response in response_set.get('responses') or []})
+
+        self.question_ids = np.array(question_ids, dtype=np.int64)
+        self.response_ids = np.array(response_ids, dtype=np.int64)
+        # One spare column for answers whose response id is not in any response set
+        self.scores = np.zeros((len(question_ids), len(response_ids) + 1), dtype=np.float64)
+        self.failed = np.zeros_like(self.scores, dtype=bool)
+        self.max_scores = np.zeros(len(question_ids), dtype=np.float64)
+        self.mandatory = np.zeros(len(question_ids), dtype=bool)
+
+        row_of = {question_id: row for row, question_id in enumerate(question_ids)}
+        column_of = {response_id: column for column, response_id in enumerate(response_ids)}
+        for item in questions:
+            options = item.get('options') or {}
+            row = row_of[int(item['item_id'])]
+            weighting = _score(options.get('weighting', 1))
+            responses = (response_sets.get(str(options.get('response_set'))) or {}).get('responses') or []
+            failed_ids = failed_response_ids(options.get('failed_responses'))
+            if failed_ids is None:
+                self.unmasked_questions += 1
+                failed_ids = set()
+
+            for response in responses:
+                column = column_of[int(response['id'])]
+                if response.get('enable_score', True):
+                    self.scores[row, column] = weighting * _score(response.get('score'))
+                self.failed[row, column] = bool(response.get('failed')) or str(response['id']) in failed_ids
+            self.max_scores[row] = self.scores[row].max(initial=0.0)
+            self.mandatory[row] = bool(options.get('is_mandatory'))
+
+    def lookup(self, question_ids: np.ndarray, answer_ids: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Per-answer (matched, achieved, possible, failed, mandatory_failed) arrays."""
+        count = len(question_ids)
+        if not len(self.question_ids):
+            nothing = np.zeros(count, dtype=bool)
+            return nothing, np.zeros(count), np.zeros(count), nothing, nothing
+
+        rows = np.searchsorted(self.question_ids, question_ids).clip(max=len(self.question_ids) - 1)
+        # Answers without a response id (free text, skipped) are not scored
+        matched = (self.question_ids[rows] == question_ids) & (answer_ids >= 0)
+
+        columns = np.searchsorted(self.response_ids, answer_ids)
+        known = columns < len(self.response_ids)
+        known[known] = self.response_ids[columns[known]] == answer_ids[known]
+        columns[~known] = len(self.response_ids)
+
+        achieved = np.where(matched, self.scores[rows, columns], 0.0)
+        possible = np.where(matched, self.max_scores[rows], 0.0)
+        failed = matched & self.failed[rows, columns]
+        return matched, achieved, possible, failed, failed & self.mandatory[rows]
+
+class ScoringEngine:
+    def __init__(self, templates: Iterable[Dict[str, Any]] = ()):
+        self.templates: Dict[Any, Dict[str, Any]] = {}
+        # Compiled tables keyed by (template id, _rev); a new revision compiles once
+        self.compiled: Dict[Tuple[Any, Any], CompiledTemplate] = {}
+        self._warned = False
+        for template in templates:
+            self.add_template(template)
+
+    def add_template(self, template: Dict[str, Any]):
+        self.templates[template['id']] = template
+
+    def compile(self, template_id: Any) -> Optional[CompiledTemplate]:
+        template = self.templates.get(template_id)
+        if template is None:
+            return None
+        key = (template_id, (template.get('mobile_template') or {}).get('_rev'))
+        if key not in self.compiled:
+            compiled = self.compiled[key] = CompiledTemplate(template)
+            if compiled.skipped_items:
+                print(f"⚠️  Template {template_id}: skipped questions with non-numeric ids "
+                      f"{', '.join(map(str, compiled.skipped_items))}")
+            if compiled.unmasked_questions and not self._warned:
+                self._warned = True
+                # Warned once: the count meaning is unconfirmed for every template that uses it
+                print(f"⚠️  failed_responses is a number rather than response ids (first seen in template "
+                      f"{template_id}); those questions get no failure mask beyond responses marked failed")
+        return self.compiled[key]
+
+    def score(self, answers: Dict[str, Sequence[Any]]) -> Dict[str, Any]:
+        """Score answers given as columns (see ANSWER_COLUMNS; nulls as None).
+
+        Returns per-inspection, per-bus and per-contractor totals as NumPy
+        arrays: achieved and possible points, score percentage, failed answer
+        count and the number of mandatory failures.
+        """
+        template_ids = _int_column(answers['examination_template_id'])
+        inspection_ids = _int_column(answers['workorder_details_id'])
+        question_ids = _int_column(answers['question_id'])
+        answer_ids = _int_column(answers['answer_id'])
+        bus_ids = _int_column(answers['bus_id'])
+        contractor_ids = _int_column(answers['contractor_id'])
+
+        total = len(template_ids)
+        matched = np.zeros(total, dtype=bool)
+        achieved = np.zeros(total)
+        possible = np.zeros(total)
+        failed = np.zeros(total, dtype=bool)
+        mandatory_failed = np.zeros(total, dtype=bool)
+
+        # One vectorized lookup per template over all of its answers
+        order = np.argsort(template_ids, kind='stable')
+        unique_templates, starts = np.unique(template_ids[order], return_index=True)
+        ends = np.append(starts[1:], total)
+        for template_id, start, end in zip(unique_templates, starts, ends):
+            compiled = self.compile(int(template_id))
+            if compiled is None:
+                continue
+            index = order[start:end]
+            (matched[index], achieved[index], possible[index],
+             failed[index], mandatory_failed[index]) = compiled.lookup(question_ids[index], answer_ids[index])
+
+        valid = matched & (inspection_ids >= 0)
+        inspections = _group(inspection_ids[valid], achieved[valid], possible[valid],
+                             failed[valid], mandatory_failed[valid])
+
+        # Buses and contractors are scored over their inspections' answers
+        return {
+            'answers': {'total': total, 'matched': int(valid.sum())},
+            'inspections': inspections,
+            'buses': _group(bus_ids[valid], achieved[valid], possible[valid], failed[valid],
+                            mandatory_failed[valid], inspection_ids[valid]),
+            'contractors': _group(contractor_ids[valid], achieved[valid], possible[valid], failed[valid],
+                                  mandatory_failed[valid], inspection_ids[valid]),
+        }
+
+def _int_column(values: Sequence[Any]) -> np.ndarray:
+    """Integer ids as an int64 array, with nulls as -1."""
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        return values.astype(np.int64, copy=False)
+    return np.fromiter((-1 if value is None else int(value) for value in values), dtype=np.int64, count=len(values))
+
+def _group(keys: np.ndarray, achieved: np.ndarray, possible: np.ndarray, failed: np.ndarray,
+           mandatory_failed: np.ndarray, inspection_ids: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Sum answer-level arrays per key with bincount."""
+    ids, inverse = np.unique(keys, return_inverse=True)
+    achieved_sum = np.bincount(inverse, weights=achieved, minlength=len(ids))
+    possible_sum = np.bincount(inverse, weights=possible, minlength=len(ids))
+    group = {
+        'ids': ids,
+        'achieved': achieved_sum,
+        'possible': possible_sum,
+        'score': np.divide(achieved_sum * 100.0, possible_sum, out=np.zeros(len(ids)), where=possible_sum > 0),
+        'failed': np.bincount(inverse, weights=failed, minlength=len(ids)).astype(np.int64),
+        'mandatory_failed': np.bincount(inverse, weights=mandatory_failed, minlength=len(ids)).astype(np.int64),
+    }
+    if inspection_ids is not None:
+        # Distinct (group, inspection) pairs packed into one int64 so a 1-D unique suffices
+        span = int(inspection_ids.max(initial=0)) + 1
+        pairs = np.unique(inverse.astype(np.int64) * span + inspection_ids)
+        group['inspections'] = np.bincount(pairs // span, minlength=len(ids))
+    return group
+
+def group_records(group: Dict[str, np.ndarray], id_name: str) -> List[Dict[str, Any]]:
+    """Rows for JSON output, one per id."""
+    names = [name for name in group if name != 'ids']
+    return [
+        dict({id_name: int(group['ids'][i])},
+             **{name: round(float(group[name][i]), 2) if group[name].dtype.kind == 'f' else int(group[name][i])
+                for name in names})
+        for i in range(len(group['ids']))
+    ]
+
+def load_answer_columns(path: str) -> Dict[str, Sequence[Any]]:
+    """Answer columns from a columnar (.cols) export, or from NDJSON/JSON rows."""
+    if path.endswith('.cols'):
+        return ColumnarReader(path).read(ANSWER_COLUMNS)
+    columns: Dict[str, List[Any]] = {name: [] for name in ANSWER_COLUMNS}
+    for row in read_rows(path):
+        for name in ANSWER_COLUMNS:
+            columns[name].append(row.get(name))
+    return columns
+
+def main():
+    parser = argparse.ArgumentParser(description="Score inspections from answers and template weightings.")
+    parser.add_argument('--templates', default=TEMPLATES_PATH, help="examination_templates export or sample")
+    parser.add_argument('--answers', default=ANSWERS_PATH, help="answers_as_rows export (.ndjson, .json or .cols)")
+    parser.add_argument('--out', default="sample_data/inspection_scores.json", help="Where to write the scores")
+    args = parser.parse_args()
+
+    engine = ScoringEngine(read_rows(args.templates))
+    print(f"📋 Loaded {len(engine.templates)} templates")
+
+    started = time.time()
+    answers = load_answer_columns(args.answers)
+    loaded = time.time()
+    result = engine.score(answers)
+    scored = time.time()
+    print(f"📊 Scored {result['answers']['matched']}/{result['answers']['total']} answers "
+          f"(load {loaded - started:.2f}s, score {scored - loaded:.3f}s)")
+
+    report = {
+        'answers': result['answers'],
+        'inspections': group_records(result['inspections'], 'workorder_details_id'),
+        'buses': group_records(result['buses'], 'bus_id'),
+        'contractors': group_records(result['contractors'], 'contractor_id'),
+        'generated_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    path = write_json(report, args.out)
+    print(f"✅ {len(report['inspections'])} inspections, {len(report['buses'])} buses, "
+          f"{len(report['contractors'])} contractors scored; saved to {path}")
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Sharded Table Export
+Splits a table into disjoint key ranges or partition values, exports the shards in parallel and merges them.
+"""
+
+import heapq
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+from aggregate_planner import graphql_literal
+from atomic_io import atomic_write_json
+from export_checkpoint import ExportCheckpoint, EXPORT_MAX_AGE, count_lines
+
+SHARD_DIR_SUFFIX = ".shards"
+
+# Bytes copied per read when concatenating range shards
+COPY_CHUNK = 1 << 20
+
+def _aggregate(fetcher, table_name: str, body: str, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    args = f"(where: {graphql_literal(where)})" if where else ''
+    query = f"""
+    query shard{table_name.replace('_', '').title()}Stats {{
+      {table_name}_aggregate{args} {{
+        aggregate {{
+          {body}
+        }}
+      }}
+    }}
+    """
+    result = fetcher.execute_query(query)
+    if not result or 'errors' in result:
+        error_msg = result['errors'][0].get('message', 'Unknown error') if result else 'No response'
+        raise RuntimeError(f"Aggregate on {table_name} failed: {error_msg}")
+    return result['data'][f'{table_name}_aggregate']['aggregate']
+
+def count_rows(fetcher, table_name: str, where: Optional[Dict[str, Any]] = None) -> int:
+    return _aggregate(fetcher, table_name, 'count', where)['count']
+
+def plan_key_ranges(fetcher, table_name: str, key: str, shards: int) -> List[Dict[str, Any]]:
+    """Split [min(key), max(key)] into `shards` equal-width ranges.
+
+    The first range is open below and the last open above, so rows added
+    outside the planned bounds still land in exactly one shard. Raises
+    ValueError when the key has no numeric min/max to split.
+    """
+    try:
+        stats = _aggregate(fetcher, table_name, f"min {{ {key} }}\n          max {{ {key} }}")
+    except RuntimeError as e:
+        # uuid keys have no min/max, and some roles may not use _aggregate at all
+        raise ValueError(f"{table_name}.{key} cannot be split into ranges ({e})") from e
+    low, high = (stats.get('min') or {}).get(key), (stats.get('max') or {}).get(key)
+    if low is None:
+        return [{'where': None}]
+    if not isinstance(low, (int, float)) or isinstance(low, bool) or not isinstance(high, (int, float)):
+        raise ValueError(f"{table_name}.{key} is not numeric; shard by a partition column instead")
+
+    integral = isinstance(low, int) and isinstance(high, int)
+    bounds = []
+    for i in range(1, shards):
+        bound = low + (high - low) * i // shards if integral else low + (high - low) * i / shards
+        if bound > low and (not bounds or bound > bounds[-1]):
+            bounds.append(bound)
+    if not bounds:
+        return [{'where': None}]
+
+    ranges = [{'where': {key: {'_lt': bounds[0]}}}]
+    ranges.extend({'where': {key: {'_gte': lo, '_lt': hi}}} for lo, hi in zip(bounds, bounds[1:]))
+    ranges.append({'where': {key: {'_gte': bounds[-1]}}})
+    return ranges
+
+def plan_partitions(fetcher, table_name: str, column: str) -> List[Dict[str, Any]]:
+    """One shard per distinct value of `column`, plus one for NULLs."""
+    query = f"""
+    query shard{table_name.replace('_', '').title()}Partitions {{
+      {table_name}(distinct_on: [{column}], order_by: {{{column}: asc_nulls_last}}) {{
+        {column}
+      }}
+    }}
+    """
+    result = fetcher.execute_query(query)
+    if not result or 'errors' in result:
+        error_msg = result['errors'][0].get('message', 'Unknown error') if result else 'No response'
+        raise RuntimeError(f"Listing {table_name}.{column} values failed: {error_msg}")
+    values = [row[column] for row in result['data'][table_name] if row[column] is not None]
+    shards = [{'where': {column: {'_eq': value}}} for value in values]
+    shards.append({'where': {column: {'_is_null': True}}})
+    return shards
+
+def _iter_keyed_lines(filepath: str, key: str) -> Iterator[Tuple[Any, bytes]]:
+    with open(filepath, 'rb') as f:
+        for line in f:
+            yield json.loads(line)[key], line
+
+class ShardedExport:
+    """Exports one table as parallel shards, then merges them into `{table}.ndjson`.
+
+    Every shard is an ordinary checkpointed export restricted by a `where`
+    filter, written under `{table}.ndjson.shards/` with its own keyset cursor,
+    so an interrupted run resumes each shard where it stopped. The plan is
+    kept next to the shards and reused on a rerun with the same settings.
+
+    Key-range shards are already disjoint and ordered, so they are
+    concatenated; partition shards are merge-sorted by the key. The merged file
+    must match the sum of the shard manifests and the table's current count.
+    """
+
+    def __init__(self, fetcher, table_name: str, folder: str = "sample_data/exports",
+                 key: str = 'id', page_size: int = 1000, workers: int = 6,
+                 max_age: Optional[float] = EXPORT_MAX_AGE):
+        self.fetcher = fetcher
+        self.table_name = table_name
+        self.folder = folder
+        self.key = key
+        self.page_size = page_size
+        self.workers = max(1, workers)
+        self.max_age = max_age
+        self.filepath = os.path.join(folder, f"{table_name}.ndjson")
+        self.shard_dir = self.filepath + SHARD_DIR_SUFFIX
+        self.plan_path = os.path.join(self.shard_dir, "plan.json")
+
+    def _load_plan(self, settings: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with open(self.plan_path, 'r', encoding='utf-8') as f:
+                plan = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return plan['shards'] if plan.get('settings') == settings else None
+
+    def plan(self, shards: int, partition: Optional[str], resume: bool) -> List[Dict[str, Any]]:
+        settings = {'key': self.key, 'partition': partition, 'shards': None if partition else shards}
+        plan = self._load_plan(settings) if resume else None
+        if plan is not None:
+            print(f"⏩ Reusing shard plan for {self.table_name} ({len(plan)} shards)")
+            return plan
+
+        shutil.rmtree(self.shard_dir, ignore_errors=True)
+        if partition:
+            plan = plan_partitions(self.fetcher, self.table_name, partition)
+        else:
+            plan = plan_key_ranges(self.fetcher, self.table_name, self.key, shards)
+        for index, shard in enumerate(plan):
+            shard['file'] = f"shard-{index:04d}.ndjson"
+        atomic_write_json({'table': self.table_name, 'settings': settings, 'shards': plan}, self.plan_path)
+        return plan
+
+    def _export_shard(self, shard: Dict[str, Any], fields: List[str], resume: bool) -> int:
+        return self.fetcher.export_table(self.table_name, filename=shard['file'], folder=self.shard_dir,
+                                         page_size=self.page_size, fields=fields, key=self.key,
+                                         resume=resume, where=shard['where'], max_age=self.max_age)
+
+    def _merged_lines(self, plan: List[Dict[str, Any]], ordered: bool) -> Iterator[bytes]:
+        paths = [os.path.join(self.shard_dir, shard['file']) for shard in plan]
+        if ordered:
+            for path in paths:
+                with open(path, 'rb') as f:
+                    yield from iter(lambda: f.read(COPY_CHUNK), b'')
+        else:
+            for _, line in heapq.merge(*[_iter_keyed_lines(path, self.key) for path in paths],
+                                       key=lambda item: item[0]):
+                yield line
+
+    def merge(self, plan: List[Dict[str, Any]], fields: List[str], ordered: bool, total: int) -> int:
+        """Write the shards into the final export and its manifest; returns the row count.
+
+        The export is only published if its line count equals both the shard
+        manifests and `total`, the table's count once every shard finished.
+        """
+        manifests = []
+        for shard in plan:
+            path = os.path.join(self.shard_dir, shard['file'])
+            checkpoint = ExportCheckpoint(path, self.table_name, self.key, fields, self.page_size)
+            if not checkpoint.verify_complete():
+                raise RuntimeError(f"Shard {shard['file']} of {self.table_name} is incomplete")
+            manifests.append(checkpoint.manifest)
+        expected = sum(manifest['rows'] for manifest in manifests)
+        last_keys = [manifest['last_key'] for manifest in manifests if manifest['rows']]
+
+        checkpoint = ExportCheckpoint(self.filepath, self.table_name, self.key, fields, self.page_size)
+        checkpoint.begin(resume=False)
+        with open(checkpoint.partial_path, 'ab') as f:
+            for chunk in self._merged_lines(plan, ordered):
+                f.write(chunk)
+            f.flush()
+            written = count_lines(checkpoint.partial_path)
+            if written != expected:
+                raise RuntimeError(f"Merged {self.table_name} has {written} rows, shards reported {expected}")
+            if written != total:
+                raise RuntimeError(f"{self.table_name}: exported {written} rows but the table has {total} "
+                                   f"(changed during the export?); export it again without resuming")
+            checkpoint.commit_rows(f, written, max(last_keys) if last_keys else None)
+        checkpoint.finish()
+        return written
+
+    def run(self, shards: int = 8, partition: Optional[str] = None, resume: bool = True) -> int:
+        """Export the table in parallel shards; returns the verified row count."""
+        fields = self.fetcher.get_type_fields(self.table_name, max_fields=None)
+        if self.key not in fields:
+            fields = [self.key] + list(fields)
+        final = ExportCheckpoint(self.filepath, self.table_name, self.key, fields, self.page_size)
+        if resume and final.reusable(self.max_age, lambda: count_rows(self.fetcher, self.table_name)):
+            return final.manifest['rows']
+
+        plan = self.plan(shards, partition, resume)
+        print(f"🧩 {self.table_name}: {len(plan)} shards, {min(self.workers, len(plan))} workers")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            counts = list(executor.map(lambda shard: self._export_shard(shard, fields, resume), plan))
+
+        rows = self.merge(plan, fields, ordered=partition is None, total=count_rows(self.fetcher, self.table_name))
+        print(f"   ↳ {self.table_name}: {rows} rows merged from {len(counts)} shards, count verified")
+        shutil.rmtree(self.shard_dir, ignore_errors=True)
+        return rows
@@ -4,93 +4,218 @@ Smart Hasura Data Fetcher
 Uses introspection to discover field names and then fetches sample data properly.
 """
 
-import requests
 import json
 import os
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
 
-# GraphQL endpoint
-GRAPHQL_URL = "https://inspector-gql.tatweertransit.com/v1/graphql"
+from aggregate_planner import graphql_literal
+from async_fetch import AsyncFetchEngine
+from cassette import CassetteRecorder
+from export_checkpoint import ExportCheckpoint, EXPORT_MAX_AGE
+from graphql_client import GraphQLClient
+from json_writer import write_json
+from profiling import run_main
+from query_metrics import export_metrics
+from rate_limiter import AdaptiveRateLimiter
+from response_cache import ResponseCache
+from relationship_graph import RelationshipGraph, NestedQueryBuilder, flatten
+from sharded_export import count_rows
+from schema_model import SchemaModel, SCHEMA_PATH, base_type_ref
+from query_batching import QueryBatcher
+from template_sync import TemplateStore, TEMPLATE_TABLES
+
+# GraphQL endpoint; GRAPHQL_URL points the script elsewhere (e.g. at replay_server.py)
+GRAPHQL_URL = os.environ.get('GRAPHQL_URL', "https://inspector-gql.tatweertransit.com/v1/graphql")
+
+# Maximum number of queries in flight at once during a sweep
+MAX_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', '6'))
+
+# Number of root fields packed into one aliased GraphQL document
+BATCH_SIZE = int(os.environ.get('FETCH_BATCH_SIZE', '8'))
 
 class SmartDataFetcher:
     def __init__(self, url: str):
         self.url = url
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
+        self.client = GraphQLClient(url, headers={
             'User-Agent': 'Smart-DataFetcher/1.0',
             'x-hasura-admin-secret': 'uWkEPKJUF9hqC6Bj'
-        })
-        self.schema_types = {}
+        }, pool_size=MAX_CONCURRENCY, rate_limiter=AdaptiveRateLimiter(),
+            cache=ResponseCache.from_env(), recorder=CassetteRecorder.from_env())
+        self.session = self.client.session
+        self.schema: Optional[SchemaModel] = None
     
     def execute_query(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
         """Execute a GraphQL query with optional variables."""
-        payload = {'query': query}
-        if variables:
-            payload['variables'] = variables
-            
-        try:
-            response = self.session.post(
-                self.url,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"Error executing query: {e}")
-            return None
-    
-    def get_type_fields(self, type_name: str) -> List[str]:
+        return self.client.execute_query(query, variables)
+    
+    def get_type_fields(self, type_name: str, max_fields: Optional[int] = 15) -> List[str]:
         """Get field names for a specific GraphQL type."""
-        if not self.schema_types:
+        if self.schema is None:
             self.load_schema_types()
         
-        type_info = self.schema_types.get(type_name, {})
-        fields = type_info.get('fields', [])
+        type_info = self.schema.get_type(type_name) if self.schema else None
+        if not type_info:
+            return []
         
         # Return scalar fields only (avoid complex nested objects for now)
         scalar_fields = []
-        for field in fields:
-            field_type = self.get_base_type(field['type'])
+        for field in type_info['fields'].values():
+            field_type = field['base_type']
             if field_type in ['String', 'Int', 'Float', 'Boolean', 'ID', 'bigint', 'uuid', 'timestamptz', 'jsonb', 'numeric']:
                 scalar_fields.append(field['name'])
         
-        return scalar_fields[:15]  # Limit to first 15 fields to avoid huge queries
+        if max_fields is None:
+            return scalar_fields
+        return scalar_fields[:max_fields]  # Limit to first 15 fields to avoid huge queries
+    
+    def get_field_type(self, type_name: str, field_name: str) -> Optional[str]:
+        """Get the base type name of a single field on a GraphQL type."""
+        if self.schema is None:
+            self.load_schema_types()
+        
+        field = self.schema.get_field(type_name, field_name) if self.schema else None
+        return field['base_type'] if field else None
+    
+    def iter_table_pages(self, table_name: str, fields: Optional[List[str]] = None,
+                         page_size: int = 1000, key: str = 'id',
+                         start_after: Any = None,
+                         where: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Walk a table with keyset pagination, yielding one page of rows at a time.
+        
+        Each page is requested with `where: {key: {_gt: $last}}` ordered by the key,
+        so the cost of a page does not grow with how deep into the table we are.
+        An optional `where` filter restricts the walk to part of the table.
+        """
+        if fields is None:
+            fields = self.get_type_fields(table_name, max_fields=None)
+        if key not in fields:
+            fields = [key] + list(fields)
+        
+        key_type = self.get_field_type(table_name, key) or 'bigint'
+        fields_str = '\n    '.join(fields)
+        first_where = f", where: {graphql_literal(where)}" if where else ''
+        next_where = f"{{_and: [{graphql_literal(where)}, {{{key}: {{_gt: $last}}}}]}}" if where else \
+            f"{{{key}: {{_gt: $last}}}}"
+        first_query = f"""
+        query export{table_name.replace('_', '').title()}First($limit: Int!) {{
+          {table_name}(limit: $limit, order_by: {{{key}: asc}}{first_where}) {{
+            {fields_str}
+          }}
+        }}
+        """
+        next_query = f"""
+        query export{table_name.replace('_', '').title()}Next($last: {key_type}!, $limit: Int!) {{
+          {table_name}(limit: $limit, order_by: {{{key}: asc}}, where: {next_where}) {{
+            {fields_str}
+          }}
+        }}
+        """
+        
+        last = start_after
+        while True:
+            if last is None:
+                result = self.execute_query(first_query, {'limit': page_size})
+            else:
+                result = self.execute_query(next_query, {'last': last, 'limit': page_size})
+            
+            if not result or 'errors' in result:
+                error_msg = result['errors'][0].get('message', 'Unknown error') if result else 'No response'
+                raise RuntimeError(f"Export of {table_name} failed after key {last!r}: {error_msg}")
+            
+            rows = result.get('data', {}).get(table_name) or []
+            if not rows:
+                return
+            yield rows
+            
+            if len(rows) < page_size:
+                return
+            last = rows[-1][key]
+    
+    def export_table(self, table_name: str, filename: Optional[str] = None,
+                     folder: str = "sample_data/exports", page_size: int = 1000,
+                     fields: Optional[List[str]] = None, key: str = 'id',
+                     resume: bool = True, where: Optional[Dict[str, Any]] = None,
+                     max_age: Optional[float] = EXPORT_MAX_AGE) -> int:
+        """Stream a whole table to an NDJSON file, one row per line.
+        
+        Pages are written as soon as they arrive, so memory use is bounded by
+        the page size rather than by the size of the table. Every page is
+        checkpointed (see ExportCheckpoint), so an interrupted export picks up
+        after the last committed page; `resume=False` starts from scratch.
+        A completed export is only reused while it is younger than `max_age`
+        seconds and the table's live count still matches it.
+        `where` exports only the matching rows (used for shards).
+        """
+        os.makedirs(folder, exist_ok=True)
+        filepath = os.path.join(folder, filename or f"{table_name}.ndjson")
+        if fields is None:
+            fields = self.get_type_fields(table_name, max_fields=None)
+        if key not in fields:
+            fields = [key] + list(fields)
+        
+        checkpoint = ExportCheckpoint(filepath, table_name, key, fields, page_size)
+        if resume and checkpoint.reusable(max_age, lambda: count_rows(self, table_name, where)):
+            return checkpoint.manifest['rows']
+        
+        last = checkpoint.begin(resume)
+        total_rows = checkpoint.manifest['rows']
+        with open(checkpoint.partial_path, 'ab') as f:
+            for rows in self.iter_table_pages(table_name, fields, page_size, key, start_after=last, where=where):
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str).encode('utf-8'))
+                    f.write(b'\n')
+                checkpoint.commit_page(f, rows)
+                total_rows += len(rows)
+                print(f"   ↳ {table_name}: {total_rows} rows")
+        checkpoint.finish()
+        
+        print(f"Exported {total_rows} rows to: {filepath}")
+        return total_rows
+    
+    def fetch_related(self, table_name: str, depth: int = 1,
+                      projection: Optional[Dict[str, List[str]]] = None,
+                      limit: Optional[int] = None, child_limit: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Fetch a table together with its related rows in one nested query.
+        
+        Returns rows per path ('api_mobile_workorders', 'api_mobile_workorders.inspections', ...);
+        nested rows carry `_parent_id`. See NestedQueryBuilder for `projection`.
+        """
+        if self.schema is None:
+            self.load_schema_types()
+        if self.schema is None:
+            return {}
+        
+        builder = NestedQueryBuilder(RelationshipGraph(self.schema))
+        query, paths = builder.build(table_name, depth, projection,
+                                     args=f"limit: {limit}" if limit else None, child_limit=child_limit)
+        result = self.execute_query(query)
+        if not result or 'errors' in result:
+            error_msg = result['errors'][0].get('message', 'Unknown error') if result else 'No response'
+            raise RuntimeError(f"Nested fetch of {table_name} failed: {error_msg}")
+        return flatten(result.get('data', {}).get(table_name) or [], table_name, paths)
     
     def get_base_type(self, type_def: Dict) -> str:
         """Extract the base type name from a GraphQL type definition."""
-        if type_def.get('kind') == 'NON_NULL':
-            return self.get_base_type(type_def['ofType'])
-        elif type_def.get('kind') == 'LIST':
-            return self.get_base_type(type_def['ofType'])
-        else:
-            return type_def.get('name', 'Unknown')
+        return base_type_ref(type_def).get('name', 'Unknown')
     
     def load_schema_types(self):
         """Load schema types from the previously saved schema file."""
         try:
-            with open('sample_data/schema.json', 'r') as f:
-                schema_data = json.load(f)
-            
-            types = schema_data['data']['__schema']['types']
-            for type_def in types:
-                if type_def['kind'] == 'OBJECT' and type_def['fields']:
-                    self.schema_types[type_def['name']] = type_def
-            
-            print(f"📋 Loaded {len(self.schema_types)} object types from schema")
+            # Reuses the indexed binary cache unless schema.json has changed
+            self.schema = SchemaModel.load(SCHEMA_PATH)
+            print(f"📋 Loaded {len(self.schema.object_types())} object types from schema")
         except FileNotFoundError:
             print("❌ Schema file not found. Please run explore_graphql.py first.")
     
-    def save_json(self, data: Any, filename: str, folder: str = "sample_data"):
-        """Save data as JSON file in specified folder."""
+    def save_json(self, data: Any, filename: str, folder: str = "sample_data") -> str:
+        """Save data in specified folder, in the SAVE_FORMAT / SAVE_GZIP output format; returns the path written."""
         os.makedirs(folder, exist_ok=True)
         filepath = os.path.join(folder, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        filepath = write_json(data, filepath)
         print(f"Saved: {filepath}")
+        return filepath
 
 def main():
     fetcher = SmartDataFetcher(GRAPHQL_URL)
@@ -121,10 +246,13 @@ def main():
     successful_queries = 0
     failed_queries = 0
     
-    print(f"\n📥 Fetching data from {len(tables_to_fetch)} tables...")
+    print(f"\n📥 Fetching data from {len(tables_to_fetch)} tables (concurrency {MAX_CONCURRENCY})...")
     
+    selections = []
     for table_name in tables_to_fetch:
-        print(f"\n🔄 Fetching: {table_name}")
+        if table_name in TEMPLATE_TABLES:
+            # Template bodies are large; they are fetched by revision below
+            continue
         
         # Get field names for this table type
         fields = fetcher.get_type_fields(table_name)
@@ -134,70 +262,84 @@ def main():
             failed_queries += 1
             continue
         
-        # Create query with actual field names
+        # Select the actual field names
         fields_str = '\n    '.join(fields)
-        query = f"""
-        query get{table_name.replace('_', '').title()} {{
-          {table_name}(limit: 10) {{
-            {fields_str}
-          }}
-        }}
-        """
-        
-        result = fetcher.execute_query(query)
-        
-        if result and 'errors' not in result:
-            filename = f"{table_name}_sample.json"
-            fetcher.save_json(result, filename)
-            record_count = len(result.get('data', {}).get(table_name, []))
-            print(f"✅ {table_name} - Success ({record_count} records)")
-            successful_queries += 1
-        else:
-            print(f"❌ {table_name} - Failed")
-            if result and 'errors' in result:
-                error_msg = result['errors'][0].get('message', 'Unknown error')
-                print(f"   Error: {error_msg}")
-                # Save error for debugging
-                filename = f"{table_name}_error.json"
-                fetcher.save_json(result, filename)
-            failed_queries += 1
-        
-        # Small delay to be respectful to the API
-        time.sleep(0.3)
+        selections.append({'kind': 'sample', 'table': table_name, 'field': table_name,
+                           'args': 'limit: 10', 'selection': fields_str})
     
     # Try to get some aggregate counts
-    print(f"\n📊 Fetching aggregate data...")
-    
     for table_name in tables_to_fetch[:6]:  # Try first 6 tables
-        print(f"\n🔄 Getting count for: {table_name}")
-        
-        count_query = f"""
-        query get{table_name.replace('_', '').title()}Count {{
-          {table_name}_aggregate {{
-            aggregate {{
-              count
-            }}
-          }}
-        }}
-        """
-        
-        result = fetcher.execute_query(count_query)
+        selections.append({'kind': 'count', 'table': table_name, 'field': f'{table_name}_aggregate',
+                           'args': None, 'selection': 'aggregate {\n      count\n    }'})
+    
+    # Pack sample and count selections into aliased batches and send the batches in parallel
+    batcher = QueryBatcher(fetcher.execute_query, batch_size=BATCH_SIZE)
+    batch_jobs = batcher.plan(selections)
+    print(f"📦 {len(selections)} queries packed into {len(batch_jobs)} batched requests")
+    
+    engine = AsyncFetchEngine(fetcher.client, concurrency=MAX_CONCURRENCY)
+    batch_results = engine.run_all(batch_jobs)
+    
+    # Selections isolated from failed batches are re-sent through the engine as well
+    results = batcher.resolve_all(batch_results, engine.run_all)
+    
+    for job, result in results:
+        table_name = job['table']
         
-        if result and 'errors' not in result:
-            filename = f"{table_name}_count.json"
-            fetcher.save_json(result, filename)
-            count = result.get('data', {}).get(f'{table_name}_aggregate', {}).get('aggregate', {}).get('count', 0)
-            print(f"✅ {table_name} - Count: {count}")
-            successful_queries += 1
+        if job['kind'] == 'sample':
+            if result and 'errors' not in result:
+                filename = f"{table_name}_sample.json"
+                fetcher.save_json(result, filename)
+                record_count = len(result.get('data', {}).get(table_name, []))
+                print(f"✅ {table_name} - Success ({record_count} records)")
+                successful_queries += 1
+            else:
+                print(f"❌ {table_name} - Failed")
+                if result and 'errors' in result:
+                    error_msg = result['errors'][0].get('message', 'Unknown error')
+                    print(f"   Error: {error_msg}")
+                    # Save error for debugging
+                    filename = f"{table_name}_error.json"
+                    fetcher.save_json(result, filename)
+                failed_queries += 1
         else:
-            print(f"❌ {table_name} - Count failed")
+            if result and 'errors' not in result:
+                filename = f"{table_name}_count.json"
+                fetcher.save_json(result, filename)
+                count = result.get('data', {}).get(f'{table_name}_aggregate', {}).get('aggregate', {}).get('count', 0)
+                print(f"✅ {table_name} - Count: {count}")
+                successful_queries += 1
+            else:
+                print(f"❌ {table_name} - Count failed")
+                failed_queries += 1
+    
+    # Templates: list ids and revisions, then download only the bodies that changed
+    template_store = TemplateStore(fetcher)
+    for table_name in tables_to_fetch:
+        if table_name not in TEMPLATE_TABLES:
+            continue
+        try:
+            rows, stats = template_store.sync(table_name, limit=10)
+        except RuntimeError as e:
+            print(f"❌ {table_name} - Failed")
+            print(f"   Error: {e}")
             failed_queries += 1
-        
-        time.sleep(0.2)
+            continue
+        fetcher.save_json({'data': {table_name: rows}}, f"{table_name}_sample.json")
+        print(f"✅ {table_name} - Success ({stats['total']} records, "
+              f"{stats['downloaded']} downloaded, {stats['cached']} unchanged)")
+        successful_queries += 1
     
     print(f"\n🎉 Smart data fetching completed!")
     print(f"✅ Successful queries: {successful_queries}")
     print(f"❌ Failed queries: {failed_queries}")
+    print(f"⏱️  Request rate settled at {fetcher.client.rate_limiter.rate:.2f} req/s")
+    if fetcher.client.cache:
+        cache = fetcher.client.cache.snapshot()
+        print(f"💾 Response cache: {cache['hits']} hits, {cache['misses']} misses")
+    latency = fetcher.client.metrics.report()['total']['latency']
+    if latency['p95'] is not None:
+        print(f"📈 Request latency p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, p99 {latency['p99']:.2f}s")
     print(f"📁 All data saved in the 'sample_data' folder")
     
     # Create a summary file
@@ -208,11 +350,14 @@ def main():
         "successful_queries": successful_queries,
         "failed_queries": failed_queries,
         "tables_fetched": tables_to_fetch,
-        "fetch_timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        "fetch_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "rate_limiter": fetcher.client.rate_limiter.snapshot(),
+        "response_cache": fetcher.client.cache.snapshot() if fetcher.client.cache else None,
+        "query_metrics": export_metrics(fetcher.client.metrics)
     }
     
-    fetcher.save_json(summary, "smart_fetch_summary.json")
-    print(f"📋 Summary saved to: sample_data/smart_fetch_summary.json")
+    summary_path = fetcher.save_json(summary, "smart_fetch_summary.json")
+    print(f"📋 Summary saved to: {summary_path}")
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
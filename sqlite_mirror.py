@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+SQLite Mirror
+Loads exported tables and sample files into a local SQLite database for offline analytics.
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Any, Optional, List, Iterable, Iterator
+
+from json_writer import read_rows
+from profiling import run_main
+from schema_model import SchemaModel, SCHEMA_PATH
+
+MIRROR_DB_PATH = "sample_data/mirror.db"
+
+# Where exports and sample files are picked up from, in order of preference
+EXPORTS_FOLDER = "sample_data/exports"
+SAMPLES_FOLDER = "sample_data/successful_data"
+
+# Foreign keys we join on; indexed in every table that has them
+INDEXED_COLUMNS = ['bus_id', 'examination_template_id', 'contract_id', 'contractor_id', 'created_by']
+
+# Rows per executemany call inside the load transaction
+INSERT_BATCH_SIZE = 5000
+
+# GraphQL scalar -> SQLite column type
+SQLITE_TYPES = {
+    'Int': 'INTEGER',
+    'bigint': 'INTEGER',
+    'smallint': 'INTEGER',
+    'Boolean': 'INTEGER',
+    'Float': 'REAL',
+    'float8': 'REAL',
+    'numeric': 'NUMERIC',
+    'String': 'TEXT',
+    'ID': 'TEXT',
+    'uuid': 'TEXT',
+    'date': 'TEXT',
+    'timestamp': 'TEXT',
+    'timestamptz': 'TEXT',
+    'jsonb': 'TEXT',
+    'json': 'TEXT',
+}
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def infer_sqlite_type(values: Iterable[Any]) -> str:
+    """Column type from the values themselves, for tables the schema does not describe."""
+    kinds = {type(value) for value in values if value is not None}
+    if kinds and kinds <= {int, bool}:
+        return 'INTEGER'
+    if kinds and kinds <= {int, float}:
+        return 'REAL'
+    return 'TEXT'
+
+def to_sqlite_value(value: Any) -> Any:
+    """Nested objects and lists (jsonb, arrays) are stored as JSON text."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def find_sources(exports_folder: str = EXPORTS_FOLDER, samples_folder: str = SAMPLES_FOLDER) -> Dict[str, str]:
+    """Table name -> file to load it from; a full export wins over a 10-row sample."""
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(samples_folder, '*_sample.json*'))):
+        name = os.path.basename(path).split('.')[0][:-len('_sample')]
+        sources[name] = path
+    # Only finished exports: not <table>.ndjson.manifest.json, .partial, .tmp or <table>.ndjson.shards/
+    for pattern in ('*.ndjson', '*.ndjson.gz'):
+        for path in sorted(glob.glob(os.path.join(exports_folder, pattern))):
+            if os.path.isfile(path):
+                sources[os.path.basename(path).split('.')[0]] = path
+    return sources
+
+class SQLiteMirror:
+    def __init__(self, db_path: str = MIRROR_DB_PATH, schema: Optional[SchemaModel] = None):
+        self.db_path = db_path
+        self.schema = schema
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # Bulk loads are reproducible from the exports, so trade durability for speed
+        self.conn.execute('PRAGMA synchronous=OFF')
+
+    def column_types(self, table_name: str, columns: List[str], sample_rows: List[Dict[str, Any]]) -> Dict[str, str]:
+        """SQLite type per column: from the schema when the table is known, else inferred."""
+        type_info = self.schema.get_type(table_name) if self.schema else None
+        types = {}
+        for column in columns:
+            field = type_info['fields'].get(column) if type_info else None
+            if field and not field['is_list'] and field['base_kind'] in ('SCALAR', 'ENUM'):
+                types[column] = SQLITE_TYPES.get(field['base_type'], 'TEXT')
+            else:
+                types[column] = infer_sqlite_type(row.get(column) for row in sample_rows)
+        return types
+
+    def load_table(self, table_name: str, rows: Iterable[Dict[str, Any]]) -> int:
+        """Replace `table_name` with `rows`, inserted in one transaction."""
+        rows = iter(rows)
+        head = []
+        for row in rows:
+            head.append(row)
+            if len(head) >= INSERT_BATCH_SIZE:
+                break
+        if not head:
+            return 0
+
+        columns = list(dict.fromkeys(column for row in head for column in row))
+        types = self.column_types(table_name, columns, head)
+        table = quote_identifier(table_name)
+        column_defs = ', '.join(
+            f"{quote_identifier(column)} {types[column]}" + (' PRIMARY KEY' if column == 'id' else '')
+            for column in columns
+        )
+        insert_sql = (f"INSERT OR REPLACE INTO {table} ({', '.join(quote_identifier(c) for c in columns)}) "
+                      f"VALUES ({', '.join('?' for _ in columns)})")
+
+        def batches() -> Iterator[List[tuple]]:
+            batch = [tuple(to_sqlite_value(row.get(c)) for c in columns) for row in head]
+            for row in rows:
+                batch.append(tuple(to_sqlite_value(row.get(c)) for c in columns))
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        total = 0
+        with self.conn:
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute(f"CREATE TABLE {table} ({column_defs})")
+            for batch in batches():
+                self.conn.executemany(insert_sql, batch)
+                total += len(batch)
+            # Indexes are built once after the bulk insert rather than maintained per row
+            for column in INDEXED_COLUMNS:
+                if column in columns:
+                    self.conn.execute(f"CREATE INDEX {quote_identifier(f'idx_{table_name}_{column}')} "
+                                      f"ON {table} ({quote_identifier(column)})")
+        return total
+
+    def load_file(self, table_name: str, path: str) -> int:
+        rows = read_rows(path)
+        first = next(rows, None)
+        if first is not None and set(first) <= {'data', 'errors'}:
+            # read_rows hands back non-table payloads (e.g. action results) as one document
+            raise ValueError(f"{path} is not a table result")
+        return self.load_table(table_name, itertools.chain([] if first is None else [first], rows))
+
+    def close(self):
+        self.conn.execute('PRAGMA optimize')
+        self.conn.close()
+
+def load_schema() -> Optional[SchemaModel]:
+    for path in (SCHEMA_PATH, os.path.join(SAMPLES_FOLDER, 'schema.json')):
+        if os.path.exists(path):
+            return SchemaModel.load(path)
+    print("⚠️  No schema file found; column types will be inferred from the data")
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize exported tables into a local SQLite database.")
+    parser.add_argument('tables', nargs='*', help="Tables to load (default: every export and sample found)")
+    parser.add_argument('--db', default=MIRROR_DB_PATH, help="SQLite database file")
+    parser.add_argument('--exports', default=EXPORTS_FOLDER, help="Folder with NDJSON exports")
+    parser.add_argument('--samples', default=SAMPLES_FOLDER, help="Folder with *_sample.json files")
+    args = parser.parse_args()
+
+    sources = find_sources(args.exports, args.samples)
+    tables = args.tables or sorted(sources)
+    mirror = SQLiteMirror(args.db, load_schema())
+
+    print(f"🗄️  Loading {len(tables)} tables into {args.db}")
+    loaded = 0
+    for table_name in tables:
+        path = sources.get(table_name)
+        if not path:
+            print(f"❌ {table_name} - no export or sample file found")
+            continue
+        started = time.time()
+        try:
+            rows = mirror.load_file(table_name, path)
+        except (ValueError, sqlite3.Error) as e:
+            print(f"❌ {table_name} - {e}")
+            continue
+        loaded += 1
+        print(f"✅ {table_name} - {rows} rows from {path} in {time.time() - started:.2f}s")
+
+    mirror.close()
+    print(f"\n🎉 Mirror ready: {loaded}/{len(tables)} tables in {args.db}")
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Synthetic Hasura
+A responder for replay_server.StandInServer that answers queries from generated rows at any scale,
+shaped like the recorded samples and typed by the cached schema.
+"""
+
+import glob
+import json
+import os
+from typing import Dict, Any, Optional, List, Tuple, Iterator
+
+from query_validator import QuerySyntaxError, parse_document, tokenize
+from schema_model import SchemaModel
+
+SAMPLES_DIR = "sample_data/successful_data"
+
+# Row count for tables without a recorded `_count.json`, before scaling
+DEFAULT_ROWS = 1000
+
+# Placeholder values for columns the recorded samples did not include
+SCALAR_DEFAULTS = {
+    'Boolean': False,
+    'Float': 0.0,
+    'jsonb': {},
+    'json': {},
+    'timestamptz': '2025-08-01T00:00:00+00:00',
+    'timestamp': '2025-08-01T00:00:00',
+    'date': '2025-08-01',
+}
+NUMERIC_TYPES = {'Int', 'bigint', 'smallint', 'numeric', 'Float', 'float8'}
+
+class LiteralError(ValueError):
+    """Raised for argument values this stand-in does not understand."""
+
+def literal_value(raw: str, variables: Dict[str, Any]) -> Any:
+    """Evaluate a GraphQL input literal (as kept by the query parser) with variables substituted."""
+    tokens = tokenize(raw)
+    position = 0
+
+    def value() -> Any:
+        nonlocal position
+        kind, text, _ = tokens[position]
+        position += 1
+        if text == '$':
+            name = tokens[position][1]
+            position += 1
+            return variables.get(name)
+        if text == '{':
+            result = {}
+            while tokens[position][1] != '}':
+                key = tokens[position][1]
+                position += 2
+                result[key] = value()
+            position += 1
+            return result
+        if text == '[':
+            items = []
+            while tokens[position][1] != ']':
+                items.append(value())
+            position += 1
+            return items
+        if kind == 'string':
+            return json.loads(text)
+        if kind == 'number':
+            return float(text) if any(c in text for c in '.eE') else int(text)
+        if kind == 'name':
+            return {'true': True, 'false': False, 'null': None}.get(text, text)
+        raise LiteralError(f"Unexpected {text!r} in argument value")
+
+    return value()
+
+def _compare(op: str, actual: Any, expected: Any) -> bool:
+    if op == '_is_null':
+        return (actual is None) == bool(expected)
+    if op == '_in':
+        return actual in expected
+    if op == '_nin':
+        return actual not in expected
+    if actual is None:
+        return False
+    if op == '_eq':
+        return actual == expected
+    if op == '_neq':
+        return actual != expected
+    if op == '_gt':
+        return actual > expected
+    if op == '_gte':
+        return actual >= expected
+    if op == '_lt':
+        return actual < expected
+    if op == '_lte':
+        return actual <= expected
+    raise LiteralError(f"Unsupported operator {op}")
+
+def matches(row: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    for column, condition in (where or {}).items():
+        if column == '_and':
+            if not all(matches(row, part) for part in condition):
+                return False
+        elif column == '_or':
+            if not any(matches(row, part) for part in condition):
+                return False
+        elif column == '_not':
+            if matches(row, condition):
+                return False
+        elif not all(_compare(op, row.get(column), expected) for op, expected in condition.items()):
+            return False
+    return True
+
+class SyntheticTable:
+    """`count` rows cycling through the recorded sample rows, with ids 1..count.
+
+    Integer keys are used as-is; other keys (uuid) become zero-padded strings
+    that sort the same way, so keyset pagination behaves as on the real table.
+    """
+
+    def __init__(self, name: str, type_name: str, templates: List[Dict[str, Any]], count: int, id_type: Optional[str]):
+        self.name = name
+        self.type_name = type_name
+        self.templates = templates or [{}]
+        self.count = count
+        self.id_type = id_type
+
+    def key(self, index: int) -> Any:
+        if self.id_type in NUMERIC_TYPES:
+            return index
+        return f"00000000-0000-0000-0000-{index:012d}"
+
+    def index_of(self, key: Any) -> int:
+        return key if isinstance(key, int) else int(str(key)[-12:])
+
+    def row(self, index: int) -> Dict[str, Any]:
+        row = dict(self.templates[(index - 1) % len(self.templates)])
+        if self.id_type:
+            row['id'] = self.key(index)
+        return row
+
+    def id_bounds(self, where: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+        """Index range implied by top-level conditions on `id` (others are checked per row)."""
+        low, high = 1, self.count
+        conditions = [where or {}] + [part for part in (where or {}).get('_and', [])]
+        for condition in conditions:
+            for op, expected in (condition.get('id') or {}).items():
+                if expected is None or op not in ('_gt', '_gte', '_lt', '_lte', '_eq'):
+                    continue
+                index = self.index_of(expected)
+                if op == '_gt':
+                    low = max(low, index + 1)
+                elif op == '_gte':
+                    low = max(low, index)
+                elif op == '_lt':
+                    high = min(high, index - 1)
+                elif op == '_lte':
+                    high = min(high, index)
+                else:
+                    low, high = max(low, index), min(high, index)
+        return low, high
+
+    def select(self, where: Optional[Dict[str, Any]], limit: Optional[int] = None,
+               offset: int = 0, descending: bool = False) -> Iterator[Dict[str, Any]]:
+        low, high = self.id_bounds(where)
+        id_in = (where or {}).get('id', {}).get('_in')
+        if id_in is not None:
+            indexes = sorted({self.index_of(key) for key in id_in if low <= self.index_of(key) <= high},
+                             reverse=descending)
+        else:
+            indexes = range(high, low - 1, -1) if descending else range(low, high + 1)
+        produced = 0
+        for index in indexes:
+            row = self.row(index)
+            if not matches(row, where):
+                continue
+            if offset:
+                offset -= 1
+                continue
+            yield row
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
+
+    def count_where(self, where: Optional[Dict[str, Any]]) -> int:
+        low, high = self.id_bounds(where)
+        if high < low:
+            return 0
+        if '_in' in (where or {}).get('id', {}):
+            return sum(1 for _ in self.select(where))
+        if set(where or {}) <= {'id'}:
+            return high - low + 1
+        # Rows repeat with the template period, so count one period per matching template
+        period = len(self.templates)
+        total = 0
+        for position, template in enumerate(self.templates):
+            first = position + 1
+            if first < low:
+                first += (low - first + period - 1) // period * period
+            if first > high:
+                continue
+            sample = dict(template, id=self.key(first)) if self.id_type else template
+            if matches(sample, where):
+                total += (high - first) // period + 1
+        return total
+
+class SyntheticHasura:
+    """Answers Hasura-style queries: list fields with where/limit/offset/order_by/distinct_on,
+    `_aggregate` counts with min/max, aliases, jsonb `path` arguments and __typename.
+
+    Every table that has a recorded sample gets `scale` times its recorded
+    count (or DEFAULT_ROWS). Unknown fields and missing selection sets get the
+    same validation errors Hasura returns, so batch isolation paths are exercised.
+    """
+
+    def __init__(self, schema: SchemaModel, scale: float = 1.0, samples_dir: str = SAMPLES_DIR,
+                 default_rows: int = DEFAULT_ROWS):
+        self.schema = schema
+        self.scale = scale
+        self.tables: Dict[str, SyntheticTable] = {}
+        for path in sorted(glob.glob(os.path.join(samples_dir, '*_sample.json'))):
+            name = os.path.basename(path)[:-len('_sample.json')]
+            root = schema.get_root_field(name)
+            if not root:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                templates = ((json.load(f) or {}).get('data') or {}).get(name) or []
+            count = default_rows
+            count_path = os.path.join(samples_dir, f"{name}_count.json")
+            if os.path.exists(count_path):
+                with open(count_path, 'r', encoding='utf-8') as f:
+                    count = json.load(f)['data'][f'{name}_aggregate']['aggregate']['count']
+            id_field = schema.get_field(root['base_type'], 'id')
+            self.tables[name] = SyntheticTable(name, root['base_type'], templates, int(count * scale),
+                                               id_field['base_type'] if id_field else None)
+
+    @staticmethod
+    def _error(message: str, path: str, code: str = 'validation-failed') -> Dict[str, Any]:
+        return {'message': message, 'extensions': {'path': path, 'code': code}}
+
+    def _project(self, row: Dict[str, Any], selections: List[Dict[str, Any]], type_name: str,
+                 variables: Dict[str, Any]) -> Dict[str, Any]:
+        result = {}
+        for selection in selections:
+            if selection['kind'] != 'field':
+                continue
+            name = selection['name']
+            out = selection['alias'] or name
+            if name == '__typename':
+                result[out] = type_name
+                continue
+            value = row.get(name)
+            if value is None and name not in row:
+                field = self.schema.get_field(type_name, name)
+                base = field['base_type'] if field else None
+                value = 0 if base in NUMERIC_TYPES else SCALAR_DEFAULTS.get(base, f"{name}-{row.get('id')}")
+            args = dict(selection['args'])
+            if 'path' in args and isinstance(value, dict):
+                for part in str(literal_value(args['path'], variables)).split('.'):
+                    value = value.get(part) if isinstance(value, dict) else None
+            if selection['selections'] is not None:
+                # Relationships are not modelled; Hasura would return null for a missing object
+                value = None if not isinstance(value, (dict, list)) else value
+            result[out] = value
+        return result
+
+    def _aggregate(self, table: SyntheticTable, where: Optional[Dict[str, Any]],
+                   selections: List[Dict[str, Any]]) -> Dict[str, Any]:
+        count = table.count_where(where)
+        low, high = table.id_bounds(where)
+        result = {}
+        for selection in selections:
+            out = selection['alias'] or selection['name']
+            if selection['name'] == '__typename':
+                result[out] = f"{table.type_name}_aggregate"
+            elif selection['name'] == 'aggregate':
+                aggregate = {}
+                for inner in selection['selections'] or []:
+                    inner_out = inner['alias'] or inner['name']
+                    if inner['name'] == 'count':
+                        aggregate[inner_out] = count
+                    elif inner['name'] in ('min', 'max'):
+                        index = low if inner['name'] == 'min' else high
+                        aggregate[inner_out] = {(c['alias'] or c['name']): (table.key(index) if count else None)
+                                                for c in inner['selections'] or [] if c['name'] == 'id'}
+                    else:
+                        aggregate[inner_out] = None
+                result[out] = aggregate
+            elif selection['name'] == 'nodes':
+                result[out] = []
+        return result
+
+    def _resolve(self, selection: Dict[str, Any], variables: Dict[str, Any]) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        name = selection['name']
+        path = f"$.selectionSet.{selection['alias'] or name}"
+        if name == '__typename':
+            return 'query_root', None
+        aggregate = name.endswith('_aggregate')
+        table = self.tables.get(name[:-len('_aggregate')] if aggregate else name)
+        if table is None:
+            if self.schema.get_root_field(name):
+                return None, self._error(f"field '{name}' is not served by the synthetic endpoint", path, 'not-supported')
+            return None, self._error(f"field '{name}' not found in type: 'query_root'", path)
+        if selection['selections'] is None:
+            return None, self._error(f"missing selection set for '{name}'", path)
+
+        args = {arg: literal_value(raw, variables) for arg, raw in selection['args']}
+        where = args.get('where')
+        if aggregate:
+            return self._aggregate(table, where, selection['selections']), None
+
+        order_by = args.get('order_by') or {}
+        if isinstance(order_by, list):
+            order_by = order_by[0] if order_by else {}
+        descending = str(order_by.get('id', 'asc')).startswith('desc')
+        distinct_on = args.get('distinct_on')
+        if distinct_on:
+            columns = distinct_on if isinstance(distinct_on, list) else [distinct_on]
+            seen = {}
+            for template in table.templates:
+                if matches(template, where):
+                    seen.setdefault(tuple(template.get(column) for column in columns), template)
+            rows = [seen[key] for key in sorted(seen, key=lambda key: [(v is None, str(v)) for v in key])]
+            rows = rows[:args['limit']] if args.get('limit') is not None else rows
+        else:
+            rows = table.select(where, args.get('limit'), args.get('offset') or 0, descending)
+        return [self._project(row, selection['selections'], table.type_name, variables) for row in rows], None
+
+    def __call__(self, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        variables = payload.get('variables') or {}
+        try:
+            document = parse_document(payload.get('query', ''))
+        except QuerySyntaxError as e:
+            return 200, {'errors': [self._error(str(e), '$', 'validation-failed')]}
+        if not document['operations']:
+            return 200, {'errors': [self._error('no operation in document', '$')]}
+
+        data, errors = {}, []
+        for selection in document['operations'][0]['selections']:
+            if selection['kind'] != 'field':
+                continue
+            try:
+                value, error = self._resolve(selection, variables)
+            except (LiteralError, TypeError, KeyError, IndexError) as e:
+                value, error = None, self._error(str(e), f"$.selectionSet.{selection['alias'] or selection['name']}")
+            if error:
+                errors.append(error)
+            else:
+                data[selection['alias'] or selection['name']] = value
+        # Like Hasura, a validation error fails the whole document
+        if errors:
+            return 200, {'errors': errors}
+        return 200, {'data': data}
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Template Index
+Compiles inspection templates (Hasura mobile_template or iAuditor-style JSON) into one indexed structure.
+"""
+
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Iterable, Tuple
+
+from profiling import phase
+
+IAUDITOR_TEMPLATES_DIR = "sample_data/successful_data/iauditor_templates"
+
+# Item types that hold other items rather than being answered
+CONTAINER_TYPES = {'section', 'category'}
+
+# Below this many cache misses, compiling in-process beats shipping templates to workers
+PARALLEL_MIN_TEMPLATES = 200
+
+def _sort_key(value: Any) -> Tuple[int, float, str]:
+    """Numeric sort_score order ('10' after '9'); unparseable scores go last."""
+    try:
+        return (0, float(value), '')
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value))
+
+class TemplateIndex:
+    """One template with O(1) lookups.
+
+    - items: item_id -> item (item_id, type, label, parent_id, sort_score, options, response_set_id)
+    - children: parent item_id ('' for the root) -> child item_ids in sort_score order
+    - sections: section item_id -> answerable item_ids below it, in order
+    - section_of: item_id -> enclosing section item_id
+    - response_sets: set id -> {'responses': {response_id: response}, 'failed': [response_id, ...]}
+    """
+
+    def __init__(self, template_id: Any, name: Optional[str], rev: Optional[str], source: str):
+        self.template_id = template_id
+        self.name = name
+        self.rev = rev
+        self.source = source
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.sections: Dict[str, List[str]] = {}
+        self.section_of: Dict[str, str] = {}
+        self.response_sets: Dict[str, Dict[str, Any]] = {}
+
+    def add_item(self, item_id: str, item_type: str, label: str, parent_id: str = '',
+                 sort_score: Any = None, options: Optional[Dict[str, Any]] = None,
+                 response_set_id: Optional[str] = None):
+        self.items[item_id] = {
+            'item_id': item_id,
+            'type': item_type,
+            'label': label,
+            'parent_id': parent_id,
+            'sort_score': sort_score,
+            'options': options or {},
+            'response_set_id': response_set_id,
+        }
+
+    def add_response_set(self, set_id: str, responses: Iterable[Dict[str, Any]], failed: Iterable[str] = ()):
+        responses = {str(response['id']): response for response in responses}
+        failed = set(str(response_id) for response_id in failed)
+        failed.update(response_id for response_id, response in responses.items() if response.get('failed'))
+        self.response_sets[set_id] = {'responses': responses, 'failed': sorted(failed)}
+
+    def build(self) -> 'TemplateIndex':
+        """Derive children, sections and section_of from the items' parent links."""
+        children: Dict[str, List[Dict[str, Any]]] = {}
+        for item in self.items.values():
+            parent_id = item['parent_id'] if item['parent_id'] in self.items else ''
+            children.setdefault(parent_id, []).append(item)
+        self.children = {
+            parent_id: [item['item_id'] for item in sorted(siblings, key=lambda i: _sort_key(i['sort_score']))]
+            for parent_id, siblings in children.items()
+        }
+
+        # Walk the tree once so every item learns its nearest section
+        stack = [(item_id, None) for item_id in reversed(self.children.get('', []))]
+        while stack:
+            item_id, section_id = stack.pop()
+            item = self.items[item_id]
+            if item['type'] == 'section':
+                self.sections.setdefault(item_id, [])
+                section_id = item_id
+            elif section_id is not None:
+                self.section_of[item_id] = section_id
+                if item['type'] not in CONTAINER_TYPES:
+                    self.sections[section_id].append(item_id)
+            stack.extend((child_id, section_id) for child_id in reversed(self.children.get(item_id, [])))
+        return self
+
+    def item(self, item_id: str) -> Optional[Dict[str, Any]]:
+        return self.items.get(str(item_id))
+
+    def children_of(self, item_id: str = '') -> List[str]:
+        return self.children.get(str(item_id), [])
+
+    def questions_in(self, section_id: str) -> List[str]:
+        return self.sections.get(str(section_id), [])
+
+    def section_for(self, item_id: str) -> Optional[Dict[str, Any]]:
+        section_id = self.section_of.get(str(item_id))
+        return self.items.get(section_id) if section_id else None
+
+    def response_set_for(self, item_id: str) -> Optional[Dict[str, Any]]:
+        item = self.items.get(str(item_id))
+        return self.response_sets.get(item['response_set_id']) if item and item['response_set_id'] else None
+
+    def questions(self) -> List[str]:
+        """Every answerable item, in document order."""
+        ordered = []
+        stack = list(reversed(self.children.get('', [])))
+        while stack:
+            item_id = stack.pop()
+            if self.items[item_id]['type'] not in CONTAINER_TYPES:
+                ordered.append(item_id)
+            stack.extend(reversed(self.children.get(item_id, [])))
+        return ordered
+
+def template_format(template: Dict[str, Any]) -> str:
+    """'hasura' (examination_templates row), 'iauditor_sections' or 'iauditor_items'."""
+    if 'mobile_template' in template:
+        return 'hasura'
+    if 'sections' in template and 'metadata' in template:
+        return 'iauditor_sections'
+    if 'items' in template and 'template_id' in template:
+        return 'iauditor_items'
+    raise ValueError(f"Unrecognized template format (keys: {', '.join(sorted(template))})")
+
+def template_revision(template: Dict[str, Any]) -> Tuple[Any, str]:
+    """(template id, revision) used to memoize compiled templates.
+
+    Hasura templates carry a CouchDB-style `_rev`; iAuditor files have no
+    revision, so a hash of their content stands in for it.
+    """
+    fmt = template_format(template)
+    if fmt == 'hasura':
+        rev = (template.get('mobile_template') or {}).get('_rev')
+        if rev:
+            return template['id'], rev
+        template_id = template['id']
+    elif fmt == 'iauditor_sections':
+        template_id = template['metadata'].get('id')
+    else:
+        template_id = template['template_id']
+    content = json.dumps(template, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return template_id, 'sha256:' + hashlib.sha256(content).hexdigest()[:16]
+
+def _compile_hasura(template: Dict[str, Any], rev: str) -> TemplateIndex:
+    mobile = template.get('mobile_template') or {}
+    index = TemplateIndex(template['id'], mobile.get('name'), rev, 'hasura')
+    for set_id, response_set in ((mobile.get('template_data') or {}).get('response_sets') or {}).items():
+        index.add_response_set(str(set_id), response_set.get('responses') or [])
+    for item in mobile.get('items') or []:
+        options = item.get('options') or {}
+        response_set_id = options.get('response_set')
+        index.add_item(str(item['item_id']), item.get('type'), item.get('label'), str(item.get('parent_id') or ''),
+                       item.get('sort_score'), options, str(response_set_id) if response_set_id else None)
+    return index
+
+def _compile_iauditor_sections(template: Dict[str, Any], rev: str) -> TemplateIndex:
+    metadata = template.get('metadata') or {}
+    index = TemplateIndex(metadata.get('id'), metadata.get('name'), rev, 'iauditor_sections')
+    for set_id, response_set in (template.get('response_sets') or {}).items():
+        index.add_response_set(set_id, response_set.get('options') or [], response_set.get('fail_ids') or [])
+    for position, section in enumerate(template.get('sections') or []):
+        index.add_item(section['id'], 'section', section.get('label'), '', position)
+        for item_position, item in enumerate(section.get('items') or []):
+            options = {key: value for key, value in item.items() if key not in ('id', 'type', 'label')}
+            index.add_item(item['id'], item.get('type'), item.get('label'), section['id'],
+                           item_position, options, item.get('response_set_id'))
+    return index
+
+def _compile_iauditor_items(template: Dict[str, Any], rev: str) -> TemplateIndex:
+    index = TemplateIndex(template['template_id'], template.get('name'), rev, 'iauditor_items')
+    # Header items come first, then the body; nested items keep their listed order
+    stack = [(item, '', position) for position, item in
+             enumerate((template.get('header_items') or []) + (template.get('items') or []))]
+    while stack:
+        item, parent_id, position = stack.pop()
+        item_id = item['item_id']
+        response_set_id = None
+        if item.get('response_set'):
+            # Response sets are inline per question; register each under its question's id
+            response_set_id = item_id
+            index.add_response_set(item_id, item['response_set'].get('responses') or [])
+        index.add_item(item_id, item.get('type'), item.get('label'), parent_id, position,
+                       item.get('options'), response_set_id)
+        stack.extend((child, item_id, child_position) for child_position, child in enumerate(item.get('items') or []))
+    return index
+
+COMPILERS = {
+    'hasura': _compile_hasura,
+    'iauditor_sections': _compile_iauditor_sections,
+    'iauditor_items': _compile_iauditor_items,
+}
+
+def compile_template(template: Dict[str, Any], rev: Optional[str] = None) -> TemplateIndex:
+    if rev is None:
+        rev = template_revision(template)[1]
+    return COMPILERS[template_format(template)](template, rev).build()
+
+def _compile_with_rev(args: Tuple[Dict[str, Any], str]) -> TemplateIndex:
+    return compile_template(*args)
+
+class TemplateCompiler:
+    """Compiles templates once per (id, revision) and keeps the results in memory."""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers
+        self.cache: Dict[Tuple[Any, str], TemplateIndex] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, template: Dict[str, Any]) -> TemplateIndex:
+        return self.compile_many([template])[0]
+
+    def compile_many(self, templates: Iterable[Dict[str, Any]]) -> List[TemplateIndex]:
+        """Compile templates, in parallel processes when enough of them are new."""
+        templates = list(templates)
+        keys = [template_revision(template) for template in templates]
+        pending = {}
+        for key, template in zip(keys, templates):
+            if key not in self.cache and key not in pending:
+                pending[key] = template
+        self.misses += len(pending)
+        self.hits += len(templates) - len(pending)
+
+        jobs = [(template, key[1]) for key, template in pending.items()]
+        workers = self.workers or os.cpu_count() or 1
+        if len(jobs) >= PARALLEL_MIN_TEMPLATES and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                compiled = list(executor.map(_compile_with_rev, jobs, chunksize=32))
+        else:
+            compiled = [_compile_with_rev(job) for job in jobs]
+        self.cache.update(zip(pending, compiled))
+        return [self.cache[key] for key in keys]
+
+def load_iauditor_templates(folder: str = IAUDITOR_TEMPLATES_DIR) -> List[Dict[str, Any]]:
+    templates = []
+    for path in sorted(glob.glob(os.path.join(folder, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f, phase('parse'):
+            templates.append(json.load(f))
+    return templates
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Revision-Aware Template Fetch
+Pulls only template ids and revisions first, then downloads bodies just for templates that changed.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Any, Optional, List, Tuple
+
+from atomic_io import atomic_open, atomic_write_json
+from schema_model import SCHEMA_CACHE_DIR
+
+TEMPLATE_CACHE_DIR = os.path.join(SCHEMA_CACHE_DIR, "templates")
+
+# Template tables and the jsonb column whose `_rev` identifies a template body
+TEMPLATE_TABLES = {
+    'examination_templates': 'mobile_template',
+    'api_mobile_templates': 'json',
+}
+
+# Ids per body request in the second phase
+BODY_BATCH_SIZE = 25
+
+class TemplateStore:
+    """Content-addressed cache of template rows, refreshed by revision.
+
+    Bodies live in `objects/<sha256>.json`; `<table>.json` maps each template id
+    to its `_rev` and body hash. Identical bodies are stored once.
+    """
+
+    def __init__(self, fetcher, cache_dir: str = TEMPLATE_CACHE_DIR):
+        self.fetcher = fetcher
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+
+    def _index_path(self, table_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{table_name}.json")
+
+    def load_index(self, table_name: str) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._index_path(table_name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get_object(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.objects_dir, f"{digest}.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put_object(self, row: Dict[str, Any]) -> str:
+        body = json.dumps(row, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        path = os.path.join(self.objects_dir, f"{digest}.json")
+        if not os.path.exists(path):
+            with atomic_open(path, 'wb') as f:
+                f.write(body)
+        return digest
+
+    def fetch_revisions(self, table_name: str, limit: Optional[int] = None) -> List[Tuple[Any, Optional[str]]]:
+        """Phase one: (id, _rev) for every template, read through the jsonb `path` argument."""
+        column = TEMPLATE_TABLES[table_name]
+        revisions = []
+        page_size = min(limit, 1000) if limit else 1000
+        for rows in self.fetcher.iter_table_pages(table_name, ['id', f'rev: {column}(path: "_rev")'], page_size):
+            revisions.extend((row['id'], row.get('rev')) for row in rows)
+            if limit and len(revisions) >= limit:
+                return revisions[:limit]
+        return revisions
+
+    def fetch_bodies(self, table_name: str, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """Phase two: full rows for the given ids, BODY_BATCH_SIZE per request."""
+        fields = self.fetcher.get_type_fields(table_name, max_fields=None)
+        if 'id' not in fields:
+            fields = ['id'] + list(fields)
+        fields_str = '\n    '.join(fields)
+        key_type = self.fetcher.get_field_type(table_name, 'id') or 'bigint'
+        query = f"""
+        query {table_name.replace('_', '')}Bodies($ids: [{key_type}!]!) {{
+          {table_name}(where: {{id: {{_in: $ids}}}}, order_by: {{id: asc}}) {{
+            {fields_str}
+          }}
+        }}
+        """
+        rows = {}
+        for start in range(0, len(ids), BODY_BATCH_SIZE):
+            batch = ids[start:start + BODY_BATCH_SIZE]
+            result = self.fetcher.execute_query(query, {'ids': batch})
+            if not result or 'errors' in result:
+                error_msg = result['errors'][0].get('message', 'Unknown error') if result else 'No response'
+                raise RuntimeError(f"Fetching {table_name} bodies failed: {error_msg}")
+            for row in result.get('data', {}).get(table_name) or []:
+                rows[str(row['id'])] = row
+        return rows
+
+    def sync(self, table_name: str, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """Current template rows (in id order) and counts of what had to be downloaded.
+
+        Templates whose `_rev` matches the cached one are served from the cache;
+        templates without a `_rev` are always downloaded.
+        """
+        index = self.load_index(table_name)
+        revisions = self.fetch_revisions(table_name, limit)
+
+        stale = []
+        for template_id, rev in revisions:
+            entry = index.get(str(template_id))
+            if rev is None or not entry or entry['rev'] != rev or \
+                    not os.path.exists(os.path.join(self.objects_dir, f"{entry['sha256']}.json")):
+                stale.append(template_id)
+        stale_keys = {str(template_id) for template_id in stale}
+
+        fetched = self.fetch_bodies(table_name, stale) if stale else {}
+        rows = []
+        new_index = {}
+        for template_id, rev in revisions:
+            key = str(template_id)
+            row = fetched.get(key)
+            if row is not None:
+                digest = self.put_object(row)
+            elif key not in stale_keys:
+                digest = index[key]['sha256']
+                row = self.get_object(digest)
+            else:
+                # Deleted between the two phases
+                continue
+            new_index[key] = {'rev': rev, 'sha256': digest}
+            rows.append(row)
+
+        # With a limit only part of the table was listed, so keep the other entries
+        if limit:
+            index.update(new_index)
+            new_index = index
+        atomic_write_json(new_index, self._index_path(table_name), indent=None)
+
+        stats = {'total': len(rows), 'downloaded': len(fetched), 'cached': len(rows) - len(fetched)}
+        return rows, stats
@@ -0,0 +1,122 @@
+import re
+from collections import Counter
+
+from aggregate_planner import AggregatePlanner, EnumValue, graphql_literal
+from schema_model import SchemaModel
+
+ROWS = [
+    {'status': 'active', 'depot': 'north'},
+    {'status': 'active', 'depot': 'south'},
+    {'status': 'retired', 'depot': 'north'},
+    {'status': 'repair', 'depot': None},
+    {'status': None, 'depot': 'north'},
+]
+
+
+def scalar(name, kind='SCALAR'):
+    return {'kind': kind, 'name': name, 'ofType': None}
+
+
+SCHEMA = SchemaModel({'data': {'__schema': {
+    'queryType': {'name': 'query_root'},
+    'types': [
+        {'kind': 'OBJECT', 'name': 'bus', 'fields': [
+            {'name': 'status', 'args': [], 'type': scalar('bus_status_enum', 'ENUM')},
+            {'name': 'depot', 'args': [], 'type': scalar('String')},
+        ]},
+        {'kind': 'ENUM', 'name': 'bus_status_enum',
+         'enumValues': [{'name': 'active'}, {'name': 'retired'}, {'name': 'repair'}]},
+    ],
+}}})
+
+
+class FakeHasura:
+    """Answers distinct_on and _aggregate fields over ROWS, like Hasura for the `bus` table.
+
+    Comparisons against enum columns only match bare enum literals; a quoted
+    string is an error, as it is on a real endpoint.
+    """
+
+    def __init__(self, enum_columns=()):
+        self.enum_columns = set(enum_columns)
+        self.queries = []
+
+    def matching(self, args):
+        rows = ROWS
+        for column, literal in re.findall(r'(\w+): \{_eq: ("[^"]*"|\w+)\}', args):
+            quoted = literal.startswith('"')
+            if quoted == (column in self.enum_columns):
+                raise ValueError(f"expected {'an enum' if quoted else 'a string'} for '{column}'")
+            rows = [row for row in rows if row[column] == literal.strip('"')]
+        for column in re.findall(r'(\w+): \{_is_null: true\}', args):
+            rows = [row for row in rows if row[column] is None]
+        return rows
+
+    def __call__(self, query, variables=None):
+        self.queries.append(query)
+        data = {}
+        for alias, field, args in re.findall(r'^  (?:(\w+): )?(\w+)(?:\((.*)\))? \{$', query, re.M):
+            try:
+                rows = self.matching(args or '')
+            except ValueError as e:
+                return {'errors': [{'message': str(e), 'extensions': {'path': f'$.selectionSet.{alias or field}'}}]}
+            if field.endswith('_aggregate'):
+                data[alias or field] = {'aggregate': {'count': len(rows)}}
+            else:
+                column = re.search(r'distinct_on: \[(\w+)\]', args).group(1)
+                values = sorted({row[column] for row in rows}, key=lambda v: (v is None, v or ''))
+                limit = int(re.search(r'limit: (\d+)', args).group(1))
+                data[alias or field] = [{column: value} for value in values[:limit]]
+        return {'data': data}
+
+
+def counts(summary):
+    return {group['value']: group['count'] for group in summary['groups']}
+
+
+def test_group_by_counts_every_value_and_null():
+    endpoint = FakeHasura()
+    summary = AggregatePlanner(endpoint).group_by('bus', 'depot')
+
+    assert summary['total'] == 5
+    assert counts(summary) == {'north': 3, 'south': 1, None: 1}
+    assert summary['truncated'] is False
+    # Distinct values, then every bucket in one batched document
+    assert len(endpoint.queries) == 2
+
+
+def test_values_past_max_groups_fall_into_the_other_bucket():
+    summary = AggregatePlanner(FakeHasura(), max_groups=1).group_by('bus', 'depot')
+
+    assert summary['truncated'] is True
+    assert counts(summary) == {'north': 3, None: 1, '__other__': 1}
+    assert sum(counts(summary).values()) == summary['total']
+
+
+def test_several_requests_share_round_trips():
+    endpoint = FakeHasura()
+    first, second = AggregatePlanner(endpoint).run([{'table': 'bus', 'column': 'depot'},
+                                                    {'table': 'bus', 'column': 'depot', 'where': {'depot': {'_eq': 'north'}}}])
+
+    assert counts(first)[None] == 1
+    assert counts(second) == {'north': 3} and second['total'] == 3
+    assert len(endpoint.queries) == 2
+
+
+def test_enum_columns_are_compared_as_enum_literals():
+    summary = AggregatePlanner(FakeHasura(enum_columns={'status'}), schema=SCHEMA).group_by('bus', 'status')
+
+    assert 'error' not in summary
+    assert counts(summary) == {'active': 2, 'repair': 1, 'retired': 1, None: 1}
+    assert all(type(value) is str for value in counts(summary) if value is not None)
+
+
+def test_enum_columns_fail_without_the_schema():
+    summary = AggregatePlanner(FakeHasura(enum_columns={'status'})).group_by('bus', 'status')
+    assert "expected an enum for 'status'" in summary['error']
+
+
+def test_graphql_literal():
+    assert graphql_literal({'status': {'_in': [EnumValue('active'), 'x"y']}, 'year': {'_gt': 2000},
+                            'ok': True, 'gone': None}) == \
+        '{status: {_in: [active, "x\\"y"]}, year: {_gt: 2000}, ok: true, gone: null}'
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from async_fetch import AsyncFetchEngine
+from graphql_client import GraphQLClient
+from replay_server import StandInServer
+
+
+class SlowResponder:
+    """Answers `{ <table> }` queries after a delay, tracking how many are in flight."""
+
+    def __init__(self, broken=(), delay=0.05):
+        self.broken = set(broken)
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, payload):
+        table = payload['query'].split('{')[1].split('(')[0].strip()
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if table in self.broken:
+            return 200, {'errors': [{'message': f"field '{table}' not found in type: 'query_root'"}]}
+        return 200, {'data': {table: [{'id': 1}]}}
+
+
+def test_run_all_is_concurrent_ordered_and_accounted():
+    tables = [f"table_{i}" for i in range(12)]
+    responder = SlowResponder(broken={'table_3', 'table_7'})
+    with StandInServer(responder) as server:
+        client = GraphQLClient(server.url, pool_size=4, max_retries=0)
+        engine = AsyncFetchEngine(client, concurrency=4)
+        jobs = [{'table': table, 'query': f"query {{ {table}(limit: 10) {{ id }} }}"} for table in tables]
+        started = time.monotonic()
+        results = engine.run_all(jobs)
+        elapsed = time.monotonic() - started
+
+    assert 1 < responder.peak <= 4
+    # 12 requests of 50ms each, four at a time
+    assert elapsed < 12 * responder.delay
+    assert [job['table'] for job, _ in results] == tables
+    assert all(result['data'] == {job['table']: [{'id': 1}]} for job, result in results if 'data' in result)
+
+    successful = sum(1 for _, result in results if result and 'errors' not in result)
+    failed = sum(1 for _, result in results if not result or 'errors' in result)
+    assert (successful, failed) == (10, 2)
+    assert [job['table'] for job, result in results if 'errors' in result] == ['table_3', 'table_7']
@@ -0,0 +1,77 @@
+import json
+import os
+import struct
+
+from columnar_export import ColumnarReader, convert_export, write_columnar
+
+ROWS = [
+    {'id': 1, 'score': 2, 'status': 'open', 'flag': True, 'meta': {'a': 1}},
+    {'id': 2, 'score': 2.5, 'status': None, 'flag': None, 'meta': None},
+    {'id': None, 'score': None, 'status': 'open', 'flag': False, 'meta': [1, 2]},
+    {'id': 4, 'score': 3, 'status': 'closed', 'flag': True, 'meta': 'x'},
+]
+
+
+def test_round_trip_keeps_nulls_and_values(tmp_path):
+    path = str(tmp_path / 'bus.cols')
+    write_columnar(ROWS, path)
+
+    reader = ColumnarReader(path)
+    assert reader.rows == 4
+    assert list(reader.iter_rows()) == ROWS
+
+
+def test_mixed_int_and_float_column_keeps_its_ints(tmp_path):
+    path = str(tmp_path / 'bus.cols')
+    write_columnar(ROWS, path)
+
+    scores = ColumnarReader(path).read_column('score')
+    assert scores == [2, 2.5, None, 3]
+    assert [type(value) for value in scores] == [int, float, type(None), int]
+
+
+def test_repeated_strings_are_dictionary_encoded(tmp_path):
+    path = str(tmp_path / 'bus.cols')
+    write_columnar([{'status': status} for status in ['open', 'closed', None, 'open'] * 5], path)
+
+    reader = ColumnarReader(path)
+    (raw,) = reader.read_raw('status')
+    assert raw['encoding'] == 'dictionary'
+    assert raw['dictionary'] == ['open', 'closed']
+    assert list(raw['codes'][:4]) == [0, 1, -1, 0]
+    assert reader.read_column('status') == ['open', 'closed', None, 'open'] * 5
+
+
+def test_rows_are_written_in_row_groups(tmp_path):
+    path = str(tmp_path / 'bus.cols')
+    rows = [{'id': i, 'status': 'open' if i % 2 else 'closed'} for i in range(10)]
+    # 'note' only appears in the last group; earlier rows read it as null
+    rows[9]['note'] = 'late'
+    footer = write_columnar(iter(rows), path, row_group_rows=4)
+
+    assert [group['rows'] for group in footer['row_groups']] == [4, 4, 2]
+    reader = ColumnarReader(path)
+    assert reader.columns == ['id', 'status', 'note']
+    assert reader.read_column('id') == list(range(10))
+    assert reader.read_column('note') == [None] * 9 + ['late']
+    assert list(reader.iter_rows(['status']))[:2] == [{'status': 'closed'}, {'status': 'open'}]
+
+
+def test_version_1_files_are_still_read(tmp_path):
+    path = str(tmp_path / 'bus.cols')
+    data = json.dumps([1, None]).encode('utf-8')
+    header = json.dumps({'rows': 2, 'byteorder': 'little', 'columns': [
+        {'name': 'id', 'type': 'json', 'encoding': 'plain', 'blobs': [[0, len(data)]]}]}).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(b'HCOL1\n' + struct.pack('<Q', len(header)) + header + data)
+
+    assert ColumnarReader(path).read() == {'id': [1, None]}
+
+
+def test_convert_export_from_ndjson(tmp_path):
+    source = tmp_path / 'bus.ndjson'
+    source.write_text(''.join(json.dumps(row) + '\n' for row in ROWS), encoding='utf-8')
+
+    path = convert_export(str(source))
+    assert path == os.path.join(str(tmp_path), 'bus.cols')
+    assert ColumnarReader(path).read(['id', 'score']) == {'id': [1, 2, None, 4], 'score': [2, 2.5, None, 3]}
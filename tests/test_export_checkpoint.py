@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+import pytest
+
+from export_checkpoint import ExportCheckpoint
+from smart_fetch_data import SmartDataFetcher
+
+
+class TableFetcher(SmartDataFetcher):
+    """A SmartDataFetcher over an in-memory table, optionally failing after some pages."""
+
+    def __init__(self, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+        self.queries = []
+
+    def get_type_fields(self, type_name, max_fields=15):
+        return ['id', 'name']
+
+    def get_field_type(self, type_name, field_name):
+        return 'bigint'
+
+    def execute_query(self, query, variables=None):
+        self.queries.append((query, variables))
+        if '_aggregate' in query:
+            return {'data': {'bus_aggregate': {'aggregate': {'count': len(self.rows)}}}}
+        pages = sum(1 for q, _ in self.queries if '_aggregate' not in q)
+        if self.fail_after is not None and pages > self.fail_after:
+            raise ConnectionError("connection dropped")
+        last = (variables or {}).get('last')
+        rows = [row for row in self.rows if last is None or row['id'] > last]
+        return {'data': {'bus': rows[:variables['limit']]}}
+
+
+def make_rows(count):
+    return [{'id': i, 'name': f"bus {i}"} for i in range(1, count + 1)]
+
+
+def read_ids(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line)['id'] for line in f]
+
+
+def page_starts(fetcher):
+    return [variables.get('last') for query, variables in fetcher.queries if '_aggregate' not in query]
+
+
+def test_interrupted_export_resumes_after_last_committed_page(tmp_path):
+    rows = make_rows(10)
+    with pytest.raises(ConnectionError):
+        TableFetcher(rows, fail_after=2).export_table('bus', folder=str(tmp_path), page_size=3)
+
+    filepath = os.path.join(tmp_path, 'bus.ndjson')
+    assert not os.path.exists(filepath)
+    # A page that was being written when the run died is not in the manifest
+    with open(filepath + '.partial', 'ab') as f:
+        f.write(b'{"id": 7, "na')
+
+    fetcher = TableFetcher(rows)
+    assert fetcher.export_table('bus', folder=str(tmp_path), page_size=3) == 10
+    assert page_starts(fetcher) == [6, 9]
+    assert read_ids(filepath) == list(range(1, 11))
+
+
+def test_fresh_complete_export_is_reused(tmp_path):
+    rows = make_rows(4)
+    TableFetcher(rows).export_table('bus', folder=str(tmp_path), page_size=3)
+
+    fetcher = TableFetcher(rows)
+    assert fetcher.export_table('bus', folder=str(tmp_path), page_size=3) == 4
+    assert page_starts(fetcher) == []
+
+
+def test_export_older_than_max_age_is_exported_again(tmp_path):
+    rows = make_rows(4)
+    TableFetcher(rows).export_table('bus', folder=str(tmp_path), page_size=3)
+    filepath = os.path.join(tmp_path, 'bus.ndjson')
+    old = time.time() - 3 * 3600
+    os.utime(filepath, (old, old))
+
+    fetcher = TableFetcher(rows)
+    assert fetcher.export_table('bus', folder=str(tmp_path), page_size=3, max_age=2 * 3600) == 4
+    assert page_starts(fetcher) == [None, 3]
+
+    # max_age=0 keeps an old export as long as the count matches
+    os.utime(filepath, (old, old))
+    fetcher = TableFetcher(rows)
+    assert fetcher.export_table('bus', folder=str(tmp_path), page_size=3, max_age=0) == 4
+    assert page_starts(fetcher) == []
+
+
+def test_export_is_redone_when_the_live_count_differs(tmp_path):
+    TableFetcher(make_rows(4)).export_table('bus', folder=str(tmp_path), page_size=3)
+
+    fetcher = TableFetcher(make_rows(6))
+    assert fetcher.export_table('bus', folder=str(tmp_path), page_size=3) == 6
+    assert read_ids(os.path.join(tmp_path, 'bus.ndjson')) == list(range(1, 7))
+
+
+def test_unavailable_count_reuses_the_export(tmp_path):
+    TableFetcher(make_rows(4)).export_table('bus', folder=str(tmp_path), page_size=3)
+    checkpoint = ExportCheckpoint(os.path.join(tmp_path, 'bus.ndjson'), 'bus', 'id', ['id', 'name'], 3)
+
+    def no_count():
+        raise RuntimeError("field 'bus_aggregate' not found")
+
+    assert checkpoint.reusable(live_count=no_count)
@@ -0,0 +1,76 @@
+import time
+
+from fetch_scheduler import FetchScheduler, UNKNOWN_TABLE_BYTES, estimate_costs
+
+
+class CountingFetcher:
+    """Answers batched count and probe queries for a few fake tables."""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.queries = []
+
+    def get_type_fields(self, table_name, max_fields=15):
+        return ['id', 'name']
+
+    def execute_query(self, query, variables=None):
+        self.queries.append(query)
+        data = {}
+        for line in query.splitlines():
+            line = line.strip()
+            if ': ' not in line or not line.endswith('{'):
+                continue
+            alias, field = line[:-1].strip().split(': ', 1)
+            table = field.split('(')[0]
+            if table.endswith('_aggregate'):
+                data[alias] = {'aggregate': {'count': self.counts[table[:-len('_aggregate')]]}}
+            else:
+                data[alias] = [{'id': i, 'name': 'x' * 10} for i in range(3)]
+        return {'data': data}
+
+
+def test_probe_is_small_and_skips_template_tables():
+    fetcher = CountingFetcher({'bus': 10, 'examination_templates': 5})
+    costs = estimate_costs(fetcher, ['bus', 'examination_templates'])
+
+    probes = [line for query in fetcher.queries for line in query.splitlines() if '(limit:' in line]
+    assert [line.strip() for line in probes] == ['t1: bus(limit: 3) {']
+    assert costs['bus']['bytes'] == 10 * costs['bus']['row_bytes']
+    # Counted, but with no row size its size is unknown rather than zero
+    assert costs['examination_templates']['rows'] == 5
+    assert costs['examination_templates']['bytes'] is None
+
+
+def task(table, size):
+    return {'table': table, 'rows': None, 'bytes': size, 'shards': 1}
+
+
+def test_unknown_sizes_are_charged_against_the_byte_budget():
+    scheduler = FetchScheduler(None, budget_bytes=UNKNOWN_TABLE_BYTES // 2)
+    outcomes = scheduler.run([task('bus', 1000), task('huge', None)], lambda t: t['table'])
+
+    assert outcomes['bus']['status'] == 'done'
+    assert outcomes['huge']['status'] == 'skipped'
+
+
+def test_any_work_error_fails_only_its_table():
+    def work(t):
+        if t['table'] == 'bus':
+            raise KeyError('id')
+        if t['table'] == 'drivers':
+            raise ValueError('not numeric')
+        return 3
+
+    outcomes = FetchScheduler(None).run([task('bus', 10), task('drivers', 20), task('workorders', 30)], work)
+    assert outcomes['bus'] == {'status': 'failed', 'error': "KeyError: 'id'", 'seconds': outcomes['bus']['seconds']}
+    assert outcomes['drivers']['status'] == 'failed'
+    assert outcomes['workorders']['status'] == 'done' and outcomes['workorders']['result'] == 3
+
+
+def test_eta_is_reported_while_a_table_runs(capsys):
+    scheduler = FetchScheduler(None, progress_interval=0.02)
+    scheduler.run([task('bus', 1000), task('workorders', 5000)], lambda t: time.sleep(0.1))
+
+    running = [line for line in capsys.readouterr().out.splitlines() if 'workorders running' in line]
+    assert running and all('ETA' in line for line in running)
+    assert 'ETA unknown' not in running[-1]
@@ -0,0 +1,83 @@
+import time
+from email.utils import formatdate
+
+import requests
+
+from graphql_client import CircuitBreaker, GraphQLClient, retry_after_seconds
+from rate_limiter import AdaptiveRateLimiter
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed trial reopens the circuit straight away
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_other_request_errors_are_reported_not_raised(monkeypatch):
+    client = GraphQLClient('http://127.0.0.1:9/v1/graphql', max_retries=2, backoff_base=0)
+    calls = []
+
+    def failing_post(*args, **kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise requests.exceptions.ChunkedEncodingError("connection broken")
+        raise requests.TooManyRedirects("redirect loop")
+
+    monkeypatch.setattr(client.session, 'post', failing_post)
+    assert client.execute_query('query q { bus { id } }') is None
+    # The chunked-encoding error is retried, the redirect loop is not
+    assert len(calls) == 2
+    assert client.metrics.report()['error_codes'] == {'transport': 1}
+
+
+def make_response(status, headers=None, body=b'{"data": {"bus": []}}'):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = body
+    response.request = requests.Request('POST', 'http://127.0.0.1:9/v1/graphql', data=b'{}').prepare()
+    return response
+
+
+def test_retry_after_header_is_parsed_and_capped():
+    assert retry_after_seconds(make_response(429, {'Retry-After': '3'})) == 3.0
+    assert retry_after_seconds(make_response(429, {'Retry-After': '86400'})) == 60.0
+    assert 8 <= retry_after_seconds(make_response(503, {'Retry-After': formatdate(time.time() + 10)})) <= 10
+    assert retry_after_seconds(make_response(503, {'Retry-After': 'soon'})) is None
+    assert retry_after_seconds(make_response(503)) is None
+
+
+def test_retry_after_is_the_minimum_backoff(monkeypatch):
+    limiter = AdaptiveRateLimiter()
+    client = GraphQLClient('http://127.0.0.1:9/v1/graphql', max_retries=2, backoff_base=0, rate_limiter=limiter)
+    responses = [make_response(429, {'Retry-After': '5'}), make_response(200)]
+    sleeps, holds = [], []
+    monkeypatch.setattr(client.session, 'post', lambda *args, **kwargs: responses.pop(0))
+    monkeypatch.setattr(time, 'sleep', sleeps.append)
+    monkeypatch.setattr(limiter, 'hold', holds.append)
+
+    assert client.execute('query q { bus { id } }') == {'data': {'bus': []}}
+    assert sleeps == [5.0]
+    # Other threads sharing the limiter are held back too
+    assert holds == [5.0]
+
+
+def test_held_limiter_waits_out_the_hold():
+    limiter = AdaptiveRateLimiter(initial_rate=100.0)
+    limiter.hold(0.2)
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.2
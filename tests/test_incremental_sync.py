@@ -0,0 +1,100 @@
+import json
+
+from incremental_sync import SyncState, iter_changed_pages, sync_table
+
+
+class FakeFetcher:
+    """Answers the sync queries from an in-memory table, with Hasura's ordering (NULLs last)."""
+
+    def __init__(self, rows, column='updated_at', key='id'):
+        self.rows = rows
+        self.column = column
+        self.key = key
+        self.operations = []
+
+    def get_type_fields(self, table_name, max_fields=None):
+        return ['id', 'updated_at', 'name']
+
+    def get_field_type(self, table_name, field):
+        return {'id': 'bigint', 'updated_at': 'timestamptz'}.get(field)
+
+    def execute_query(self, query, variables):
+        operation = query.split('query ')[1].split('(')[0]
+        column, key = self.column, self.key
+        rows = self.rows
+        if operation.endswith('NullsFirst'):
+            rows = sorted((r for r in rows if r[column] is None), key=lambda r: r[key])
+        elif operation.endswith('Nulls'):
+            rows = sorted((r for r in rows if r[column] is None and r[key] > variables['last']), key=lambda r: r[key])
+        elif operation.endswith('Keys'):
+            rows = sorted((r for r in rows if r[key] > variables['last']), key=lambda r: r[key])
+        else:
+            rows = sorted(rows, key=lambda r: (r[column] is None, r[column] or '', r[key]))
+            if not operation.endswith('First'):
+                since, last = variables['since'], variables['last']
+                rows = [r for r in rows if r[column] is not None
+                        and (r[column] > since or (r[column] == since and r[key] > last))]
+        self.operations.append(operation)
+        return {'data': {'bus': rows[:variables['limit']]}}
+
+
+def make_rows(count, null_every=0):
+    return [{'id': i, 'name': f"bus {i}",
+             'updated_at': None if null_every and i % null_every == 0 else f"2025-01-{1 + i % 28:02d}"}
+            for i in range(1, count + 1)]
+
+
+def pulled_ids(fetcher, **kwargs):
+    return sorted(row['id'] for page in iter_changed_pages(fetcher, 'bus', 'updated_at', **kwargs) for row in page)
+
+
+def test_full_pull_includes_null_watermarks_beyond_first_page():
+    rows = make_rows(25, null_every=4)
+    fetcher = FakeFetcher(rows)
+    assert pulled_ids(fetcher, page_size=5) == list(range(1, 26))
+    assert 'syncBusNullsFirst' in fetcher.operations
+
+
+def test_full_pull_when_first_page_ends_in_nulls():
+    rows = make_rows(12, null_every=1)
+    assert pulled_ids(FakeFetcher(rows), page_size=5) == list(range(1, 13))
+
+
+def test_incremental_pull_returns_only_changed_rows():
+    rows = make_rows(20)
+    ids = pulled_ids(FakeFetcher(rows), since='2025-01-15', since_key=14, page_size=3)
+    assert ids == [row['id'] for row in rows if (row['updated_at'], row['id']) > ('2025-01-15', 14)]
+
+
+def test_all_null_column_keeps_key_only_mark(tmp_path):
+    rows = make_rows(7, null_every=1)
+    fetcher = FakeFetcher(rows)
+    state = SyncState(str(tmp_path))
+    stats = sync_table(fetcher, 'bus', folder=str(tmp_path), page_size=3, state=state)
+    assert stats['total'] == 7
+    assert state.get('bus')['watermark'] is None and state.get('bus')['last_key'] == 7
+
+    rows.append({'id': 8, 'name': 'bus 8', 'updated_at': None})
+    fetcher.operations.clear()
+    stats = sync_table(fetcher, 'bus', folder=str(tmp_path), page_size=3, state=state)
+    assert stats == {'updated': 0, 'inserted': 1, 'total': 8, 'changed': 1}
+    assert fetcher.operations == ['syncBusKeys']
+    assert state.get('bus')['last_key'] == 8
+    with open(tmp_path / 'bus.ndjson') as f:
+        assert [json.loads(line)['id'] for line in f] == list(range(1, 9))
+
+
+def test_incremental_sync_picks_up_new_null_watermark_rows(tmp_path):
+    rows = make_rows(10, null_every=4)
+    fetcher = FakeFetcher(rows)
+    state = SyncState(str(tmp_path))
+    sync_table(fetcher, 'bus', folder=str(tmp_path), page_size=3, state=state)
+    assert state.get('bus')['null_key'] == 8
+
+    rows.append({'id': 11, 'name': 'bus 11', 'updated_at': None})
+    rows[0]['updated_at'] = '2025-02-01'
+    fetcher.operations.clear()
+    stats = sync_table(fetcher, 'bus', folder=str(tmp_path), page_size=3, state=state)
+    assert stats == {'updated': 1, 'inserted': 1, 'total': 11, 'changed': 2}
+    assert fetcher.operations == ['syncBus', 'syncBusNulls']
+    assert state.get('bus')['null_key'] == 11
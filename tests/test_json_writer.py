@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from json_writer import JSONWriter, read_rows, write_json
+
+ROWS = [{'id': i, 'name': f"bus {i}", 'tags': ['a', 'b']} for i in range(1, 6)]
+
+
+@pytest.mark.parametrize('fmt', ['compact', 'pretty', 'ndjson'])
+@pytest.mark.parametrize('compress', [False, True])
+def test_round_trip(tmp_path, fmt, compress):
+    filepath = str(tmp_path / 'bus.json')
+    with JSONWriter(filepath, fmt, compress, wrap=['data', 'bus']) as writer:
+        writer.write_rows(ROWS[:2])
+        writer.write_rows(ROWS[2:])
+    assert writer.path == str(tmp_path / ('bus.ndjson' if fmt == 'ndjson' else 'bus.json')) + ('.gz' if compress else '')
+    assert list(read_rows(writer.path)) == ROWS
+
+
+def test_aborted_new_file_is_removed(tmp_path):
+    filepath = tmp_path / 'bus.json'
+    with pytest.raises(RuntimeError):
+        with JSONWriter(str(filepath), 'compact', False, wrap=['data', 'bus']) as writer:
+            writer.write_rows(ROWS)
+            raise RuntimeError("interrupted")
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize('rows', [[], ROWS])
+def test_pretty_matches_json_dump(tmp_path, rows):
+    data = {'data': {'bus': rows}}
+    path = write_json(data, str(tmp_path / 'bus.json'), 'pretty', False)
+    with open(path, 'r', encoding='utf-8') as f:
+        assert f.read() == json.dumps(data, indent=2, ensure_ascii=False)
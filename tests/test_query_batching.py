@@ -0,0 +1,74 @@
+import re
+
+from query_batching import QueryBatcher
+
+
+def selection(table):
+    return {'table': table, 'field': table, 'args': 'limit: 10', 'selection': 'id'}
+
+
+class FakeEndpoint:
+    """Answers every root field with one row, except fields listed as broken."""
+
+    def __init__(self, broken=(), with_path=True):
+        self.broken = set(broken)
+        self.with_path = with_path
+        self.queries = []
+
+    def __call__(self, query, variables=None):
+        self.queries.append(query)
+        data, errors = {}, []
+        for line in query.splitlines()[1:]:
+            line = line.strip()
+            if not line.endswith('{') or line.startswith('query'):
+                continue
+            alias, field = re.match(r'(?:(\w+): )?(\w+)', line).groups()
+            if field in self.broken:
+                path = f"$.selectionSet.{alias or field}.selectionSet.id" if self.with_path else '$'
+                errors.append({'message': f"field '{field}' not found", 'extensions': {'path': path}})
+            else:
+                data[alias or field] = [{'id': 1}]
+        return {'errors': errors} if errors else {'data': data}
+
+
+def test_transport_failure_fails_the_batch_without_resending():
+    endpoint = FakeEndpoint()
+    batcher = QueryBatcher(endpoint, batch_size=4)
+    job = batcher.plan([selection(t) for t in ('bus', 'drivers', 'workorders')])[0]
+
+    assert batcher.resolve(job, None) == [(selection(t), None) for t in ('bus', 'drivers', 'workorders')]
+    assert endpoint.queries == []
+
+
+def test_failing_alias_is_isolated_and_the_rest_resent():
+    endpoint = FakeEndpoint(broken={'drivers'})
+    pairs = QueryBatcher(endpoint, batch_size=4).run([selection(t) for t in ('bus', 'drivers', 'workorders')])
+
+    assert [result.get('data') for _, result in pairs] == [{'bus': [{'id': 1}]}, None, {'workorders': [{'id': 1}]}]
+    assert 'errors' in pairs[1][1]
+    # The batch, then drivers alone and bus + workorders together
+    assert len(endpoint.queries) == 3
+
+
+def test_errors_without_a_path_bisect_the_batch():
+    endpoint = FakeEndpoint(broken={'drivers'}, with_path=False)
+    tables = ['bus', 'drivers', 'workorders', 'notifications']
+    pairs = QueryBatcher(endpoint, batch_size=4).run([selection(t) for t in tables])
+
+    assert [t for (s, result), t in zip(pairs, tables) if 'errors' in result] == ['drivers']
+    assert [s['table'] for s, _ in pairs] == tables
+
+
+def test_follow_ups_go_out_together_through_run_jobs():
+    endpoint = FakeEndpoint(broken={'bus', 'workorders'})
+    batcher = QueryBatcher(endpoint, batch_size=3)
+    rounds = []
+
+    def run_jobs(jobs):
+        rounds.append(len(jobs))
+        return [(job, endpoint(job['query'])) for job in jobs]
+
+    pairs = batcher.resolve_all(run_jobs(batcher.plan([selection(t) for t in ('bus', 'drivers', 'workorders')])),
+                                run_jobs)
+    assert rounds == [1, 3]
+    assert ['errors' in result for _, result in pairs] == [True, False, True]
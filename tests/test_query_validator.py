@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from query_validator import QueryValidator
+from schema_model import SchemaModel
+
+SCHEMA = os.path.join(os.path.dirname(__file__), '..', 'sample_data', 'successful_data', 'schema.json')
+
+
+@pytest.fixture(scope='module')
+def validator(tmp_path_factory):
+    return QueryValidator(SchemaModel.load(SCHEMA, cache_dir=str(tmp_path_factory.mktemp('schema'))))
+
+
+@pytest.mark.parametrize('table', ['workorders', 'workorder_details'])
+def test_does_not_repair_onto_key_columns(validator, table):
+    report = validator.validate(f"query {{ {table}(limit: 1) {{ id status }} }}")
+    assert report['repairs'] == [f"dropped {table}.status"]
+    assert 'status_id' not in report['query']
+
+
+def test_repairs_typos(validator):
+    report = validator.validate("query { bus(limit: 1) { id plate_numbr curent_contractor_id } }")
+    assert report['repairs'] == ['bus.plate_numbr -> bus.plate_number',
+                                 'bus.curent_contractor_id -> bus.current_contractor_id']
+
+
+def test_fragment_emptied_by_repair_is_dropped_with_its_spread(validator):
+    report = validator.validate("query { bus(limit:1){ id ...F } } fragment F on bus { zzzqqq }")
+    assert report['valid']
+    assert 'fragment' not in report['query'] and '...F' not in report['query']
+    assert validator.validate(report['query'])['errors'] == []
+
+
+def test_nested_empty_fragments_and_empty_operations(validator):
+    report = validator.validate("query { bus(limit:1){ id ...G } } "
+                                "fragment G on bus { ...F } fragment F on bus { zzzqqq }")
+    assert report['valid'] and 'fragment' not in report['query']
+
+    # Nothing valid is left to send at all
+    report = validator.validate("query { bus(limit:1){ ...F } } fragment F on bus { zzzqqq }")
+    assert not report['valid']
@@ -0,0 +1,110 @@
+from relationship_graph import NestedQueryBuilder, RelationshipGraph, flatten
+from schema_model import SchemaModel
+
+
+def named(kind, name):
+    return {'kind': kind, 'name': name, 'ofType': None}
+
+
+def list_of(kind, name):
+    return {'kind': 'NON_NULL', 'name': None, 'ofType': {'kind': 'LIST', 'name': None, 'ofType': named(kind, name)}}
+
+
+def field(name, type_ref, args=()):
+    return {'name': name, 'type': type_ref,
+            'args': [{'name': arg, 'type': named('SCALAR', 'Int')} for arg in args]}
+
+
+SCHEMA = SchemaModel({'data': {'__schema': {
+    'queryType': {'name': 'query_root'},
+    'types': [
+        {'kind': 'OBJECT', 'name': 'query_root', 'fields': [
+            field('bus', list_of('OBJECT', 'bus'), ['limit']),
+            field('bus_aggregate', named('OBJECT', 'bus_aggregate')),
+        ]},
+        {'kind': 'OBJECT', 'name': 'bus', 'fields': [
+            field('id', named('SCALAR', 'Int')),
+            field('number', named('SCALAR', 'String')),
+            field('status', named('ENUM', 'bus_status_enum')),
+            field('depot', named('OBJECT', 'depots')),
+            field('workorders', list_of('OBJECT', 'workorders'), ['limit']),
+            field('workorders_aggregate', named('OBJECT', 'workorders_aggregate')),
+        ]},
+        {'kind': 'OBJECT', 'name': 'depots', 'fields': [
+            field('id', named('SCALAR', 'Int')),
+            field('name', named('SCALAR', 'String')),
+        ]},
+        {'kind': 'OBJECT', 'name': 'workorders', 'fields': [
+            field('id', named('SCALAR', 'Int')),
+            field('title', named('SCALAR', 'String')),
+            field('details', named('SCALAR', 'jsonb')),
+            field('bus', named('OBJECT', 'bus')),
+            field('inspections', list_of('OBJECT', 'inspections'), ['limit']),
+        ]},
+        {'kind': 'OBJECT', 'name': 'inspections', 'fields': [
+            field('id', named('SCALAR', 'Int')),
+            field('result', named('SCALAR', 'String')),
+        ]},
+        {'kind': 'OBJECT', 'name': 'bus_aggregate', 'fields': [field('count', named('SCALAR', 'Int'))]},
+        {'kind': 'OBJECT', 'name': 'workorders_aggregate', 'fields': [field('count', named('SCALAR', 'Int'))]},
+    ],
+}}})
+
+
+def builder():
+    return NestedQueryBuilder(RelationshipGraph(SCHEMA))
+
+
+def selected_lines(query):
+    return [line.strip() for line in query.strip().splitlines()[2:-2]]
+
+
+def test_graph_skips_aggregates_and_roots():
+    graph = RelationshipGraph(SCHEMA)
+
+    assert [edge['field'] for edge in graph.relationships('bus')] == ['depot', 'workorders']
+    assert graph.relationships('bus')[1]['is_list'] is True
+    assert 'query_root' not in graph.edges
+    assert graph.scalar_fields('bus') == ['id', 'number', 'status']
+
+
+def test_build_follows_relationships_without_revisiting_types():
+    query, paths = builder().build('bus', depth=2, args='limit: 5', child_limit=3)
+
+    assert 'bus(limit: 5) {' in query
+    assert paths == ['bus.depot', 'bus.workorders', 'bus.workorders.inspections']
+    assert selected_lines(query) == [
+        'id', 'number', 'status',
+        'depot {', 'id', 'name', '}',
+        'workorders(limit: 3) {', 'id', 'title', 'details',
+        'inspections(limit: 3) {', 'id', 'result', '}',
+        '}',
+    ]
+
+
+def test_projection_limits_columns_and_relationships_but_keeps_the_link_key():
+    query, paths = builder().build('bus', depth=2, projection={'bus': ['number'], 'bus.workorders': ['title']})
+
+    assert paths == ['bus.workorders']
+    assert selected_lines(query) == ['id', 'number', 'workorders {', 'id', 'title', '}']
+
+
+def test_flatten_links_nested_rows_to_their_parent():
+    _, paths = builder().build('bus', depth=2)
+    rows = [
+        {'id': 1, 'number': 'A1', 'depot': {'id': 9, 'name': 'North'}, 'workorders': [
+            {'id': 10, 'title': 'Brakes', 'details': {'parts': 2}, 'inspections': [{'id': 100, 'result': 'pass'}]},
+            {'id': 11, 'title': 'Lights', 'details': None, 'inspections': []},
+        ]},
+        {'id': 2, 'number': 'A2', 'depot': None, 'workorders': []},
+    ]
+    tables = flatten(rows, 'bus', paths)
+
+    assert tables['bus'] == [{'id': 1, 'number': 'A1'}, {'id': 2, 'number': 'A2'}]
+    assert tables['bus.depot'] == [{'id': 9, 'name': 'North', '_parent_id': 1}]
+    # jsonb columns are values, not relationships, and stay in their row
+    assert tables['bus.workorders'] == [
+        {'id': 10, 'title': 'Brakes', 'details': {'parts': 2}, '_parent_id': 1},
+        {'id': 11, 'title': 'Lights', 'details': None, '_parent_id': 1},
+    ]
+    assert tables['bus.workorders.inspections'] == [{'id': 100, 'result': 'pass', '_parent_id': 10}]
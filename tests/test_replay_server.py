@@ -0,0 +1,45 @@
+import pytest
+
+from cassette import CassetteRecorder
+from graphql_client import GraphQLClient, GraphQLClientError
+from replay_server import CassetteResponder, StandInServer
+
+QUERIES = ["query { bus(limit: 2) { id } }", "query { drivers(limit: 2) { id } }"]
+
+
+def live_responder(payload):
+    table = payload['query'].split('{')[1].split('(')[0].strip()
+    return 200, {'data': {table: [{'id': 1}, {'id': 2}]}}
+
+
+def test_record_and_replay_round_trip(tmp_path):
+    cassette = str(tmp_path / 'traffic.ndjson')
+    recorder = CassetteRecorder(cassette)
+    with StandInServer(live_responder) as live:
+        client = GraphQLClient(live.url, recorder=recorder)
+        recorded = [client.execute(query) for query in QUERIES]
+    recorder.close()
+    assert recorder.recorded == 2
+
+    responder = CassetteResponder([cassette])
+    assert len(responder.responses) == 2
+    with StandInServer(responder) as replay:
+        client = GraphQLClient(replay.url)
+        # Whitespace differences still match the recording
+        assert [client.execute(query.replace(' { id }', '{id}')) for query in QUERIES] == recorded
+        assert responder.unmatched == 0
+
+        missing = client.execute("query { workorders(limit: 2) { id } }")
+        assert missing['errors'][0]['extensions']['code'] == 'not-recorded'
+        assert responder.unmatched == 1
+
+
+def test_injected_errors_are_retryable_503s():
+    with StandInServer(live_responder, error_rate=1.0, seed=1) as server:
+        client = GraphQLClient(server.url, max_retries=2, backoff_base=0)
+        with pytest.raises(GraphQLClientError) as error:
+            client.execute(QUERIES[0])
+        assert error.value.status == 503
+        # 503 is retried: every attempt reached the server and was failed by injection
+        assert error.value.attempts == 3
+        assert server.stats()['injected_errors'] == 3
@@ -0,0 +1,20 @@
+from response_cache import ResponseCache
+
+QUERY = 'query q { bus(limit: 1) { id } }'
+LIVE = 'https://inspector-gql.tatweertransit.com/v1/graphql'
+STAND_IN = 'http://127.0.0.1:8787/v1/graphql'
+
+
+def test_entries_are_per_endpoint(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(QUERY, None, {'data': {'bus': [{'id': 1}]}}, 'admin', STAND_IN)
+    assert cache.get(QUERY, None, 'admin', LIVE) is None
+    assert cache.get(QUERY, None, 'admin', STAND_IN) == {'data': {'bus': [{'id': 1}]}}
+    assert cache.get(QUERY, None, 'user', STAND_IN) is None
+
+
+def test_errors_and_mutations_are_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(QUERY, None, {'errors': [{'message': 'boom'}]}, 'admin', LIVE)
+    cache.put('mutation m { delete_bus(where: {}) { affected_rows } }', None, {'data': {}}, 'admin', LIVE)
+    assert cache.snapshot()['stores'] == 0
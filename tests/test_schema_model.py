@@ -0,0 +1,44 @@
+import copy
+import json
+import os
+
+from schema_diff import affected_types, diff_models
+from schema_model import SchemaModel
+
+SCHEMA = os.path.join(os.path.dirname(__file__), '..', 'sample_data', 'successful_data', 'schema.json')
+
+
+def load_schema_data():
+    with open(SCHEMA, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_type(schema_data, name):
+    return next(t for t in schema_data['data']['__schema']['types'] if t['name'] == name)
+
+
+def test_fingerprint_ignores_descriptions_and_ordering():
+    data = load_schema_data()
+    original = SchemaModel(data)
+    edited = copy.deepcopy(data)
+    bus = find_type(edited, 'bus')
+    bus['description'] = 'Buses, described differently'
+    bus['fields'].reverse()
+
+    assert SchemaModel(edited).fingerprint == original.fingerprint
+
+
+def test_fingerprints_change_only_for_changed_types():
+    data = load_schema_data()
+    original = SchemaModel(data)
+    edited = copy.deepcopy(data)
+    bus = find_type(edited, 'bus')
+    bus['fields'].append(dict(bus['fields'][0], name='fleet_number'))
+    changed = SchemaModel(edited)
+
+    assert changed.fingerprint != original.fingerprint
+    assert [name for name in changed.types
+            if changed.type_fingerprints[name] != original.type_fingerprints[name]] == ['bus']
+    diff = diff_models(original, changed)
+    assert affected_types(diff) == ['bus']
+    assert diff['changed_types']['bus']['fields']['added'] == ['fleet_number']
@@ -0,0 +1,64 @@
+import json
+import os
+
+import numpy as np
+
+from scoring_engine import ScoringEngine, failed_response_ids
+
+TEMPLATES = os.path.join(os.path.dirname(__file__), '..', 'sample_data', 'successful_data',
+                         'examination_templates_sample.json')
+
+
+def load_template(template_id=32):
+    with open(TEMPLATES, 'r', encoding='utf-8') as f:
+        templates = json.load(f)['data']['examination_templates']
+    return next(template for template in templates if template['id'] == template_id)
+
+
+def test_failed_response_ids():
+    assert failed_response_ids([4, '6']) == {'4', '6'}
+    assert failed_response_ids('3') == {'3'}
+    assert failed_response_ids(None) == set()
+    # A count has no confirmed meaning, so it is not turned into a mask
+    assert failed_response_ids(2) is None
+
+
+def test_real_template_gets_no_guessed_failure_mask(capsys):
+    template = load_template()
+    engine = ScoringEngine([template])
+    compiled = engine.compile(32)
+    assert compiled.unmasked_questions > 0
+    assert not compiled.failed.any()
+    assert 'failed_responses is a number' in capsys.readouterr().out
+
+    result = engine.score({
+        'examination_template_id': [32, 32, 32],
+        'workorder_details_id': [1, 1, 2],
+        'question_id': [65, 69, 65],
+        'answer_id': [5, 6, 6],
+        'bus_id': [10, 10, 10],
+        'contractor_id': [7, 7, 7],
+    })
+    assert result['answers']['matched'] == 3
+    assert result['inspections']['failed'].tolist() == [0, 0]
+
+
+def test_failure_masks_and_non_numeric_item_ids():
+    template = {'id': 1, 'mobile_template': {
+        '_rev': 'r1',
+        'template_data': {'response_sets': {'yn': {'responses': [
+            {'id': '1', 'score': 1}, {'id': '2', 'score': 0, 'failed': True}, {'id': '3', 'score': 0}]}}},
+        'items': [
+            {'type': 'question', 'item_id': '10',
+             'options': {'response_set': 'yn', 'failed_responses': ['3'], 'is_mandatory': True}},
+            {'type': 'question', 'item_id': 'intro-text', 'options': {'response_set': 'yn'}},
+        ],
+    }}
+    compiled = ScoringEngine([template]).compile(1)
+    assert compiled.skipped_items == ['intro-text']
+
+    questions = np.array([10, 10, 10], dtype=np.int64)
+    matched, achieved, possible, failed, mandatory_failed = compiled.lookup(questions, np.array([1, 2, 3]))
+    assert matched.all()
+    assert failed.tolist() == [False, True, True]
+    assert mandatory_failed.tolist() == [False, True, True]
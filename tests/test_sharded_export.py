@@ -0,0 +1,31 @@
+import pytest
+
+from sharded_export import plan_key_ranges
+
+
+class AggregateFetcher:
+    def __init__(self, result):
+        self.result = result
+
+    def execute_query(self, query, variables=None):
+        return self.result
+
+
+def test_key_ranges_cover_the_key_span():
+    fetcher = AggregateFetcher({'data': {'bus_aggregate': {'aggregate': {'min': {'id': 1}, 'max': {'id': 100}}}}})
+    assert plan_key_ranges(fetcher, 'bus', 'id', 4) == [
+        {'where': {'id': {'_lt': 25}}},
+        {'where': {'id': {'_gte': 25, '_lt': 50}}},
+        {'where': {'id': {'_gte': 50, '_lt': 75}}},
+        {'where': {'id': {'_gte': 75}}},
+    ]
+
+
+@pytest.mark.parametrize('result', [
+    {'errors': [{'message': "field 'min' not found in type: 'answers_as_rows_aggregate_fields'"}]},
+    {'data': {'answers_as_rows_aggregate': {'aggregate': {'min': {'id': 'a1'}, 'max': {'id': 'f9'}}}}},
+])
+def test_unsplittable_keys_raise_value_error(result):
+    # export_tables falls back to a single cursor on ValueError
+    with pytest.raises(ValueError):
+        plan_key_ranges(AggregateFetcher(result), 'answers_as_rows', 'id', 4)
@@ -0,0 +1,51 @@
+import json
+import os
+
+from export_checkpoint import ExportCheckpoint
+from sqlite_mirror import SQLiteMirror, find_sources
+
+
+def write_checkpointed_export(folder, table, rows):
+    filepath = os.path.join(folder, f"{table}.ndjson")
+    checkpoint = ExportCheckpoint(filepath, table, 'id', ['id', 'name'], page_size=2)
+    checkpoint.begin(resume=False)
+    with open(checkpoint.partial_path, 'ab') as f:
+        for start in range(0, len(rows), 2):
+            page = rows[start:start + 2]
+            for row in page:
+                f.write(json.dumps(row).encode('utf-8') + b'\n')
+            checkpoint.commit_page(f, page)
+    checkpoint.finish()
+    return filepath
+
+
+def test_find_sources_ignores_manifests_and_leftovers(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    rows = [{'id': i, 'name': f"bus {i}"} for i in range(1, 6)]
+    filepath = write_checkpointed_export(str(exports), 'bus', rows)
+    (exports / 'route.ndjson.partial').write_text('{"id": 1}\n')
+    (exports / 'route.ndjson.manifest.json').write_text('{}')
+    (exports / 'trip.ndjson.shards').mkdir()
+    (exports / 'sync_state.json').write_text('{}')
+
+    sources = find_sources(str(exports), str(tmp_path / 'samples'))
+    assert sources == {'bus': filepath}
+
+    mirror = SQLiteMirror(str(tmp_path / 'mirror.db'))
+    assert mirror.load_file('bus', sources['bus']) == 5
+    assert mirror.conn.execute('SELECT name FROM bus WHERE id = 3').fetchone() == ('bus 3',)
+    mirror.close()
+
+
+def test_export_wins_over_sample(tmp_path):
+    samples = tmp_path / 'samples'
+    samples.mkdir()
+    (samples / 'bus_sample.json').write_text(json.dumps({'data': {'bus': [{'id': 1}]}}))
+    (samples / 'route_sample.json').write_text(json.dumps({'data': {'route': [{'id': 1}]}}))
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    (exports / 'bus.ndjson.gz').write_bytes(b'')
+
+    sources = find_sources(str(exports), str(samples))
+    assert sources == {'bus': str(exports / 'bus.ndjson.gz'), 'route': str(samples / 'route_sample.json')}
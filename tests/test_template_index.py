@@ -0,0 +1,96 @@
+from template_index import TemplateCompiler, compile_template, template_revision
+
+HASURA = {
+    'id': 7,
+    'mobile_template': {
+        'name': 'Daily check',
+        '_rev': '3-abc',
+        'template_data': {'response_sets': {'rs1': {'responses': [
+            {'id': 'ok', 'label': 'OK'}, {'id': 'bad', 'label': 'Bad', 'failed': True}]}}},
+        'items': [
+            {'item_id': 'q2', 'type': 'question', 'label': 'Tyres', 'parent_id': 's1', 'sort_score': '10',
+             'options': {'response_set': 'rs1'}},
+            {'item_id': 's1', 'type': 'section', 'label': 'Outside', 'sort_score': 1},
+            {'item_id': 'q1', 'type': 'question', 'label': 'Lights', 'parent_id': 's1', 'sort_score': '9'},
+        ],
+    },
+}
+
+IAUDITOR_SECTIONS = {
+    'metadata': {'id': 'tpl-sections', 'name': 'Sections template'},
+    'response_sets': {'yn': {'options': [{'id': 'y'}, {'id': 'n'}], 'fail_ids': ['n']}},
+    'sections': [
+        {'id': 'sec-a', 'label': 'A', 'items': [
+            {'id': 'a1', 'type': 'question', 'label': 'First', 'response_set_id': 'yn'},
+            {'id': 'a2', 'type': 'text', 'label': 'Second'}]},
+        {'id': 'sec-b', 'label': 'B', 'items': [{'id': 'b1', 'type': 'question', 'label': 'Third'}]},
+    ],
+}
+
+IAUDITOR_ITEMS = {
+    'template_id': 'tpl-items',
+    'name': 'Items template',
+    'header_items': [{'item_id': 'h1', 'type': 'text', 'label': 'Site'}],
+    'items': [
+        {'item_id': 'sec', 'type': 'section', 'label': 'Body', 'items': [
+            {'item_id': 'i1', 'type': 'question', 'label': 'Clean?',
+             'response_set': {'responses': [{'id': 'yes'}, {'id': 'no', 'failed': True}]}},
+            {'item_id': 'i2', 'type': 'question', 'label': 'Tidy?'}]},
+    ],
+}
+
+
+def test_hasura_template_orders_by_numeric_sort_score():
+    index = compile_template(HASURA)
+
+    assert (index.template_id, index.name, index.rev, index.source) == (7, 'Daily check', '3-abc', 'hasura')
+    assert index.children_of('s1') == ['q1', 'q2']
+    assert index.questions_in('s1') == ['q1', 'q2']
+    assert index.section_for('q2')['label'] == 'Outside'
+    assert index.response_set_for('q2')['failed'] == ['bad']
+    assert index.response_set_for('q1') is None
+
+
+def test_iauditor_sections_template():
+    index = compile_template(IAUDITOR_SECTIONS)
+
+    assert index.source == 'iauditor_sections'
+    assert index.questions() == ['a1', 'a2', 'b1']
+    assert index.questions_in('sec-b') == ['b1']
+    assert index.response_set_for('a1')['failed'] == ['n']
+    assert index.item('a2')['parent_id'] == 'sec-a'
+
+
+def test_iauditor_items_template_keeps_header_first_and_inline_response_sets():
+    index = compile_template(IAUDITOR_ITEMS)
+
+    assert index.source == 'iauditor_items'
+    assert index.questions() == ['h1', 'i1', 'i2']
+    assert index.section_for('h1') is None
+    assert index.questions_in('sec') == ['i1', 'i2']
+    assert index.response_set_for('i1')['failed'] == ['no']
+
+
+def test_compiler_memoizes_by_id_and_revision():
+    compiler = TemplateCompiler(workers=1)
+    first = compiler.compile(HASURA)
+    assert compiler.compile(dict(HASURA)) is first
+    assert (compiler.hits, compiler.misses) == (1, 1)
+
+    revised = dict(HASURA, mobile_template=dict(HASURA['mobile_template'], _rev='4-def'))
+    assert compiler.compile(revised) is not first
+    assert compiler.misses == 2
+
+
+def test_templates_without_a_revision_are_keyed_by_content():
+    template_id, rev = template_revision(IAUDITOR_ITEMS)
+    assert template_id == 'tpl-items' and rev.startswith('sha256:')
+
+    changed = dict(IAUDITOR_ITEMS, name='Renamed')
+    assert template_revision(changed)[1] != rev
+
+    compiler = TemplateCompiler(workers=1)
+    indexes = compiler.compile_many([IAUDITOR_ITEMS, IAUDITOR_SECTIONS, IAUDITOR_ITEMS, changed])
+    assert indexes[0] is indexes[2]
+    assert indexes[3].name == 'Renamed'
+    assert (compiler.hits, compiler.misses) == (1, 3)